@@ -0,0 +1,888 @@
+"""
+Lazy, blocked views of image data, for computing on images too large to be
+read into memory all at once; see ``hdu.to_chunked()``.
+"""
+
+from __future__ import division, with_statement
+
+import operator
+import sys
+
+import numpy as np
+
+from .extern.six import string_types
+from .extern.six.moves import range, zip
+from .util import _is_int, _map_parallel, _contiguous_runs
+
+
+# The approximate size in bytes of each block of a chunked array, unless
+# otherwise specified
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+
+# The statistics computed by ChunkedArray.stats() if none are specified
+DEFAULT_STATS = ('count', 'min', 'max', 'mean', 'std', 'median')
+
+# Percentiles are found by counting the values in this many bins of the range
+# of values containing them, narrowing the range on each pass over the data
+# until at most _SELECT_SIZE values are left in it; those values are then
+# collected and the percentile is selected from them exactly
+_HISTOGRAM_BINS = 2 ** 14
+_SELECT_SIZE = 2 ** 20
+
+
+class ChunkedArray(object):
+    """
+    A lazy array split into blocks, returned by ``hdu.to_chunked()``.
+
+    No data is read when a chunked array is created.  Instead, slicing it,
+    doing arithmetic with it, or calling `map_blocks` or `astype` returns a
+    new chunked array describing the computation.  The computation is only
+    done, one block at a time, when the result is needed: by `compute` (or
+    `numpy.asarray`), `iterblocks`, one of the reductions (`sum`, `mean`,
+    `min`, `max`, `var`, and `std`), or `stats`.  Blocks are computed on a pool of
+    ``workers`` threads if more than one worker was requested; at any time
+    only a few blocks per worker are held in memory.
+
+    Blocks of an HDU's image are read directly from the file (using one
+    contiguous read for each run of the block that is contiguous in the
+    file), and scaled by any ``BSCALE``/``BZERO``/``BLANK`` as they are read.
+
+    Operands of arithmetic may be other chunked arrays of the same shape,
+    scalars, or arrays that can be broadcast to the same shape.  Indexing
+    supports integers, slices with positive steps, and ``Ellipsis``.
+    """
+
+    # Ensures that arithmetic with an ndarray on the left hand side uses the
+    # operators of this class
+    __array_priority__ = 100.0
+
+    def __init__(self, shape, dtype, chunks=None, workers=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.chunks = _normalize_chunks(chunks, self.shape, self.dtype)
+        self.workers = workers
+
+    def __repr__(self):
+        return '<ChunkedArray shape=%r dtype=%s chunks=%r>' % (
+            self.shape, self.dtype.name, self.chunks)
+
+    def __len__(self):
+        if not self.shape:
+            raise TypeError('len() of unsized object')
+        return self.shape[0]
+
+    def __array__(self, dtype=None):
+        data = self.compute()
+        if dtype is not None:
+            data = data.astype(dtype)
+        return data
+
+    def __getitem__(self, key):
+        sliced = _SlicedChunkedArray(self, key)
+        if not sliced.shape:
+            # Indexing a single element returns the element itself
+            return sliced._getregion(())
+        return sliced
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    @property
+    def numblocks(self):
+        """The number of blocks along each axis."""
+
+        return tuple(-(-length // chunk)
+                     for length, chunk in zip(self.shape, self.chunks))
+
+    def blocks(self):
+        """
+        Returns the list of blocks of this array, in C order, as tuples of
+        slices that can be used to index an array of the same shape.
+        """
+
+        return [tuple(slice(idx * chunk, min((idx + 1) * chunk, length))
+                      for idx, chunk, length in
+                      zip(indices, self.chunks, self.shape))
+                for indices in np.ndindex(*self.numblocks)]
+
+    def iterblocks(self):
+        """
+        Computes the blocks of this array, and yields ``(block, data)`` pairs
+        in the order of `blocks`, where ``data`` is the `~numpy.ndarray` of
+        the block.
+        """
+
+        blocks = self.blocks()
+        results = _map_parallel(self._getregion, blocks, self.workers,
+                                max_pending=self.workers and 2 * self.workers)
+        for block, data in zip(blocks, results):
+            yield block, data
+
+    def compute(self):
+        """Computes the whole array, and returns it as an `~numpy.ndarray`."""
+
+        data = np.empty(self.shape, dtype=self.dtype)
+        for block, block_data in self.iterblocks():
+            data[block] = block_data
+        return data
+
+    def rechunk(self, chunks):
+        """
+        Returns the same array split into blocks of a different size; see
+        ``hdu.to_chunked()`` for the values of ``chunks``.
+        """
+
+        return _ElementwiseChunkedArray(_identity, [self], self.dtype,
+                                        chunks, self.workers)
+
+    def map_blocks(self, func, dtype=None):
+        """
+        Returns the array computed by calling ``func`` on each block of this
+        array.  ``func`` must return an array of the same shape as its
+        argument.  If ``dtype`` is not given, the data type of the result is
+        determined by calling ``func`` on an empty array.
+        """
+
+        if dtype is None:
+            dtype = _empty_result(func, [self]).dtype
+        return _ElementwiseChunkedArray(func, [self], dtype, self.chunks,
+                                        self.workers)
+
+    def astype(self, dtype):
+        """Returns this array converted to the data type ``dtype``."""
+
+        dtype = np.dtype(dtype)
+        return self.map_blocks(lambda data: data.astype(dtype), dtype)
+
+    def sum(self, axis=None, dtype=None):
+        return self._reduce(lambda data, axis: data.sum(axis=axis,
+                                                        dtype=dtype),
+                            np.add, _identity, axis)
+
+    def min(self, axis=None):
+        return self._reduce(lambda data, axis: data.min(axis=axis),
+                            np.minimum, _identity, axis)
+
+    def max(self, axis=None):
+        return self._reduce(lambda data, axis: data.max(axis=axis),
+                            np.maximum, _identity, axis)
+
+    def mean(self, axis=None, dtype=None):
+        dtype = self._accumulator_dtype(dtype)
+
+        def partial(data, axis):
+            return data.sum(axis=axis, dtype=dtype), _count(data, axis)
+
+        def combine(a, b):
+            return a[0] + b[0], a[1] + b[1]
+
+        return self._reduce(partial, combine,
+                            lambda state: np.true_divide(*state), axis)
+
+    def var(self, axis=None, dtype=None, ddof=0):
+        dtype = self._accumulator_dtype(dtype)
+
+        def partial(data, axis):
+            mean = data.mean(axis=axis, dtype=dtype)
+            if axis is None:
+                deviations = data - mean
+            else:
+                deviations = data - np.expand_dims(mean, axis)
+            return (_count(data, axis), mean,
+                    (deviations * deviations).sum(axis=axis, dtype=dtype))
+
+        def combine(a, b):
+            # Combines the means and sums of squared deviations of two blocks
+            # using the formula of Chan et al.
+            count = a[0] + b[0]
+            delta = b[1] - a[1]
+            mean = a[1] + delta * (b[0] / count)
+            sqdev = a[2] + b[2] + delta * delta * (a[0] * b[0] / count)
+            return count, mean, sqdev
+
+        return self._reduce(
+            partial, combine,
+            lambda state: np.true_divide(state[2], state[0] - ddof), axis)
+
+    def std(self, axis=None, dtype=None, ddof=0):
+        return np.sqrt(self.var(axis=axis, dtype=dtype, ddof=ddof))
+
+    def stats(self, stats=None, ignore_nan=True, exact=True):
+        """
+        Computes statistics of all the elements of this array, and returns a
+        dict mapping the name of each statistic to its value.
+
+        The moments are computed in a single pass over the blocks, combining
+        the counts, sums, means, and sums of squared deviations of the blocks
+        with the formula of Chan et al., in double precision.  Percentiles
+        need further passes: each pass counts the values in a histogram of
+        the range known to contain the percentile and narrows the range to
+        one bin, until the values in the range are few enough to be
+        collected and selected exactly.
+
+        Parameters
+        ----------
+        stats : sequence of str, optional
+            The statistics to compute: ``'count'`` (the number of values
+            used), ``'sum'``, ``'min'``, ``'max'``, ``'mean'``, ``'var'``,
+            ``'std'``, ``'median'``, or ``'p<q>'`` for the ``q``-th
+            percentile (for example ``'p5'`` or ``'p99.5'``), interpolated
+            between values as by `numpy.percentile`.  Defaults to
+            ``('count', 'min', 'max', 'mean', 'std', 'median')``.
+
+        ignore_nan : bool, optional
+            If `True` (the default), NaN values are ignored.  Otherwise every
+            statistic but the count is NaN if the array contains NaN.
+
+        exact : bool, optional
+            If `False`, percentiles are interpolated from the first histogram
+            of the values instead (unless the array is small), so that they
+            take only one pass over the data; they are then accurate to about
+            1/16384 of the range of the values.
+        """
+
+        if stats is None:
+            stats = DEFAULT_STATS
+        elif isinstance(stats, string_types):
+            stats = [stats]
+        percentiles = dict((name, _parse_stat(name)) for name in stats)
+
+        nans, count, total, mean, sqdev, minimum, maximum = self._reduce(
+            lambda data, axis: _moments(data, ignore_nan),
+            _combine_moments, _identity, None)
+
+        if not count or (nans and not ignore_nan):
+            mean = sqdev = minimum = maximum = np.nan
+            quantiles = {}
+        else:
+            quantiles = _select_percentiles(
+                self, [q for q in percentiles.values() if q is not None],
+                count, minimum, maximum, exact)
+
+        values = {'count': count, 'sum': total, 'min': minimum,
+                  'max': maximum, 'mean': mean}
+        if count:
+            values['var'] = sqdev / count
+        else:
+            values['var'] = np.nan
+        values['std'] = np.sqrt(values['var'])
+
+        result = {}
+        for name, q in percentiles.items():
+            if q is None:
+                result[name] = values[name]
+            else:
+                result[name] = quantiles.get(q, np.nan)
+        return result
+
+    def _getregion(self, region):
+        """
+        Returns the `~numpy.ndarray` of the part of this array selected by
+        ``region``, a tuple of slices with a step of 1 for each axis.
+        """
+
+        raise NotImplementedError
+
+    def _accumulator_dtype(self, dtype):
+        if dtype is None and self.dtype.kind in 'biu':
+            return np.dtype(np.float64)
+        return dtype
+
+    def _reduce(self, partial, combine, finalize, axis):
+        """
+        Reduces this array along ``axis`` (or over all elements if `None`).
+
+        ``partial(data, axis)`` reduces the data of one block, and is called
+        in the worker threads; ``combine`` combines the partial reductions of
+        two blocks, and ``finalize`` converts the combined reduction to the
+        result.
+        """
+
+        if axis is not None:
+            if not _is_int(axis) or not -self.ndim <= axis < self.ndim:
+                raise ValueError('axis %r is out of bounds for an array of '
+                                 'dimension %d' % (axis, self.ndim))
+            axis %= self.ndim
+
+        if not self.size:
+            # Let numpy deal with reductions of empty arrays
+            return finalize(partial(np.empty(self.shape, dtype=self.dtype),
+                                    axis))
+
+        blocks = self.blocks()
+        results = _map_parallel(
+            lambda block: partial(self._getregion(block), axis), blocks,
+            self.workers)
+
+        if axis is None:
+            state = None
+            for result in results:
+                if state is None:
+                    state = result
+                else:
+                    state = combine(state, result)
+            return finalize(state)
+
+        # Blocks along the reduced axis are combined into the same part of
+        # the result
+        states = {}
+        for block, result in zip(blocks, results):
+            key = tuple((s.start, s.stop)
+                        for s in block[:axis] + block[axis + 1:])
+            if key in states:
+                states[key] = combine(states[key], result)
+            else:
+                states[key] = result
+
+        reduced = None
+        for key, state in states.items():
+            state = np.asarray(finalize(state))
+            if reduced is None:
+                reduced = np.empty(self.shape[:axis] + self.shape[axis + 1:],
+                                   dtype=state.dtype)
+            reduced[tuple(slice(*bounds) for bounds in key)] = state
+        return reduced
+
+
+def _binary_operator(op, reflected=False):
+    def method(self, other):
+        if reflected:
+            return _elementwise(op, [other, self])
+        else:
+            return _elementwise(op, [self, other])
+    return method
+
+
+def _unary_operator(op):
+    def method(self):
+        return _elementwise(op, [self])
+    return method
+
+
+for _name, _op in [('add', operator.add), ('sub', operator.sub),
+                   ('mul', operator.mul), ('truediv', operator.truediv),
+                   ('floordiv', operator.floordiv), ('mod', operator.mod),
+                   ('pow', operator.pow), ('and', operator.and_),
+                   ('or', operator.or_), ('xor', operator.xor)]:
+    setattr(ChunkedArray, '__%s__' % _name, _binary_operator(_op))
+    setattr(ChunkedArray, '__r%s__' % _name, _binary_operator(_op, True))
+
+if sys.version_info[0] < 3:
+    ChunkedArray.__div__ = _binary_operator(operator.div)
+    ChunkedArray.__rdiv__ = _binary_operator(operator.div, True)
+
+for _name, _op in [('lt', operator.lt), ('le', operator.le),
+                   ('eq', operator.eq), ('ne', operator.ne),
+                   ('gt', operator.gt), ('ge', operator.ge)]:
+    setattr(ChunkedArray, '__%s__' % _name, _binary_operator(_op))
+
+for _name, _op in [('neg', operator.neg), ('pos', operator.pos),
+                   ('abs', operator.abs), ('invert', operator.invert)]:
+    setattr(ChunkedArray, '__%s__' % _name, _unary_operator(_op))
+
+# Like ndarrays, chunked arrays are not hashable since they override __eq__
+ChunkedArray.__hash__ = None
+
+del _name, _op
+
+
+class _HDUChunkedArray(ChunkedArray):
+    """The image data of an HDU, read from its file one block at a time."""
+
+    def __init__(self, hdu, chunks=None, workers=None):
+        self.hdu = hdu
+        if self._from_data:
+            dtype = hdu.data.dtype
+        else:
+            # The data type of the scaled data is found by reading no data
+            dtype = hdu._get_scaled_image_data(hdu._data_offset, (0,)).dtype
+
+        super(_HDUChunkedArray, self).__init__(hdu.shape, dtype, chunks,
+                                               workers)
+
+    @property
+    def _from_data(self):
+        hdu = self.hdu
+        return (hdu._data_loaded or
+                (hdu._file is None and hdu._buffer is None))
+
+    def _getregion(self, region):
+        if self._from_data:
+            return self.hdu.data[region]
+
+        size = tuple(s.stop - s.start for s in region)
+        if not all(size):
+            return np.empty(size, dtype=self.dtype)
+
+        # The region is read in runs that are contiguous in the file
+        run_shape, offsets = _contiguous_runs(self.hdu.shape, region)
+        itemsize = abs(self.hdu._orig_bitpix) // 8
+
+        def read_run(offset):
+            return self.hdu._get_scaled_image_data(
+                self.hdu._data_offset + offset * itemsize, run_shape)
+
+        if len(offsets) == 1:
+            return read_run(offsets[0]).reshape(size)
+
+        data = np.empty(size, dtype=self.dtype)
+        runs = data.reshape((len(offsets),) + run_shape)
+        for idx, offset in enumerate(offsets):
+            runs[idx] = read_run(offset)
+        return data
+
+
+class _ArrayChunkedArray(ChunkedArray):
+    """An in-memory array used as an operand of a chunked array."""
+
+    def __init__(self, array, chunks=None, workers=None):
+        self.array = array
+        super(_ArrayChunkedArray, self).__init__(array.shape, array.dtype,
+                                                 chunks, workers)
+
+    def _getregion(self, region):
+        return self.array[region]
+
+
+class _ElementwiseChunkedArray(ChunkedArray):
+    """
+    The result of calling ``func`` on the corresponding blocks of chunked
+    array (or scalar) operands.
+    """
+
+    def __init__(self, func, operands, dtype, chunks=None, workers=None):
+        self.func = func
+        self.operands = operands
+        shape = [op for op in operands if isinstance(op, ChunkedArray)][0].shape
+        super(_ElementwiseChunkedArray, self).__init__(shape, dtype, chunks,
+                                                       workers)
+
+    def _getregion(self, region):
+        return self.func(*[op._getregion(region)
+                           if isinstance(op, ChunkedArray) else op
+                           for op in self.operands])
+
+
+class _SlicedChunkedArray(ChunkedArray):
+    """The part of a chunked array selected by indexing it."""
+
+    def __init__(self, parent, key):
+        self.parent = parent
+
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis for k in key):
+            idx = [k is Ellipsis for k in key].index(True)
+            fill = (slice(None),) * (parent.ndim - len(key) + 1)
+            key = key[:idx] + fill + key[idx + 1:]
+        if len(key) > parent.ndim:
+            raise IndexError('too many indices')
+        key += (slice(None),) * (parent.ndim - len(key))
+
+        # For each axis of the parent, the first index selected, the step
+        # between the indices selected, and their number (or None if the
+        # axis is indexed by an integer and is removed)
+        self.axes = []
+        shape = []
+        chunks = []
+        for k, length, chunk in zip(key, parent.shape, parent.chunks):
+            if _is_int(k):
+                if not -length <= k < length:
+                    raise IndexError('index %d is out of bounds for axis with '
+                                     'size %d' % (k, length))
+                self.axes.append((k % length, 1, None))
+            elif isinstance(k, slice):
+                start, stop, step = k.indices(length)
+                if step < 1:
+                    raise IndexError('Slices with negative steps are not '
+                                     'supported')
+                count = len(range(start, stop, step))
+                self.axes.append((start, step, count))
+                shape.append(count)
+                # Keep each block of the parent that is read about as large
+                # as the parent's own blocks
+                chunks.append(max(1, chunk // step))
+            else:
+                raise IndexError('Only integers, slices, and Ellipsis are '
+                                 'valid indices; got %r' % (k,))
+
+        super(_SlicedChunkedArray, self).__init__(
+            shape, parent.dtype, tuple(chunks), parent.workers)
+
+    def _getregion(self, region):
+        region = iter(region)
+        parent_region = []
+        selection = []
+        for start, step, count in self.axes:
+            if count is None:
+                parent_region.append(slice(start, start + 1))
+                selection.append(0)
+            else:
+                s = next(region)
+                stop = start + (s.stop - 1) * step + 1
+                start += s.start * step
+                parent_region.append(slice(start, max(start, stop)))
+                selection.append(slice(None, None, step))
+
+        return self.parent._getregion(tuple(parent_region))[tuple(selection)]
+
+
+def _elementwise(func, operands):
+    """
+    Returns the chunked array computed by calling ``func`` on ``operands``
+    element by element, or `NotImplemented` if an operand is of an
+    unsupported type.
+    """
+
+    base = [op for op in operands if isinstance(op, ChunkedArray)][0]
+    converted = []
+    for op in operands:
+        if isinstance(op, ChunkedArray):
+            if op.shape != base.shape:
+                raise ValueError('operands could not be broadcast together '
+                                 'with shapes %r %r' % (base.shape, op.shape))
+        else:
+            op = np.asarray(op)
+            if op.dtype.kind == 'O':
+                return NotImplemented
+            elif op.ndim:
+                op = _ArrayChunkedArray(_broadcast_to(op, base.shape),
+                                        base.chunks, base.workers)
+            else:
+                op = op[()]
+        converted.append(op)
+
+    dtype = _empty_result(func, converted).dtype
+    return _ElementwiseChunkedArray(func, converted, dtype, base.chunks,
+                                    base.workers)
+
+
+def _empty_result(func, operands):
+    """Calls ``func`` with empty arrays in place of chunked arrays."""
+
+    with np.errstate(all='ignore'):
+        return np.asarray(func(*[np.empty(0, dtype=op.dtype)
+                                 if isinstance(op, ChunkedArray) else op
+                                 for op in operands]))
+
+
+def _broadcast_to(array, shape):
+    """
+    Returns a read-only view of ``array`` broadcast to ``shape``, without
+    allocating an array of that shape.
+    """
+
+    target = np.lib.stride_tricks.as_strided(np.zeros(1, dtype=bool),
+                                             shape=shape,
+                                             strides=(0,) * len(shape))
+    array = np.broadcast_arrays(array, target)[0]
+    if array.shape != tuple(shape):
+        raise ValueError('operands could not be broadcast together with '
+                         'shapes %r %r' % (tuple(shape), array.shape))
+    return array
+
+
+def _normalize_chunks(chunks, shape, dtype):
+    """
+    Returns the shape of the blocks of an array, given either as the
+    approximate size in bytes of each block, or as a tuple with the size of
+    the blocks along each axis (`None` or -1 for the whole axis).
+    """
+
+    if chunks is None:
+        chunks = DEFAULT_CHUNK_SIZE
+
+    if _is_int(chunks):
+        # The blocks cover whole rows (or planes, etc.) of the array, so that
+        # each is contiguous in memory and in the file
+        normalized = list(shape)
+        size = dtype.itemsize
+        for idx in range(len(shape) - 1, -1, -1):
+            if size * shape[idx] <= chunks:
+                size *= shape[idx]
+            else:
+                normalized[idx] = chunks // size
+                normalized[:idx] = [1] * idx
+                break
+    else:
+        if len(chunks) != len(shape):
+            raise ValueError('chunks must have one value for each of the %d '
+                             'axes of the array; got %r' %
+                             (len(shape), chunks))
+        normalized = [length if chunk is None or chunk == -1 else chunk
+                      for chunk, length in zip(chunks, shape)]
+
+    return tuple(max(1, min(chunk, length))
+                 for chunk, length in zip(normalized, shape))
+
+
+def _count(data, axis):
+    if axis is None:
+        return data.size
+    return data.shape[axis]
+
+
+def _identity(value):
+    return value
+
+
+def _parse_stat(name):
+    """
+    Returns the percentile requested by the name of a statistic, or `None`
+    for the other statistics.
+    """
+
+    if name in ('count', 'sum', 'min', 'max', 'mean', 'var', 'std'):
+        return None
+    elif name == 'median':
+        return 50.0
+    elif isinstance(name, string_types) and name.startswith('p'):
+        try:
+            q = float(name[1:])
+        except ValueError:
+            pass
+        else:
+            if 0 <= q <= 100:
+                return q
+
+    raise ValueError('Unknown statistic %r' % (name,))
+
+
+def _valid_values(data):
+    """Returns the values of a block other than NaN as a 1-D array."""
+
+    data = data.reshape(-1)
+    if data.dtype.kind == 'f':
+        mask = np.isnan(data)
+        if mask.any():
+            data = data[~mask]
+    return data
+
+
+def _moments(data, ignore_nan):
+    """
+    Returns the number of NaN values, count, sum, mean, sum of squared
+    deviations from the mean, minimum and maximum of the values of a block.
+    """
+
+    data = data.reshape(-1)
+    nans = 0
+    if data.dtype.kind == 'f':
+        mask = np.isnan(data)
+        nans = int(np.count_nonzero(mask))
+        if nans and ignore_nan:
+            data = data[~mask]
+
+    if not data.size:
+        return nans, 0, 0, 0.0, 0.0, None, None
+
+    if data.dtype.kind == 'u':
+        # Integers are summed exactly (as Python integers across blocks)
+        total = int(data.sum(dtype=np.uint64))
+    elif data.dtype.kind in 'bi':
+        total = int(data.sum(dtype=np.int64))
+    else:
+        total = data.sum(dtype=np.float64)
+
+    mean = data.mean(dtype=np.float64)
+    deviations = np.subtract(data, mean, dtype=np.float64)
+    return (nans, data.size, total, mean, np.dot(deviations, deviations),
+            data.min(), data.max())
+
+
+def _combine_moments(a, b):
+    nans = a[0] + b[0]
+    if not b[1]:
+        return (nans,) + a[1:]
+    elif not a[1]:
+        return (nans,) + b[1:]
+
+    count = a[1] + b[1]
+    delta = b[3] - a[3]
+    mean = a[3] + delta * (b[1] / count)
+    sqdev = a[4] + b[4] + delta * delta * (a[1] * b[1] / count)
+    return (nans, count, a[2] + b[2], mean, sqdev, np.minimum(a[5], b[5]),
+            np.maximum(a[6], b[6]))
+
+
+def _select_percentiles(array, percentiles, count, minimum, maximum, exact):
+    """
+    Returns a dict mapping each of ``percentiles`` to its value among the
+    ``count`` non-NaN values of the chunked ``array``, which range from
+    ``minimum`` to ``maximum``.
+    """
+
+    if not percentiles:
+        return {}
+
+    # As for numpy.percentile, each percentile is interpolated between the
+    # values with the ranks on either side of its position in sorted order
+    positions = dict((q, q / 100.0 * (count - 1)) for q in percentiles)
+    ranks = set()
+    for position in positions.values():
+        ranks.add(int(np.floor(position)))
+        ranks.add(int(np.ceil(position)))
+
+    values = _select_ranks(array, ranks, count, minimum, maximum, exact)
+
+    result = {}
+    for q, position in positions.items():
+        lower = values[int(np.floor(position))]
+        fraction = position - np.floor(position)
+        upper = values[int(np.ceil(position))]
+        if fraction and upper != lower:
+            lower += (upper - lower) * fraction
+        result[q] = lower
+    return result
+
+
+def _select_ranks(array, ranks, count, minimum, maximum, exact):
+    """
+    Returns a dict mapping each of ``ranks`` to the value with that rank (in
+    ascending order) among the non-NaN values of ``array``.
+    """
+
+    # Values are compared in double precision.  Infinite values can not be
+    # binned, so the ranks held by them are set aside first
+    lower = np.float64(minimum)
+    upper = np.float64(maximum)
+    below = above = 0
+    values = {}
+    if np.isinf(lower) or np.isinf(upper):
+        below, above, lower, upper = _finite_range(array)
+    for rank in ranks:
+        if rank < below:
+            values[rank] = -np.inf
+        elif rank >= count - above:
+            values[rank] = np.inf
+
+    # Each rank still to be found is searched for in an interval of values
+    # from lower to upper (including upper only if the interval is closed),
+    # given the number of values below lower and in the interval
+    pending = dict((rank, (lower, upper, True, below, count - below - above))
+                   for rank in ranks if rank not in values)
+
+    while pending:
+        # Each interval is either binned or collected, on one pass over the
+        # data
+        intervals = sorted(set(state[:3] + (state[4] <= _SELECT_SIZE,)
+                               for state in pending.values()))
+        edges = [np.clip(np.linspace(lo, hi, _HISTOGRAM_BINS + 1), lo, hi)
+                 for lo, hi, closed, collect in intervals]
+
+        def scan(block):
+            data = _valid_values(array._getregion(block))
+            converted = np.asarray(data, dtype=np.float64)
+            results = []
+            for (lo, hi, closed, collect), bins in zip(intervals, edges):
+                if closed:
+                    mask = (converted >= lo) & (converted <= hi)
+                else:
+                    mask = (converted >= lo) & (converted < hi)
+                if collect:
+                    results.append(data[mask])
+                else:
+                    results.append(np.bincount(
+                        _bin_values(converted[mask], bins),
+                        minlength=_HISTOGRAM_BINS))
+            return results
+
+        totals = None
+        for results in _map_parallel(scan, array.blocks(), array.workers):
+            if totals is None:
+                totals = [[result] for result in results]
+            else:
+                for total, result, interval in zip(totals, results,
+                                                   intervals):
+                    if interval[3]:
+                        total.append(result)
+                    else:
+                        total[0] += result
+
+        for rank, (lo, hi, closed, below, size) in list(pending.items()):
+            idx = intervals.index((lo, hi, closed, size <= _SELECT_SIZE))
+            del pending[rank]
+            if intervals[idx][3]:
+                collected = np.concatenate(totals[idx])
+                values[rank] = np.float64(
+                    np.partition(collected, rank - below)[rank - below])
+                continue
+
+            counts = totals[idx][0]
+            cumulative = np.cumsum(counts)
+            bin = int(np.searchsorted(cumulative, rank - below, 'right'))
+            if bin:
+                below += int(cumulative[bin - 1])
+            size = int(counts[bin])
+            lo, hi = edges[idx][bin], edges[idx][bin + 1]
+            closed = closed and bin == _HISTOGRAM_BINS - 1
+
+            if not exact:
+                # Assume the values are spread evenly through the bin
+                values[rank] = lo + (hi - lo) * (rank - below + 0.5) / size
+            elif lo == hi or (not closed and np.nextafter(lo, hi) == hi):
+                # The bin holds a single value
+                values[rank] = lo
+            else:
+                pending[rank] = (lo, hi, closed, below, size)
+
+    return values
+
+
+def _bin_values(values, edges):
+    """
+    Returns the index of the bin of ``edges`` holding each of ``values``,
+    which lie between the first and last edges, so that ``edges[idx] <=
+    value < edges[idx + 1]`` (or ``value`` is the last edge, in the last
+    bin).  This is the same as ``np.searchsorted(edges, values, 'right') -
+    1``, but much faster for bins of nearly equal width.
+    """
+
+    bins = len(edges) - 1
+    width = edges[-1] - edges[0]
+    if not width:
+        return np.zeros(len(values), dtype=np.intp)
+
+    idx = np.floor((values - edges[0]) * (bins / width)).astype(np.intp)
+    np.clip(idx, 0, bins - 1, idx)
+
+    # Move any values placed in a neighbouring bin by rounding errors
+    while True:
+        lower = values < edges[idx]
+        higher = values >= edges[idx + 1]
+        higher &= idx < bins - 1
+        if not (lower.any() or higher.any()):
+            return idx
+        idx -= lower
+        idx += higher
+
+
+def _finite_range(array):
+    """
+    Returns the number of values equal to -inf and to inf in ``array``, and
+    the minimum and maximum of its finite values.
+    """
+
+    def partial(data, axis):
+        data = _valid_values(data)
+        finite = data[np.isfinite(data)]
+        if finite.size:
+            return (int(np.count_nonzero(data == -np.inf)),
+                    int(np.count_nonzero(data == np.inf)),
+                    np.float64(finite.min()), np.float64(finite.max()))
+        return (int(np.count_nonzero(data == -np.inf)),
+                int(np.count_nonzero(data == np.inf)), np.inf, -np.inf)
+
+    def combine(a, b):
+        return (a[0] + b[0], a[1] + b[1], min(a[2], b[2]), max(a[3], b[3]))
+
+    return array._reduce(partial, combine, _identity, None)
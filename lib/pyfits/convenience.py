@@ -53,24 +53,29 @@ explanation of all the different formats.
 
 
 import os
+import warnings
 
 import numpy as np
 
 from .extern.six import string_types
 
 from .file import FILE_MODES, _File
-from .hdu.base import _BaseHDU, _ValidHDU
+from .card import Card, KEYWORD_LENGTH
+from .hdu.base import (_BaseHDU, _ValidHDU, _iter_raw_hdus, _compute_checksum,
+                       _checksum_add, _checksum_sub, _char_encode,
+                       _char_decode)
 from .hdu.hdulist import fitsopen
 from .hdu.image import PrimaryHDU, ImageHDU
 from .hdu.table import BinTableHDU
-from .header import Header
+from .header import Header, END_CARD
 from .util import (deprecated, fileobj_closed, fileobj_name, fileobj_mode,
-                   fileobj_closed, _is_int)
+                   fileobj_closed, encode_ascii, _is_int, _pad_length,
+                   _map_parallel, BLOCK_SIZE)
 
 
 __all__ = ['getheader', 'getdata', 'getval', 'setval', 'delval', 'writeto',
            'append', 'update', 'info', 'tdump', 'tcreate', 'tabledump',
-           'tableload']
+           'tableload', 'scan_headers', 'extract', 'concatenate']
 
 
 def getheader(filename, *args, **kwargs):
@@ -255,6 +260,262 @@ def getval(filename, keyword, *args, **kwargs):
     return hdr[keyword]
 
 
+def scan_headers(paths, keywords, ext=0, default=None, workers=None,
+                 pool='thread', ignore_errors=False, as_array=False):
+    """
+    Read the values of a selection of keywords from the headers of many FITS
+    files.
+
+    This is intended for harvesting metadata from a large number of files,
+    and is much faster than calling `getval` or `getheader` on each file.
+    Only the header blocks up to and including the header of the requested
+    extension are read from each file (the data of any preceding HDUs is
+    skipped over), no HDU objects are created, and only the values of the
+    requested keywords are parsed.
+
+    Parameters
+    ----------
+    paths : iterable of str
+        The filenames of the FITS files to scan.
+
+    keywords : iterable of str
+        The keywords whose values should be returned for each file.
+
+    ext : int, str, or (str, int) tuple, optional
+        The HDU from which to read the keywords, given either as an HDU
+        index, an ``EXTNAME``, or an ``(EXTNAME, EXTVER)`` tuple
+        (default: 0, the primary HDU).
+
+    default : optional
+        The value returned for a keyword that is missing from a header
+        (default: `None`).
+
+    workers : int, optional
+        The number of files to scan concurrently.  By default the files are
+        scanned serially in the calling thread.
+
+    pool : str, optional
+        Either ``'thread'`` (the default) to scan files with a pool of
+        ``workers`` threads, or ``'process'`` to use a pool of ``workers``
+        processes.
+
+    ignore_errors : bool, optional
+        If `True`, files that cannot be read, or that do not contain the
+        requested extension, are returned with the ``default`` value for
+        every keyword instead of raising an exception (default: `False`).
+
+    as_array : bool, optional
+        If `True`, return a Numpy structured array with a ``'filename'``
+        field followed by one field per keyword, instead of an iterator
+        (default: `False`).  The type of each field is determined from the
+        values read for that keyword; fields containing values of more than
+        one type (including missing values) have the ``object`` type.
+
+    Returns
+    -------
+    rows : iterator or `numpy.ndarray`
+        By default, an iterator yielding a ``(filename, value1, value2,
+        ...)`` tuple for each file, in the same order as ``paths``.  Results
+        are yielded as soon as they are available, so this can be used to
+        stream results from a very large number of files.
+
+    Examples
+    --------
+    >>> for row in pyfits.scan_headers(filenames, ['OBJECT', 'EXPTIME'],
+    ...                                workers=8):
+    ...     print(row)
+    """
+
+    if isinstance(keywords, string_types):
+        keywords = [keywords]
+    keywords = list(keywords)
+
+    if isinstance(paths, string_types):
+        paths = [paths]
+
+    args = ((path, keywords, ext, default, ignore_errors) for path in paths)
+    rows = _map_parallel(_scan_header_file, args, workers=workers, pool=pool)
+
+    if not as_array:
+        return rows
+
+    rows = list(rows)
+    columns = []
+    for idx in range(len(keywords) + 1):
+        values = [row[idx] for row in rows]
+        if len(set(type(value) for value in values)) > 1:
+            columns.append(np.array(values, dtype=object))
+        else:
+            columns.append(np.array(values))
+
+    formats = [column.dtype for column in columns]
+
+    names = ['filename'] + keywords
+    array = np.empty(len(rows), dtype={'names': names, 'formats': formats})
+    for name, column in zip(names, columns):
+        array[name] = column
+    return array
+
+
+def extract(filename, output, exts, renumber_extver=False, clobber=False):
+    """
+    Write a selection of the HDUs in a FITS file to a new file.
+
+    This is equivalent to ``concatenate([filename], output, exts)``; see
+    `concatenate` for details.
+
+    Parameters
+    ----------
+    filename : str
+        The file from which to extract HDUs.
+
+    output : str
+        The name of the new file.
+
+    exts : sequence
+        The HDUs to extract, in the order in which they are to be written,
+        each given as an HDU index, an ``EXTNAME``, or an ``(EXTNAME,
+        EXTVER)`` tuple.
+
+    renumber_extver : bool, optional
+        If `True`, renumber the ``EXTVER`` of the HDUs written with each
+        ``EXTNAME`` from 1 (default: `False`).
+
+    clobber : bool, optional
+        If `True`, overwrite ``output`` if it already exists.
+
+    Examples
+    --------
+    >>> pyfits.extract('image.fits', 'sci.fits', [('SCI', 1), ('SCI', 2)])
+    """
+
+    concatenate([filename], output, exts, renumber_extver=renumber_extver,
+                clobber=clobber)
+
+
+def concatenate(inputs, output, exts=None, renumber_extver=False,
+                clobber=False, workers=None, pool='thread'):
+    """
+    Write the HDUs from a number of FITS files to a single new file.
+
+    This is much faster than opening each file with `pyfits.open` and writing
+    the HDUs out with `HDUList.writeto`: only the header blocks of the input
+    files are read, nothing is verified, only the header cards that must
+    change are modified, and the data of each HDU is copied as raw bytes
+    (by the kernel where the operating system supports it).
+
+    The headers of the HDUs are changed only as needed for their new place
+    in the output file:
+
+    - If the first HDU written is an image extension it is converted to a
+      primary HDU (``XTENSION`` is replaced with ``SIMPLE``, and ``PCOUNT``
+      and ``GCOUNT`` are removed).  If it is a table, an empty primary HDU is
+      written before it.
+    - Primary HDUs written after the first HDU are converted to image
+      extensions.  Random groups HDUs can only be written as the first HDU.
+    - ``EXTEND = T`` is set in the primary HDU.
+    - ``EXTVER`` is renumbered if ``renumber_extver`` is `True`.
+    - ``CHECKSUM`` (if present) is updated in any header that was modified.
+
+    Parameters
+    ----------
+    inputs : iterable of str
+        The files to read HDUs from, in the order in which their HDUs are to
+        be written.
+
+    output : str
+        The name of the new file.
+
+    exts : sequence, optional
+        The HDUs to take from each input file, each given as an HDU index, an
+        ``EXTNAME``, or an ``(EXTNAME, EXTVER)`` tuple.  By default all HDUs
+        are taken from each file, except that primary HDUs without data are
+        skipped in all but the first file.
+
+    renumber_extver : bool, optional
+        If `True`, renumber the ``EXTVER`` of the HDUs written with each
+        ``EXTNAME`` from 1, in the order in which they are written (and add
+        an ``EXTVER`` card to those that do not have one).
+
+    clobber : bool, optional
+        If `True`, overwrite ``output`` if it already exists.
+
+    workers : int, optional
+        The number of input files to read and copy concurrently.  By default
+        the files are processed serially in the calling thread.
+
+    pool : str, optional
+        Either ``'thread'`` (the default) or ``'process'``; see
+        `scan_headers`.
+
+    Examples
+    --------
+    Take the first 64 ``SCI`` extensions from each of a number of files::
+
+        >>> pyfits.concatenate(filenames, 'sci.fits',
+        ...                    [('SCI', idx) for idx in range(1, 65)],
+        ...                    renumber_extver=True, workers=8)
+    """
+
+    if isinstance(inputs, string_types):
+        inputs = [inputs]
+    inputs = list(inputs)
+
+    if os.path.exists(output) and os.path.getsize(output) != 0:
+        if not clobber:
+            raise IOError('File %r already exists.' % output)
+        warnings.warn('Overwriting existing file %r.' % output)
+
+    args = [(filename, exts, idx == 0) for idx, filename in enumerate(inputs)]
+    scanned = list(_map_parallel(_scan_raw_hdus, args, workers=workers,
+                                 pool=pool))
+
+    # Work out the new headers and the location of every HDU in the output,
+    # grouped by input file
+    jobs = []
+    offset = 0
+    extvers = {}
+    for filename, hdus in scanned:
+        items = []
+        for header_offset, cards, data_offset, data_size in hdus:
+            if not offset and cards[0][:8].rstrip() == 'XTENSION':
+                xtension = Card.fromstring(cards[0]).value
+                if xtension.strip().upper() != 'IMAGE':
+                    primary = [card.image
+                               for card in PrimaryHDU().header.cards]
+                    items.append((offset, None, primary, None, 0))
+                    offset += _raw_header_size(primary)
+
+            extver = None
+            if renumber_extver:
+                extname = _raw_card_value(cards, 'EXTNAME')
+                if isinstance(extname, string_types):
+                    extname = extname.strip().upper()
+                    extver = extvers[extname] = extvers.get(extname, 0) + 1
+
+            new_cards = _raw_convert_header(cards, not offset, extver)
+            items.append((offset, header_offset, new_cards, data_offset,
+                          data_size))
+            if new_cards is None:
+                offset += data_offset - header_offset
+            else:
+                offset += _raw_header_size(new_cards)
+            offset += data_size + _pad_length(data_size)
+
+        jobs.append((filename, output, items))
+
+    # Allocate the whole file up front, so that the HDUs from each input file
+    # can be written independently
+    f = open(output, 'wb')
+    try:
+        f.truncate(offset)
+    finally:
+        f.close()
+
+    for _ in _map_parallel(_copy_raw_hdus, jobs, workers=workers, pool=pool):
+        pass
+
+
 def setval(filename, keyword, *args, **kwargs):
     """
     Set a keyword's value from a header in a FITS file.
@@ -268,6 +529,11 @@ def setval(filename, keyword, *args, **kwargs):
     function is a much less efficient approach compared with opening
     the file for update, modifying the header, and closing the file.
 
+    When ``filename`` is the path to an uncompressed file, and the updated
+    header still fits in the same number of header blocks, the modified
+    cards are written directly into the file without parsing the rest of the
+    file.  If the header contains a ``CHECKSUM`` card it is updated as well.
+
     Parameters
     ----------
     filename : file path, file object, or file like object
@@ -319,7 +585,14 @@ def setval(filename, keyword, *args, **kwargs):
     after = kwargs.pop('after', None)
     savecomment = kwargs.pop('savecomment', False)
 
-    hdulist, extidx = _getext(filename, 'update', *args, **kwargs)
+    extidx = _parse_ext_args(args, kwargs)
+
+    if (before is None and after is None and
+            _setval_inplace(filename, extidx, keyword, value, comment,
+                            savecomment, kwargs)):
+        return
+
+    hdulist = fitsopen(filename, mode='update', **kwargs)
     if keyword in hdulist[extidx].header and savecomment:
         comment = None
     hdulist[extidx].header.set(keyword, value, comment, before, after)
@@ -330,6 +603,10 @@ def delval(filename, keyword, *args, **kwargs):
     """
     Delete all instances of keyword from a header in a FITS file.
 
+    As with `setval`, when ``filename`` is the path to an uncompressed file
+    the header is modified directly in the file, along with its ``CHECKSUM``
+    card if present.
+
     Parameters
     ----------
 
@@ -355,7 +632,12 @@ def delval(filename, keyword, *args, **kwargs):
     if 'do_not_scale_image_data' not in kwargs:
         kwargs['do_not_scale_image_data'] = True
 
-    hdulist, extidx = _getext(filename, 'update', *args, **kwargs)
+    extidx = _parse_ext_args(args, kwargs)
+
+    if _delval_inplace(filename, extidx, keyword, kwargs):
+        return
+
+    hdulist = fitsopen(filename, mode='update', **kwargs)
     del hdulist[extidx].header[keyword]
     hdulist.close()
 
@@ -678,6 +960,21 @@ def _getext(filename, mode, *args, **kwargs):
     :func:`getdata()` documentation for the different possibilities.
     """
 
+    ext = _parse_ext_args(args, kwargs)
+    hdulist = fitsopen(filename, mode=mode, **kwargs)
+
+    return hdulist, ext
+
+
+def _parse_ext_args(args, kwargs):
+    """
+    Determine the extension specified by the positional arguments ``args``
+    and the ``ext``, ``extname``, and ``extver`` keyword arguments (which are
+    removed from ``kwargs``) to a convenience function.
+
+    Returns either an extension index or an ``(extname, extver)`` tuple.
+    """
+
     ext = kwargs.pop('ext', None)
     extname = kwargs.pop('extname', None)
     extver = kwargs.pop('extver', None)
@@ -739,9 +1036,566 @@ def _getext(filename, mode, *args, **kwargs):
     elif extver and extname is None:
         raise TypeError('extver alone cannot specify an extension.')
 
-    hdulist = fitsopen(filename, mode=mode, **kwargs)
+    return ext
 
-    return hdulist, ext
+
+def _find_raw_hdu(fileobj, ext, hdus=None):
+    """
+    Find the HDU specified by ``ext`` (an HDU index, an ``EXTNAME``, or an
+    ``(EXTNAME, EXTVER)`` tuple) in the given file without reading any data,
+    and return its ``(header_offset, header, data_offset, data_size)`` as
+    given by `_iter_raw_hdus`.  If no such HDU exists raises `IndexError` for
+    an index, or `KeyError` for an ``EXTNAME`` or ``(EXTNAME, EXTVER)``.
+
+    If the raw HDUs of the file have already been read they may be given as
+    ``hdus`` instead of the file.
+    """
+
+    if isinstance(ext, string_types):
+        ext = (ext, None)
+
+    if hdus is None:
+        hdus = _iter_raw_hdus(fileobj)
+
+    for idx, hdu in enumerate(hdus):
+        if _is_int(ext):
+            if idx == ext:
+                return hdu
+            continue
+
+        header = hdu[1]
+        key = ext[0].strip().upper()
+        name = header.get('EXTNAME', '')
+        if not isinstance(name, string_types):
+            name = ''
+        # 'PRIMARY' should always work as a reference to the first HDU, as it
+        # does in HDUList.index_of
+        if ((name.strip().upper() == key or (key == 'PRIMARY' and idx == 0))
+                and (ext[1] is None or header.get('EXTVER', 1) == ext[1])):
+            return hdu
+
+    if _is_int(ext):
+        raise IndexError('Extension %s is out of bound or not found.' % ext)
+    raise KeyError('Extension %r not found.' % (ext,))
+
+
+def _scan_header_file(args):
+    """
+    Worker for `scan_headers`; returns the row for a single file.
+    """
+
+    filename, keywords, ext, default, ignore_errors = args
+
+    try:
+        fileobj = _File(filename, mode='readonly')
+        try:
+            header = _find_raw_hdu(fileobj, ext)[1]
+            values = [header.get(keyword, default) for keyword in keywords]
+        finally:
+            fileobj.close()
+    except Exception:
+        if not ignore_errors:
+            raise
+        values = [default] * len(keywords)
+
+    return tuple([filename] + values)
+
+
+def _scan_raw_hdus(args):
+    """
+    Worker for `concatenate`; returns the name of an input file and a list
+    of the ``(header_offset, cards, data_offset, data_size)`` of each HDU to
+    take from it, where ``cards`` is the list of card images in its header
+    and ``data_size`` includes no padding.
+    """
+
+    filename, exts, first = args
+
+    fileobj = _File(filename, mode='readonly')
+    try:
+        hdus = list(_iter_raw_hdus(fileobj))
+    finally:
+        fileobj.close()
+
+    if exts is None:
+        selected = [hdu for idx, hdu in enumerate(hdus)
+                    if first or idx or hdu[3]]
+    else:
+        selected = [_find_raw_hdu(None, ext, hdus) for ext in exts]
+
+    return filename, [(header_offset, _raw_header_cards(header), data_offset,
+                       data_size)
+                      for header_offset, header, data_offset, data_size
+                      in selected]
+
+
+def _copy_raw_hdus(args):
+    """
+    Worker for `concatenate`; writes the headers and copies the data of the
+    HDUs taken from one input file into their places in the output file.
+    """
+
+    filename, output, items = args
+
+    src = _File(filename, mode='readonly')
+    try:
+        dst = _File(output, mode='update')
+        try:
+            for (offset, header_offset, cards, data_offset,
+                    data_size) in items:
+                dst.seek(offset)
+                if cards is None:
+                    # The header is unchanged
+                    src.copy_to(dst, header_offset,
+                                data_offset - header_offset)
+                else:
+                    nslots = _raw_header_size(cards) // Card.length
+                    if header_offset is not None:
+                        _raw_update_checksum(src, header_offset, cards,
+                                             nslots)
+                    dst.write(encode_ascii(_format_raw_header(cards, nslots)))
+
+                if data_size:
+                    src.copy_to(dst, data_offset,
+                                data_size + _pad_length(data_size))
+            dst.flush()
+        finally:
+            dst.close()
+    finally:
+        src.close()
+
+
+def _raw_convert_header(cards, primary, extver=None):
+    """
+    Returns a modified copy of the list of header card images ``cards`` for
+    an HDU that is to be written as the primary HDU of a file if ``primary``
+    is `True`, or as an extension otherwise, and with the given ``EXTVER``
+    if ``extver`` is not `None`.  Returns `None` if no changes are needed.
+    """
+
+    cards = list(cards)
+    orig = list(cards)
+    is_primary = cards[0][:8].rstrip() == 'SIMPLE'
+    naxis = _raw_card_value(cards, 'NAXIS')
+
+    def last_axis():
+        idx = _raw_card_index(cards, 'NAXIS%d' % naxis)
+        if idx is None:
+            idx = _raw_card_index(cards, 'NAXIS')
+        return idx
+
+    if primary and not is_primary:
+        xtension = Card.fromstring(cards[0]).value
+        if xtension.strip().upper() != 'IMAGE':
+            raise ValueError('%s extensions can not be converted to primary '
+                             'HDUs.' % xtension.strip())
+        cards[0] = Card('SIMPLE', True, 'conforms to FITS standard').image
+        _raw_remove_card(cards, 'PCOUNT')
+        _raw_remove_card(cards, 'GCOUNT')
+    elif not primary and is_primary:
+        if _raw_card_value(cards, 'GROUPS') is True:
+            raise ValueError('Random groups HDUs can only be written as the '
+                             'primary HDU.')
+        cards[0] = Card('XTENSION', 'IMAGE', 'Image extension').image
+        _raw_remove_card(cards, 'EXTEND')
+        idx = last_axis()
+        _raw_set_card(cards, Card('PCOUNT', 0, 'number of parameters'), idx)
+        _raw_set_card(cards, Card('GCOUNT', 1, 'number of groups'), idx + 1)
+
+    if primary and _raw_card_value(cards, 'EXTEND') is not True:
+        _raw_set_card(cards, Card('EXTEND', True), last_axis())
+
+    if extver is not None and _raw_card_value(cards, 'EXTVER') != extver:
+        _raw_set_card(cards, Card('EXTVER', extver, 'extension value'),
+                      _raw_card_index(cards, 'EXTNAME'))
+
+    if cards == orig:
+        return None
+    return cards
+
+
+def _raw_card_index(cards, keyword):
+    """
+    Returns the index of the first card with the given keyword in a list of
+    card images, or `None`.
+    """
+
+    for idx, image in enumerate(cards):
+        if image[:8].rstrip() == keyword:
+            return idx
+
+
+def _raw_card_value(cards, keyword):
+    """
+    Returns the value of the first card with the given keyword in a list of
+    card images, or `None`.
+    """
+
+    idx = _raw_card_index(cards, keyword)
+    if idx is not None:
+        return Card.fromstring(cards[idx]).value
+
+
+def _raw_set_card(cards, card, after):
+    """
+    Replaces the card with the same keyword as ``card`` in a list of card
+    images; if there is no such card it is inserted after the card at index
+    ``after``, using up a blank card from the end of the header if there is
+    one.
+    """
+
+    idx = _raw_card_index(cards, card.keyword)
+    if idx is not None:
+        cards[idx] = card.image
+        return
+
+    cards.insert(after + 1, card.image)
+    if not cards[-1].strip():
+        del cards[-1]
+
+
+def _raw_remove_card(cards, keyword):
+    idx = _raw_card_index(cards, keyword)
+    if idx is not None:
+        del cards[idx]
+
+
+def _raw_header_size(cards):
+    """
+    Returns the size in bytes of a header containing the given card images
+    (plus an END card).
+    """
+
+    size = (len(cards) + 1) * Card.length
+    return size + _pad_length(size)
+
+
+def _raw_update_checksum(fileobj, header_offset, cards, nslots):
+    """
+    Updates the value of the ``CHECKSUM`` card, if any, in the modified card
+    images ``cards`` of the header of the HDU at ``header_offset`` in the
+    given file.
+    """
+
+    idx = _raw_card_index(cards, 'CHECKSUM')
+    if idx is None:
+        return
+
+    fileobj.seek(header_offset)
+    hdu = next(_iter_raw_hdus(fileobj))
+    checksum_card = Card.fromstring(cards[idx])
+    cards[idx] = Card('CHECKSUM', '0' * 16, checksum_card.comment).image
+    checksum = _raw_hdu_checksum(fileobj, hdu,
+                                 _format_raw_header(cards, nslots))
+    cards[idx] = Card('CHECKSUM', _char_encode(~checksum),
+                      checksum_card.comment).image
+
+
+# Keywords that describe the structure of an HDU's data, and that should not
+# be modified without also (potentially) modifying the data
+_STRUCTURAL_KEYWORDS = set(['SIMPLE', 'XTENSION', 'BITPIX', 'NAXIS', 'PCOUNT',
+                            'GCOUNT', 'GROUPS', 'END', 'CHECKSUM', 'DATASUM'])
+
+
+def _setval_inplace(filename, ext, keyword, value, comment, savecomment,
+                    kwargs):
+    """
+    Implements `setval` by rewriting only the affected cards in the file.
+
+    Returns `False` without modifying the file if this is not possible, in
+    which case the caller should fall back on updating the file through a
+    normal `HDUList`.
+    """
+
+    if not _inplace_supported(filename, keyword, kwargs):
+        return False
+
+    fileobj = _File(filename, mode='update')
+    try:
+        if fileobj.compression:
+            return False
+
+        try:
+            hdu = _find_raw_hdu(fileobj, ext)
+        except (IndexError, KeyError, IOError, ValueError):
+            return False
+
+        header = hdu[1]
+        cards = _raw_header_cards(header)
+        if cards is None:
+            return False
+
+        offsets = header.card_offsets(keyword)
+        if offsets:
+            offset = offsets[0]
+            old_card = _raw_card(header, offset)
+            if old_card is None:
+                return False
+            if value is None:
+                value = old_card.value
+            if comment is None or savecomment:
+                comment = old_card.comment
+            card = Card(keyword, value, comment)
+            idx = offset // Card.length
+        elif value is None:
+            return False
+        else:
+            card = Card(keyword, value, comment)
+            idx = _raw_insert_card(cards, None)
+
+        image = card.image
+        if len(image) != Card.length:
+            # The new card would require CONTINUE cards
+            return False
+        cards[idx] = image
+
+        return _write_raw_header(fileobj, hdu, cards)
+    finally:
+        fileobj.close()
+
+
+def _delval_inplace(filename, ext, keyword, kwargs):
+    """
+    Implements `delval` by rewriting only the affected part of the header in
+    the file.  See `_setval_inplace`.
+    """
+
+    if not _inplace_supported(filename, keyword, kwargs):
+        return False
+
+    fileobj = _File(filename, mode='update')
+    try:
+        if fileobj.compression:
+            return False
+
+        try:
+            hdu = _find_raw_hdu(fileobj, ext)
+        except (IndexError, KeyError, IOError, ValueError):
+            return False
+
+        header = hdu[1]
+        cards = _raw_header_cards(header)
+        offsets = header.card_offsets(keyword)
+        if cards is None or not offsets:
+            return False
+
+        for offset in reversed(offsets):
+            if _raw_card(header, offset) is None:
+                return False
+            del cards[offset // Card.length]
+
+        return _write_raw_header(fileobj, hdu, cards)
+    finally:
+        fileobj.close()
+
+
+def _inplace_supported(filename, keyword, kwargs):
+    """
+    Determine whether the given keyword in the given file may be modified in
+    place by `setval` or `delval`.
+    """
+
+    if (not isinstance(filename, string_types) or
+            not os.path.isfile(filename)):
+        return False
+
+    # Any options to pyfits.open other than do_not_scale_image_data may affect
+    # how the file is updated
+    if set(kwargs) - set(['do_not_scale_image_data']):
+        return False
+
+    if not isinstance(keyword, string_types):
+        return False
+
+    # Only standard FITS keywords are supported; HIERARCH keywords, record-
+    # valued keywords, and wildcard patterns are not
+    keyword = keyword.upper()
+    if (len(keyword) > KEYWORD_LENGTH or
+            not Card._keywd_FSC_RE.match(keyword)):
+        return False
+
+    if (keyword in Card._commentary_keywords or
+            keyword.rstrip('0123456789') in _STRUCTURAL_KEYWORDS):
+        return False
+
+    return True
+
+
+def _raw_header_cards(header):
+    """
+    Returns a list of the 80 character card images in a `_BasicHeader`, not
+    including the ``END`` card.
+    """
+
+    if header.end_offset is None:
+        return None
+
+    raw = header.tostring()
+    return [raw[idx:idx + Card.length]
+            for idx in range(0, header.end_offset, Card.length)]
+
+
+def _raw_insert_card(cards, image):
+    """
+    Insert a new card image into a list of card images (as returned by
+    `_raw_header_cards`), following the same logic as `Header.append` to
+    determine where the new card goes--including using up a blank card from
+    the end of the header if there is one.
+
+    Returns the index of the new card.
+    """
+
+    idx = len(cards) - 1
+    while idx >= 0 and not cards[idx].strip():
+        idx -= 1
+    while idx >= 0 and cards[idx][:8].rstrip() in ('COMMENT', 'HISTORY', ''):
+        idx -= 1
+    idx += 1
+    if cards and not cards[-1].strip():
+        del cards[-1]
+    cards.insert(idx, image)
+    return idx
+
+
+def _raw_card(header, offset):
+    """
+    Returns the `Card` at the given offset in a `_BasicHeader`, or `None` if
+    it is not a card that can be modified in place (a card with ``CONTINUE``
+    cards or a record-valued keyword card).
+    """
+
+    image = header.card_image(offset)
+    if len(image) != Card.length:
+        return None
+
+    card = Card.fromstring(image)
+    if card.field_specifier is not None:
+        return None
+
+    return card
+
+
+def _write_raw_header(fileobj, hdu, cards, datasum=None):
+    """
+    Write the modified card images of the header of a raw HDU (as returned by
+    `_find_raw_hdu`) back to the file, along with an updated ``CHECKSUM``
+    card if there is one.  Only the cards that differ from the original
+    header are written.  If the datasum of the HDU is already known it may be
+    given as ``datasum`` (see `_raw_hdu_checksum`).
+
+    Returns `False` without writing anything if the new header would not fit
+    in the original header's blocks.
+    """
+
+    header_offset, header, data_offset, data_size = hdu
+    old_header = header.tostring()
+    nslots = len(old_header) // Card.length
+
+    if len(cards) + 1 > nslots:
+        return False
+
+    # If the header shrank, pad it out with blank cards before the END card
+    # if necessary, so that it still occupies the same number of blocks and
+    # the data does not need to be moved
+    padding = nslots - len(cards) - 1
+    if padding >= BLOCK_SIZE // Card.length:
+        cards.extend([' ' * Card.length] *
+                     (padding - BLOCK_SIZE // Card.length + 1))
+
+    checksum_idx = None
+    for idx, image in enumerate(cards):
+        if image[:8] == 'CHECKSUM':
+            checksum_idx = idx
+            break
+
+    if checksum_idx is not None:
+        checksum_card = Card.fromstring(cards[checksum_idx])
+        cards[checksum_idx] = Card('CHECKSUM', '0' * 16,
+                                   checksum_card.comment).image
+        checksum = _raw_hdu_checksum(fileobj, hdu,
+                                     _format_raw_header(cards, nslots),
+                                     datasum)
+        cards[checksum_idx] = Card('CHECKSUM', _char_encode(~checksum),
+                                   checksum_card.comment).image
+
+    new_header = _format_raw_header(cards, nslots)
+
+    # Write out each run of changed cards
+    start = None
+    for offset in range(0, len(new_header) + 1, Card.length):
+        changed = (offset < len(new_header) and
+                   (new_header[offset:offset + Card.length] !=
+                    old_header[offset:offset + Card.length]))
+        if changed and start is None:
+            start = offset
+        elif not changed and start is not None:
+            fileobj.seek(header_offset + start)
+            fileobj.write(encode_ascii(new_header[start:offset]))
+            start = None
+
+    fileobj.flush()
+    return True
+
+
+def _raw_hdu_checksum(fileobj, hdu, new_header, datasum=None):
+    """
+    Compute the checksum of a raw HDU (as returned by `_find_raw_hdu`) whose
+    header is being replaced with ``new_header`` (in which the ``CHECKSUM``
+    card has a value of all zeros).
+
+    If the datasum of the HDU is given, or the HDU has a ``DATASUM`` card, it
+    is combined with the sum of the new header.  Otherwise the checksum is updated incrementally from the value of
+    the original ``CHECKSUM`` card, by subtracting the sum of the original
+    header and adding that of the new header, so that the data need not be
+    read.  The data is only read if neither is possible.
+    """
+
+    header_offset, header, data_offset, data_size = hdu
+    new_header = np.fromstring(encode_ascii(new_header), dtype='ubyte')
+
+    if datasum is not None:
+        return _compute_checksum(new_header, datasum)
+
+    try:
+        return _compute_checksum(new_header, int(header['DATASUM']))
+    except (KeyError, ValueError):
+        pass
+
+    old_value = header.get('CHECKSUM')
+    try:
+        old_sum = ~_char_decode(old_value)
+    except (TypeError, ValueError):
+        old_sum = None
+
+    if old_sum is not None:
+        # The original checksum was computed with its own value zeroed out
+        offset = header.card_offsets('CHECKSUM')[0]
+        old_header = header.tostring()
+        image = old_header[offset:offset + Card.length]
+        old_header = (old_header[:offset] +
+                      image.replace(old_value, '0' * 16, 1) +
+                      old_header[offset + Card.length:])
+        old_header = np.fromstring(encode_ascii(old_header), dtype='ubyte')
+        return _checksum_add(_checksum_sub(old_sum,
+                                           _compute_checksum(old_header)),
+                             _compute_checksum(new_header))
+
+    datasum = 0
+    if data_size:
+        datasum = _compute_checksum(
+            fileobj.readarray(data_size + _pad_length(data_size),
+                              offset=data_offset))
+    return _compute_checksum(new_header, datasum)
+
+
+def _format_raw_header(cards, nslots):
+    """
+    Join a list of card images, followed by an END card, into a header string
+    of ``nslots`` cards.
+    """
+
+    header_str = ''.join(cards) + END_CARD
+    return header_str + ' ' * (nslots * Card.length - len(header_str))
 
 
 def _makehdu(data, header):
@@ -42,6 +42,7 @@ from . import column
 from . import convenience
 from . import diff
 from . import hdu
+from . import storage
 
 # Relative imports of * are not syntactically valid in Python 2.5
 from pyfits.card import *
@@ -50,9 +51,11 @@ from pyfits.convenience import *
 from pyfits.diff import *
 from pyfits.fitsrec import FITS_record, FITS_rec
 from pyfits.hdu import *
+from pyfits.storage import *
 from pyfits.util import (PyfitsDeprecationWarning,
                          PyfitsPendingDeprecationWarning)
 
+from .file import ParallelGzipFile
 from .hdu.hdulist import fitsopen as open
 from .hdu.image import Section
 from .hdu.table import new_table
@@ -83,11 +86,11 @@ for varname, default in GLOBALS:
 
 
 __all__ = (card.__all__ + column.__all__ + convenience.__all__ + diff.__all__ +
-           hdu.__all__ +
+           hdu.__all__ + storage.__all__ +
            ['FITS_record', 'FITS_rec', 'open', 'Section', 'new_table',
             'Header', 'VerifyError', 'PyfitsDeprecationWarning',
             'PyfitsPendingDeprecationWarning', 'ignore_deprecation_warnings',
-            'TRUE', 'FALSE'] + [g[0] for g in GLOBALS])
+            'ParallelGzipFile', 'TRUE', 'FALSE'] + [g[0] for g in GLOBALS])
 
 
 # These are of course deprecated, but a handful of external code still uses
@@ -1,22 +1,29 @@
 from __future__ import division, with_statement
 
+import bisect
 import gzip
 import mmap
 import os
+import struct
 import sys
 import tempfile
+import threading
+import time
 import warnings
+import weakref
 import zipfile
+import zlib
 
 import numpy as np
-from numpy import memmap as Memmap
 
-from .extern.six import b, string_types
+from .extern.six import b, string_types, text_type
 from .extern.six.moves import urllib, reduce
 
+from .storage import StorageBackend, HTTPBackend, _BackendFile
 from .util import (isreadable, iswritable, isfile, fileobj_open, fileobj_name,
                    fileobj_closed, fileobj_mode, _array_from_file,
-                   _array_to_file, _write_string, encode_ascii)
+                   _array_to_file, _write_string, encode_ascii,
+                   _fileobj_is_append_mode)
 
 
 # Maps PyFITS-specific file mode names to the appropriate file modes to use
@@ -55,6 +62,18 @@ FILE_MODES = {
 MEMMAP_MODES = {'readonly': 'c', 'copyonwrite': 'c', 'update': 'r+',
                 'append': 'c', 'denywrite': 'r'}
 
+# Maps the numpy.memmap modes used in MEMMAP_MODES to mmap access modes
+MMAP_ACCESS_MODES = {'c': mmap.ACCESS_COPY, 'r+': mmap.ACCESS_WRITE,
+                     'r': mmap.ACCESS_READ}
+
+# The access pattern hints accepted by _File (and pyfits.open), mapped to the
+# names of the corresponding posix_fadvise and madvise advice constants
+ACCESS_MODES = {'sequential': 'SEQUENTIAL', 'random': 'RANDOM',
+                'willneed': 'WILLNEED'}
+
+# The buffer size used for files opened for sequential access
+SEQUENTIAL_BUFFER_SIZE = 2 ** 20
+
 # TODO: Eventually raise a warning, and maybe even later disable the use of
 # 'copyonwrite' and 'denywrite' modes unless memmap=True.  For now, however,
 # that would generate too many warnings for too many users.  If nothing else,
@@ -63,6 +82,11 @@ MEMMAP_MODES = {'readonly': 'c', 'copyonwrite': 'c', 'update': 'r+',
 GZIP_MAGIC = b('\x1f\x8b\x08')
 PKZIP_MAGIC = b('\x50\x4b\x03\x04')
 
+# The ID of the gzip header extra subfield giving the compressed and
+# uncompressed sizes of each member of a file written by ParallelGzipFile with
+# indexed=True
+GZIP_INDEX_SUBFIELD = b('PF')
+
 
 class _File(object):
     """
@@ -72,7 +96,42 @@ class _File(object):
     # See self._test_mmap
     _mmap_available = None
 
-    def __init__(self, fileobj=None, mode=None, memmap=False, clobber=False):
+    # The largest read made at a time by _preadinto when os.preadv is not
+    # available
+    _pread_chunk_size = 2 ** 24
+
+    # The size of each read made by background prefetching; see prefetch
+    _prefetch_chunk_size = 2 ** 20
+
+    # The size of each read made by copy_to when the copy can not be made by
+    # the kernel
+    _copy_chunk_size = 2880 * 2 ** 10
+
+    def __init__(self, fileobj=None, mode=None, memmap=False, clobber=False,
+                 member=None, access=None):
+        if access is not None and access not in ACCESS_MODES:
+            raise ValueError('access must be one of %s, or None' %
+                             ', '.join(sorted(ACCESS_MODES)))
+
+        self.access = access
+
+        # The mmap of the file shared by all arrays read from it when memmap is
+        # enabled in a mode that is not copy-on-write, and weak references to
+        # the arrays using it, keyed by their ids; see _get_mmap
+        self._mmap = None
+        self._mmap_views = {}
+
+        # The thread, if any, reading ahead in the file; see prefetch
+        self._prefetch_thread = None
+
+        # The number of bytes written to this file by copy_to, either by the
+        # kernel or by reading and writing in chunks
+        self.copy_stats = {'kernel': 0, 'chunked': 0}
+
+        # Serializes access to the file position where positional reads are
+        # not possible; see pread
+        self._lock = threading.RLock()
+
         if fileobj is None:
             self.__file = None
             self.closed = False
@@ -109,8 +168,20 @@ class _File(object):
             try:
                 if not os.path.splitdrive(fileobj)[0]:
                     # Basically if the filename (on Windows anyways) doesn't
-                    # have a drive letter try to open it as a URL
-                    self.name, _ = urllib.request.urlretrieve(fileobj)
+                    # have a drive letter try to open it as a URL; files
+                    # opened for reading over HTTP are read on demand with
+                    # range requests, if the server supports them.  Otherwise
+                    # the entire file is downloaded
+                    if (mode in ('readonly', 'copyonwrite', 'denywrite') and
+                            _is_http_url(fileobj)):
+                        backend = HTTPBackend(fileobj)
+                        if backend.accepts_ranges:
+                            fileobj = backend
+
+                    if isinstance(fileobj, StorageBackend):
+                        self.name = fileobj.name
+                    else:
+                        self.name, _ = urllib.request.urlretrieve(fileobj)
                 else:
                     # Otherwise the file was already not found so just raise
                     # a ValueError
@@ -136,14 +207,16 @@ class _File(object):
         self.writeonly = False
 
         # Initialize the internal self.__file object
-        if _is_random_access_file_backed(fileobj):
+        if isinstance(fileobj, StorageBackend):
+            self._open_backend(fileobj, mode, clobber)
+        elif _is_random_access_file_backed(fileobj):
             self._open_fileobj(fileobj, mode, clobber)
         elif isinstance(fileobj, string_types):
-            self._open_filename(fileobj, mode, clobber)
+            self._open_filename(fileobj, mode, clobber, member)
         else:
-            self._open_filelike(fileobj, mode, clobber)
+            self._open_filelike(fileobj, mode, clobber, member)
 
-        if isinstance(fileobj, gzip.GzipFile):
+        if isinstance(fileobj, (gzip.GzipFile, ParallelGzipFile)):
             self.compression = 'gzip'
         elif isinstance(fileobj, zipfile.ZipFile):
             # Reading from zip files is supported but not writing (yet)
@@ -170,13 +243,21 @@ class _File(object):
             self.__file.seek(pos)
 
         if self.memmap:
-            if not isfile(self.__file):
+            if isinstance(self.__file, _FileRegion):
+                # Members stored without compression in a zip file can be
+                # mapped directly from the archive
+                if not isfile(self.__file.fileobj):
+                    self.memmap = False
+            elif not isfile(self.__file):
                 self.memmap = False
             elif not self.readonly and not self._test_mmap():
                 # Test mmap.flush--see
                 # https://github.com/astropy/astropy/issues/968
                 self.memmap = False
 
+        if self.access is not None:
+            self._advise(0, 0)
+
     def __repr__(self):
         return '<%s.%s %s>' % (self.__module__, self.__class__.__name__,
                                self.__file)
@@ -246,18 +327,419 @@ class _File(object):
             shape = (1,)
 
         if self.memmap:
-            return Memmap(self.__file, offset=offset,
-                          mode=MEMMAP_MODES[self.mode], dtype=dtype,
-                          shape=shape).view(np.ndarray)
+            if isinstance(self.__file, _FileRegion):
+                offset += self.__file.offset
+            nbytes = reduce(lambda x, y: x * y, shape, dtype.itemsize)
+
+            if MEMMAP_MODES[self.mode] == 'c':
+                # In the copy-on-write modes each array gets a private mapping
+                # of its own part of the file, so that changes made through
+                # one array are not seen through other arrays of the same data
+                if sys.version_info[:2] < (2, 6):
+                    # mmap does not support offsets before Python 2.6
+                    start = 0
+                else:
+                    start = offset - offset % mmap.ALLOCATIONGRANULARITY
+                mm = self._map_file(offset + nbytes - start, start)
+                return np.ndarray(shape=shape, dtype=dtype,
+                                  offset=offset - start, buffer=mm)
+
+            # Return a view into the mmap of the whole file
+            with self._lock:
+                data = np.ndarray(shape=shape, dtype=dtype, offset=offset,
+                                  buffer=self._get_mmap(offset + nbytes))
+                views = self._mmap_views
+                ref = weakref.ref(data,
+                                  lambda ref: views.pop(id(ref), None))
+                views[id(ref)] = ref
+            return data
+        elif self._pread_fileobj() is not None:
+            data = np.empty(shape, dtype=dtype)
+            nbytes = self._preadinto(data.reshape(-1).view(np.uint8), offset)
+            if nbytes < data.nbytes:
+                raise ValueError(
+                    'Could not read %d bytes at offset %d: the file may have '
+                    'been truncated' % (data.nbytes, offset))
+            return data
         else:
             count = reduce(lambda x, y: x * y, shape)
-            pos = self.__file.tell()
-            self.__file.seek(offset)
-            data = _array_from_file(self.__file, dtype, count, '')
+            with self._lock:
+                pos = self.__file.tell()
+                self.__file.seek(offset)
+                data = _array_from_file(self.__file, dtype, count, '')
+                self.__file.seek(pos)
             data.shape = shape
-            self.__file.seek(pos)
             return data
 
+    def pread(self, size, offset):
+        """
+        Read up to ``size`` bytes starting at ``offset``, without using or
+        changing the current file position.
+
+        Where the underlying file is an OS-level file (including uncompressed
+        members of zip files) this uses ``os.pread``, so any number of threads
+        may read from the file at once.  Otherwise the read is performed with
+        seek/read while holding a lock, so that it is still safe to call from
+        multiple threads, but reads are serialized.
+        """
+
+        if isinstance(self.__file, _BackendFile):
+            # Reads from storage backends are already thread-safe
+            return self.__file.pread(size, offset)
+
+        target = self._pread_fileobj()
+        if target is None:
+            with self._lock:
+                pos = self.tell()
+                self.seek(offset)
+                data = self.read(size)
+                self.seek(pos)
+            return data
+
+        fileobj, base, limit = target
+        if limit is not None:
+            size = max(min(size, limit - offset), 0)
+
+        chunks = []
+        while size > 0:
+            chunk = os.pread(fileobj.fileno(), size, base + offset)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+            size -= len(chunk)
+
+        return b('').join(chunks)
+
+    def _preadinto(self, buf, offset):
+        """
+        Fills the writeable `numpy.uint8` array ``buf`` from the file starting
+        at ``offset`` using positional reads, and returns the number of bytes
+        read, which is less than ``len(buf)`` only on EOF.
+
+        Must only be used when `_pread_fileobj` is not `None`.
+        """
+
+        fileobj, base, limit = self._pread_fileobj()
+        size = len(buf)
+        if limit is not None:
+            size = max(min(size, limit - offset), 0)
+
+        fd = fileobj.fileno()
+        pos = 0
+        while pos < size:
+            if hasattr(os, 'preadv'):
+                nbytes = os.preadv(fd, [memoryview(buf[pos:size])],
+                                   base + offset + pos)
+            else:
+                chunk = os.pread(fd, min(size - pos, self._pread_chunk_size),
+                                 base + offset + pos)
+                nbytes = len(chunk)
+                buf[pos:pos + nbytes] = np.frombuffer(chunk, dtype=np.uint8)
+
+            if not nbytes:
+                break
+            pos += nbytes
+
+        return pos
+
+    def readinto(self, buf, offset):
+        """
+        Fills the writeable `numpy.uint8` array ``buf`` from the file starting
+        at ``offset``, and returns the number of bytes read, which is less than
+        ``len(buf)`` only on EOF.  Like `pread` this does not use or change
+        the current file position.
+
+        Where possible the data is read directly into ``buf``, without
+        passing through any intermediate buffer.
+        """
+
+        if self._pread_fileobj() is not None:
+            return self._preadinto(buf, offset)
+
+        pos = 0
+        while pos < len(buf):
+            chunk = self.pread(min(len(buf) - pos, self._pread_chunk_size),
+                               offset + pos)
+            if not chunk:
+                break
+            buf[pos:pos + len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+            pos += len(chunk)
+
+        return pos
+
+    def pwrite(self, data, offset):
+        """
+        Write ``data`` (a string or Numpy array) to the file starting at
+        ``offset``, without using or changing the current file position, and
+        return the number of bytes written.
+
+        Like `pread`, this uses ``os.pwrite`` where the underlying file is an
+        OS-level file, so that different parts of the file may be written by
+        any number of threads at once.  Otherwise the write is performed with
+        seek/write while holding a lock.
+        """
+
+        if isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data).view(np.uint8).ravel()
+        else:
+            data = encode_ascii(data)
+
+        fileobj = self._pwrite_fileobj()
+        if fileobj is None:
+            with self._lock:
+                pos = self.tell()
+                self.seek(offset)
+                if isinstance(data, np.ndarray):
+                    self.writearray(data)
+                else:
+                    self.write(data)
+                self.seek(pos)
+            return len(data)
+
+        fd = fileobj.fileno()
+        view = memoryview(data)
+        while len(view):
+            nbytes = os.pwrite(fd, view, offset)
+            view = view[nbytes:]
+            offset += nbytes
+
+        return len(data)
+
+    def _pwrite_fileobj(self):
+        """
+        Returns the OS-level file to write to if positional writes can be used
+        on this file, otherwise `None`.
+        """
+
+        if (not hasattr(os, 'pwrite') or self.simulateonly or self.readonly or
+                self.compression):
+            return None
+
+        fileobj = self.__file
+        if (not isfile(fileobj) or fileobj_closed(fileobj) or
+                _fileobj_is_append_mode(fileobj)):
+            # In append mode positional writes go to the end of the file
+            return None
+
+        # Anything still buffered for writing has to be written first, or it
+        # may later overwrite the positional write
+        fileobj.flush()
+        return fileobj
+
+    def copy_to(self, fileobj, offset, size):
+        """
+        Copies ``size`` bytes of this file starting at ``offset`` to the
+        current position of ``fileobj``, and returns the number of bytes
+        copied.  Neither file's position needs to be set beforehand, and the
+        position of this file is not changed.
+
+        When both files are uncompressed local files the copy is made by the
+        kernel with ``os.copy_file_range`` or ``os.sendfile`` where they are
+        available, so that the data does not pass through Python at all.
+        Otherwise (or if the kernel can not make the copy) the data is read
+        with positional reads and written in chunks.
+
+        ``fileobj`` should be a `_File`, but any object with a ``write``
+        method may be used; the copy is only made by the kernel if it is a
+        `_File`.
+        """
+
+        if size <= 0:
+            return 0
+
+        if isinstance(fileobj, _File):
+            if fileobj.simulateonly:
+                return size
+
+            copied = fileobj._copy_from_fd(self, offset, size)
+            fileobj.copy_stats['kernel'] += copied
+            offset += copied
+            remaining = size - copied
+        else:
+            remaining = size
+
+        while remaining > 0:
+            chunk = self.pread(min(remaining, self._copy_chunk_size), offset)
+            if not chunk:
+                raise ValueError(
+                    'Could not read %d bytes at offset %d: the file may have '
+                    'been truncated' % (remaining, offset))
+            fileobj.write(chunk)
+            offset += len(chunk)
+            remaining -= len(chunk)
+
+        if isinstance(fileobj, _File):
+            fileobj.copy_stats['chunked'] += size - copied
+
+        return size
+
+    def _copy_from_fd(self, src, offset, size):
+        """
+        Copies as much as possible of ``size`` bytes from the `_File` ``src``
+        at ``offset`` to the current position of this file using the kernel's
+        copy primitives, and returns the number of bytes copied, which may be
+        0 if a kernel copy is not possible.
+        """
+
+        copy_file_range = getattr(os, 'copy_file_range', None)
+        sendfile = getattr(os, 'sendfile', None)
+        if copy_file_range is None and sendfile is None:
+            return 0
+
+        source = src._pread_fileobj()
+        dest = self._pread_fileobj()
+        if (source is None or dest is None or dest[1] or dest[2] is not None or
+                self.readonly):
+            # The destination must be a plain file opened for writing
+            return 0
+
+        src_fileobj, base, limit = source
+        if limit is not None:
+            size = max(min(size, limit - offset), 0)
+
+        dest_fileobj = dest[0]
+        src_fd = src_fileobj.fileno()
+        dest_fd = dest_fileobj.fileno()
+        pos = dest_fileobj.tell()
+        copied = 0
+
+        try:
+            while copied < size:
+                if copy_file_range is not None:
+                    try:
+                        nbytes = copy_file_range(src_fd, dest_fd,
+                                                 size - copied,
+                                                 base + offset + copied,
+                                                 pos + copied)
+                    except OSError:
+                        # Not supported between these files (e.g. on
+                        # different filesystems on older kernels); try
+                        # sendfile instead
+                        copy_file_range = None
+                        if sendfile is None:
+                            break
+                        continue
+                else:
+                    os.lseek(dest_fd, pos + copied, os.SEEK_SET)
+                    nbytes = sendfile(dest_fd, src_fd, base + offset + copied,
+                                      size - copied)
+
+                if not nbytes:
+                    break
+                copied += nbytes
+        except OSError:
+            # Any data that was not copied is copied in chunks by copy_to
+            pass
+
+        dest_fileobj.seek(pos + copied)
+        return copied
+
+    def prefetch(self, offset, size):
+        """
+        Hints that ``size`` bytes of the file starting at ``offset`` will be
+        read soon, so that they can be read ahead of time.
+
+        Where possible the operating system is simply advised to read the
+        range into its cache.  Otherwise, for uncompressed files and files in
+        storage backends, the range is read in a background thread, filling
+        the OS (or backend block) cache.  If prefetching from an earlier call
+        is still in progress this waits for it to finish first.
+        """
+
+        if size <= 0 or self.closed or self.simulateonly or self.writeonly:
+            return
+
+        if self._advise(offset, size, 'willneed'):
+            return
+
+        if not (isinstance(self.__file, _BackendFile) or
+                self._pread_fileobj() is not None):
+            # Prefetching would require decompression or serialize other
+            # reads of the file
+            return
+
+        if self._prefetch_thread is not None:
+            self._prefetch_thread.join()
+
+        self._prefetch_thread = threading.Thread(target=self._prefetch,
+                                                 args=(offset, size))
+        self._prefetch_thread.daemon = True
+        self._prefetch_thread.start()
+
+    def _prefetch(self, offset, size):
+        end = offset + size
+        try:
+            while offset < end and not self.closed:
+                chunk = self.pread(min(end - offset, self._prefetch_chunk_size),
+                                   offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+        except (IOError, OSError, ValueError):
+            # Prefetching is only an optimization, so if the file has been
+            # closed or there are any other errors just let the read that
+            # actually needs the data report them
+            pass
+
+    def _advise(self, offset, size, access=None):
+        """
+        Passes the access pattern hint ``access`` (by default the access
+        pattern the file was opened with) to the operating system for the
+        given range of the file, with a size of 0 meaning the rest of the
+        file.  Returns `True` if the hint could be given.
+        """
+
+        if access is None:
+            access = self.access
+
+        target = self._pread_fileobj()
+        advice = getattr(os, 'POSIX_FADV_' + ACCESS_MODES[access], None)
+        if target is None or advice is None:
+            return False
+
+        fileobj, base, limit = target
+        if limit is not None:
+            size = max(min(size or limit, limit - offset), 0)
+            if not size:
+                return True
+
+        try:
+            os.posix_fadvise(fileobj.fileno(), base + offset, size, advice)
+        except OSError:
+            return False
+
+        return True
+
+    def _pread_fileobj(self):
+        """
+        If positional reads can be used on this file returns a tuple of the
+        OS-level file to read from, the offset of this file within it, and
+        the size of this file if it is only a region of that file (otherwise
+        `None`).  Returns `None` if positional reads can not be used.
+        """
+
+        if not hasattr(os, 'pread') or self.simulateonly:
+            return None
+
+        fileobj = self.__file
+        base = 0
+        limit = None
+        if isinstance(fileobj, _FileRegion):
+            base = fileobj.offset
+            limit = fileobj.size
+            fileobj = fileobj.fileobj
+
+        if not isfile(fileobj) or fileobj_closed(fileobj):
+            return None
+
+        # Anything still buffered for writing has to be flushed first, or the
+        # positional read will not see it
+        if not self.readonly:
+            fileobj.flush()
+
+        return fileobj, base, limit
+
     def writable(self):
         if self.readonly:
             return False
@@ -313,15 +795,129 @@ class _File(object):
         if hasattr(self.__file, 'truncate'):
             self.__file.truncate(size)
 
+    def _is_rewritable(self):
+        """
+        Returns `True` if it is possible to seek back to an earlier position
+        in the file and overwrite what was written there.  This is not the
+        case for compressed files, non-seekable streams, or files opened in
+        append mode (where all writes go to the end of the file).
+        """
+
+        if self.simulateonly or self.compression:
+            return False
+
+        if not (hasattr(self.__file, 'seek') and
+                hasattr(self.__file, 'tell')):
+            return False
+
+        if hasattr(self.__file, 'seekable'):
+            try:
+                if not self.__file.seekable():
+                    return False
+            except (IOError, OSError, ValueError):
+                return False
+
+        if hasattr(self.__file, 'mode') and _fileobj_is_append_mode(
+                self.__file):
+            return False
+
+        try:
+            self.__file.tell()
+        except (IOError, OSError):
+            return False
+
+        return True
+
     def close(self):
         """
         Close the 'physical' FITS file.
         """
 
+        self._close_mmap()
+
+        # Stop any prefetching before the file is closed out from under it
+        self.closed = True
+        if self._prefetch_thread is not None:
+            self._prefetch_thread.join()
+            self._prefetch_thread = None
+
         if hasattr(self.__file, 'close'):
             self.__file.close()
 
-        self.closed = True
+    def _get_mmap(self, size):
+        """
+        Returns an `mmap.mmap` of the entire file, which is shared by all the
+        arrays returned by `readarray` when memmap is enabled, unless the file
+        is mapped copy-on-write (see `MEMMAP_MODES`).
+
+        If the file has grown since it was mapped (in update mode)
+        such that the existing mmap is smaller than ``size`` bytes the file is
+        mapped again; arrays using the old mmap remain valid.
+        """
+
+        with self._lock:
+            if self._mmap is not None and len(self._mmap) >= size:
+                return self._mmap
+
+            self._close_mmap()
+
+            self._mmap = self._map_file()
+
+            if len(self._mmap) < size:
+                raise ValueError('mmap length is greater than file size')
+
+            return self._mmap
+
+    def _map_file(self, length=0, offset=0):
+        """
+        Returns a new `mmap.mmap` of ``length`` bytes of the file starting at
+        ``offset`` (which must be a multiple of `mmap.ALLOCATIONGRANULARITY`),
+        or of the entire file if ``length`` is 0, with the access given by the
+        file's mode.
+        """
+
+        fileobj = self.__file
+        if isinstance(fileobj, _FileRegion):
+            fileobj = fileobj.fileobj
+
+        # Make sure anything written to the file is included in the mapping
+        if hasattr(fileobj, 'flush'):
+            fileobj.flush()
+
+        access = MMAP_ACCESS_MODES[MEMMAP_MODES[self.mode]]
+        if offset:
+            mm = mmap.mmap(fileobj.fileno(), length, access=access,
+                           offset=offset)
+        else:
+            mm = mmap.mmap(fileobj.fileno(), length, access=access)
+
+        advice = getattr(mmap, 'MADV_' + ACCESS_MODES.get(self.access, ''),
+                         None)
+        if advice is not None and hasattr(mm, 'madvise'):
+            mm.madvise(advice)
+
+        return mm
+
+    def _close_mmap(self):
+        """
+        Release this file's mmap.  The mmap is closed immediately if no arrays
+        returned by `readarray` still use it; otherwise it is closed when the
+        last of them is garbage collected.
+        """
+
+        if self._mmap is None:
+            return
+
+        mm = self._mmap
+        views = self._mmap_views
+        self._mmap = None
+        self._mmap_views = {}
+
+        # Arrays derived from the arrays returned by readarray keep those
+        # arrays alive through their base, so the mmap is in use exactly as
+        # long as any of the latter are
+        if not views:
+            mm.close()
 
     def _overwrite_existing(self, clobber, fileobj, closed):
         """Overwrite an existing file if ``clobber`` is ``True``, otherwise
@@ -380,7 +976,7 @@ class _File(object):
             # append mode the file pointer is at the end of the file
             self.__file.seek(0)
 
-    def _open_filelike(self, fileobj, mode, clobber):
+    def _open_filelike(self, fileobj, mode, clobber, member=None):
         """Open a FITS file from a file-like object, i.e. one that has
         read and/or write methods.
         """
@@ -393,7 +989,7 @@ class _File(object):
                           "object (%r)." % fileobj)
 
         if isinstance(fileobj, zipfile.ZipFile):
-            self._open_zipfile(fileobj, mode)
+            self._open_zipfile(fileobj, mode, member)
             self.__file.seek(0)
             # We can bypass any additional checks at this point since now
             # self.__file points to the temp file extracted from the zip
@@ -421,7 +1017,25 @@ class _File(object):
                           "method, required for mode %r."
                           % self.mode)
 
-    def _open_filename(self, filename, mode, clobber):
+    def _open_backend(self, backend, mode, clobber):
+        """Open a FITS file stored in a `StorageBackend`."""
+
+        if mode in ('update', 'append', 'ostream') and not backend.writable:
+            raise IOError("%s does not support writing, required for mode "
+                          "%r." % (backend.__class__.__name__, mode))
+
+        self.file_like = True
+        self.__file = _BackendFile(backend)
+
+        if mode == 'ostream' and self.__file.len:
+            if not clobber:
+                raise IOError("File %r already exists." % self.name)
+            warnings.warn("Overwriting existing file %r." % self.name)
+            self.__file.truncate(0)
+        elif mode == 'append':
+            self.__file.seek(0, 2)
+
+    def _open_filename(self, filename, mode, clobber, member=None):
         """Open a FITS file from a filename string."""
 
         if mode == 'ostream':
@@ -437,20 +1051,38 @@ class _File(object):
 
         if ext == '.gz' or magic.startswith(GZIP_MAGIC):
             # Handle gzip files
-            self.__file = gzip.open(self.name, PYFITS_MODES[mode])
+            if (mode in ('readonly', 'copyonwrite', 'denywrite') and
+                    magic.startswith(GZIP_MAGIC)):
+                # Use a reader that supports fast random access into the
+                # decompressed data
+                self.__file = _IndexedGzipFile(self.name)
+            elif mode == 'ostream':
+                # Compress new files on multiple threads
+                self.__file = ParallelGzipFile(self.name, PYFITS_MODES[mode])
+            else:
+                self.__file = gzip.open(self.name, PYFITS_MODES[mode])
             self.compression = 'gzip'
         elif ext == '.zip' or magic.startswith(PKZIP_MAGIC):
             # Handle zip files
-            self._open_zipfile(self.name, mode)
+            self._open_zipfile(self.name, mode, member)
+        elif (self.access == 'sequential' and
+                mode in ('readonly', 'copyonwrite', 'denywrite')):
+            self.__file = fileobj_open(self.name, PYFITS_MODES[mode],
+                                       buffering=SEQUENTIAL_BUFFER_SIZE)
         else:
             self.__file = fileobj_open(self.name, PYFITS_MODES[mode])
             # Make certain we're back at the beginning of the file
         self.__file.seek(0)
 
-    def _open_zipfile(self, fileobj, mode):
-        """Limited support for zipfile.ZipFile objects containing a single
-        a file.  Allows reading only for now by extracting the file to a
-        tempfile.
+    def _open_zipfile(self, fileobj, mode, member=None):
+        """Limited support for zipfile.ZipFile objects.  Allows reading only
+        for now.
+
+        If the zip file contains more than one member, the member to read must
+        be given by name.  Members that are stored without compression are
+        read directly from the archive (and may be memory mapped), and members
+        compressed with deflate are decompressed on the fly; otherwise the
+        member is extracted to a tempfile.
         """
 
         if mode in ('update', 'append'):
@@ -465,15 +1097,29 @@ class _File(object):
             zfile = fileobj
             close = False
 
-        namelist = zfile.namelist()
-        if len(namelist) != 1:
-            raise IOError(
-              "Zip files with multiple members are not supported.")
-        self.__file = tempfile.NamedTemporaryFile(suffix='.fits')
-        self.__file.write(zfile.read(namelist[0]))
+        try:
+            info = _zip_member_info(zfile, member)
+            filename = zfile.filename
+            member_file = None
+
+            # Encrypted members and other compression types are not supported
+            # directly
+            if (isinstance(filename, string_types) and
+                    os.path.isfile(filename) and not info.flag_bits & 0x1):
+                if info.compress_type == zipfile.ZIP_STORED:
+                    member_file = _open_zip_member(filename, info)
+                elif info.compress_type == zipfile.ZIP_DEFLATED:
+                    member_file = _IndexedZipMemberFile(filename, info)
+
+            if member_file is None:
+                member_file = tempfile.NamedTemporaryFile(suffix='.fits')
+                member_file.write(zfile.read(info))
+
+            self.__file = member_file
+        finally:
+            if close:
+                zfile.close()
 
-        if close:
-            zfile.close()
         self.compression = 'zip'
 
     def _test_mmap(self):
@@ -529,3 +1175,849 @@ def _is_random_access_file_backed(fileobj):
     """
 
     return isfile(fileobj) or isinstance(fileobj, gzip.GzipFile)
+
+
+def _is_http_url(name):
+    """Returns `True` if the given string is an HTTP or HTTPS URL."""
+
+    return urllib.parse.urlparse(name)[0].lower() in ('http', 'https')
+
+
+class _GzipIndex(object):
+    """
+    An index of seek points into the decompressed data of a gzip file, used
+    by `_IndexedGzipFile`.
+
+    Each seek point is a tuple of ``(offset, compressed_offset,
+    decompressor)``, where ``offset`` is an offset into the decompressed
+    data, ``compressed_offset`` is the corresponding offset into the
+    compressed file, and ``decompressor`` is a snapshot of the state of the
+    zlib decompressor (including its dictionary) at that point, or `None` at
+    the start of a gzip member.  The decompressor snapshots must be copied
+    before being used.
+
+    The index is built up as the file is read, so that seek points are only
+    ever added past the end of the index.
+    """
+
+    def __init__(self, spacing):
+        self.spacing = spacing
+        self.points = [(0, 0, None)]
+        self.offsets = [0]
+        # The size of the decompressed data, once known
+        self.size = None
+        # Whether the headers of the gzip members give their sizes (see
+        # ParallelGzipFile), once known
+        self.member_sizes = None
+        self._lock = threading.Lock()
+
+    def wants(self, offset):
+        """
+        Returns `True` if a seek point should be added at the given
+        decompressed offset.
+        """
+
+        return offset >= self.offsets[-1] + self.spacing
+
+    def add(self, offset, compressed_offset, decompressor):
+        self._lock.acquire()
+        try:
+            if offset > self.offsets[-1]:
+                self.points.append((offset, compressed_offset, decompressor))
+                self.offsets.append(offset)
+        finally:
+            self._lock.release()
+
+    def find(self, offset):
+        """Returns the last seek point at or before the given offset."""
+
+        return self.points[bisect.bisect_right(self.offsets, offset) - 1]
+
+
+class _IndexedGzipFile(object):
+    """
+    A read-only file-like object for reading the decompressed contents of a
+    gzip file, with support for efficient random access.
+
+    While the file is read, the state of the decompressor is saved at regular
+    intervals (every ``spacing`` bytes of decompressed data) in a
+    `_GzipIndex`.  Seeking to an offset then only requires resuming
+    decompression from the nearest seek point before that offset, rather than
+    from the beginning of the file as with `gzip.GzipFile`.
+
+    The index for a file is kept in memory (keyed on the file's path, size,
+    and modification time) so that it may be reused by later
+    `_IndexedGzipFile` objects for the same file.  Only the index for the
+    last few files that were opened is kept.
+    """
+
+    # Amount of compressed data to read at a time
+    _read_size = 2 ** 16
+
+    # Maximum amount of decompressed data to produce at a time
+    _decompress_size = 2 ** 20
+
+    # Number of files to keep indexes in memory for
+    _index_cache_size = 16
+
+    _index_cache = {}
+    _index_cache_keys = []
+
+    def __init__(self, filename, spacing=2 ** 22):
+        self.name = filename
+        self.mode = 'rb'
+        self.closed = False
+        self._file = self._open(filename)
+        self._index = self._get_index(self._index_key(filename), spacing)
+        self._pos = 0
+        self._restore(self._index.points[0])
+
+    def _open(self, filename):
+        """Open the compressed data for reading."""
+
+        return fileobj_open(filename, 'rb')
+
+    def _index_key(self, filename):
+        """
+        Returns the key identifying the file's index in the index cache, or
+        `None` if the index should not be cached.
+        """
+
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+
+        return (os.path.realpath(filename), stat.st_size, stat.st_mtime)
+
+    def _new_decompressor(self):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    @classmethod
+    def _get_index(cls, key, spacing):
+        if key is None:
+            return _GzipIndex(spacing)
+
+        if key not in cls._index_cache:
+            cls._index_cache[key] = _GzipIndex(spacing)
+            cls._index_cache_keys.append(key)
+            while len(cls._index_cache_keys) > cls._index_cache_size:
+                del cls._index_cache[cls._index_cache_keys.pop(0)]
+
+        return cls._index_cache[key]
+
+    def read(self, size=-1):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        if size is None or size < 0:
+            size = self._get_size() - self._pos
+
+        self._reposition()
+
+        chunks = []
+        while size > 0:
+            start = self._pos - self._offset
+            if start >= len(self._buffer):
+                # Discard the data already read from the buffer and decompress
+                # some more
+                self._offset += len(self._buffer)
+                self._buffer = b('')
+                if not self._decompress():
+                    break
+                continue
+
+            chunk = self._buffer[start:start + size]
+            chunks.append(chunk)
+            self._pos += len(chunk)
+            size -= len(chunk)
+
+        return b('').join(chunks)
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self._get_size()
+
+        if offset < 0:
+            raise IOError('Negative seek in gzip file')
+
+        # The decompressor is not actually moved until the next read
+        self._pos = offset
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            self._buffer = b('')
+            self._decompressor = None
+            self.closed = True
+
+    def _restore(self, point):
+        """Resume decompression from the given seek point in the index."""
+
+        offset, compressed_offset, decompressor = point
+        self._file.seek(compressed_offset)
+
+        if decompressor is None:
+            # The beginning of a gzip member
+            decompressor = self._new_decompressor()
+        else:
+            decompressor = decompressor.copy()
+
+        self._decompressor = decompressor
+        # The decompressed data most recently produced, and its offset
+        self._buffer = b('')
+        self._offset = offset
+        # Compressed data that has been read but not yet decompressed, and its
+        # offset in the compressed file
+        self._input = b('')
+        self._compressed_offset = compressed_offset
+        self._eof = False
+
+    def _reposition(self):
+        """
+        Move the decompressor to the nearest seek point before the current
+        position, if it is behind the current position or if the seek point
+        is closer to it than the decompressor is.
+        """
+
+        end = self._offset + len(self._buffer)
+        if self._offset <= self._pos <= end:
+            return
+
+        if self._pos > self._index.offsets[-1]:
+            self._index_members(self._pos)
+
+        point = self._index.find(self._pos)
+        if self._pos < self._offset or point[0] > end:
+            self._restore(point)
+
+    def _decompress(self):
+        """
+        Decompress the next chunk of data into the buffer.  Returns `False`
+        if the end of the file has been reached.
+        """
+
+        while not self._eof:
+            data = self._input
+            if not data:
+                data = self._file.read(self._read_size)
+                if not data:
+                    self._finish()
+                    break
+
+            decompressor = self._decompressor
+            self._buffer = decompressor.decompress(data,
+                                                   self._decompress_size)
+
+            if decompressor.unused_data:
+                # The end of a gzip member; there may be another one after it
+                self._input = decompressor.unused_data
+                self._compressed_offset += len(data) - len(self._input)
+                if not self._start_member():
+                    self._finish()
+            else:
+                self._input = decompressor.unconsumed_tail
+                self._compressed_offset += len(data) - len(self._input)
+                end = self._offset + len(self._buffer)
+                if self._index.wants(end):
+                    self._index.add(end, self._compressed_offset,
+                                    decompressor.copy())
+
+            if self._buffer:
+                return True
+
+        return False
+
+    def _start_member(self):
+        """
+        Start decompressing a new gzip member following the end of the
+        previous one, if there is one.
+        """
+
+        if len(self._input) < len(GZIP_MAGIC):
+            self._input += self._file.read(self._read_size)
+
+        # Anything other than another gzip member (such as zero padding) is
+        # ignored
+        if not self._input.startswith(GZIP_MAGIC):
+            return False
+
+        self._decompressor = self._new_decompressor()
+        self._index.add(self._offset + len(self._buffer),
+                        self._compressed_offset, None)
+        return True
+
+    def _index_members(self, offset=None):
+        """
+        If the file was written by `ParallelGzipFile` with ``indexed=True``,
+        so that the header of each gzip member gives its size, add a seek
+        point for the start of each member up to the given decompressed offset
+        (or the end of the file), reading only the member headers.
+        """
+
+        index = self._index
+        if index.member_sizes is False or index.size is not None:
+            return
+
+        point = [p for p in index.points if p[2] is None][-1]
+        pos = self._file.tell()
+        try:
+            while offset is None or point[0] <= offset:
+                sizes = _read_gzip_index_subfield(self._file, point[1])
+                if sizes is None:
+                    index.member_sizes = False
+                    break
+
+                index.member_sizes = True
+                point = (point[0] + sizes[1], point[1] + sizes[0], None)
+                self._file.seek(point[1])
+                if self._file.read(len(GZIP_MAGIC)) != GZIP_MAGIC:
+                    index.size = point[0]
+                    break
+                index.add(*point)
+        finally:
+            self._file.seek(pos)
+
+    def _finish(self):
+        self._eof = True
+        self._input = b('')
+        self._index.size = self._offset + len(self._buffer)
+
+    def _get_size(self):
+        """Returns the size of the decompressed data."""
+
+        if self._index.size is None:
+            self._index_members()
+
+        if self._index.size is None:
+            # Decompress the rest of the file from the last seek point
+            pos = self._pos
+            self._restore(self._index.points[-1])
+            while self._decompress():
+                self._offset += len(self._buffer)
+                self._buffer = b('')
+            self._pos = pos
+
+        return self._index.size
+
+
+class _IndexedZipMemberFile(_IndexedGzipFile):
+    """
+    Like `_IndexedGzipFile`, but for reading a deflate-compressed member of
+    a zip file directly from the archive.
+
+    Note that unlike `zipfile.ZipFile` this does not check the CRC of the
+    member's contents.
+    """
+
+    def __init__(self, filename, info, spacing=2 ** 22):
+        self._info = info
+        super(_IndexedZipMemberFile, self).__init__(filename, spacing)
+
+    def _open(self, filename):
+        return _open_zip_member(filename, self._info)
+
+    def _index_key(self, filename):
+        key = super(_IndexedZipMemberFile, self)._index_key(filename)
+        if key is not None:
+            key += (self._info.filename,)
+        return key
+
+    def _new_decompressor(self):
+        # Zip members are raw deflate streams without a header
+        return zlib.decompressobj(-zlib.MAX_WBITS)
+
+    def _start_member(self):
+        return False
+
+    def _index_members(self, offset=None):
+        pass
+
+
+class ParallelGzipFile(object):
+    """
+    A write-only file-like object for writing gzip-compressed data, which
+    compresses the data in independent blocks on a pool of threads.
+
+    The output is a standard gzip stream that can be read by any gzip
+    decompressor, but writing it can be many times faster than with
+    `gzip.GzipFile`, which compresses on a single thread.  Since each block
+    is compressed without reference to the data in preceding blocks the
+    output is very slightly larger.
+
+    `HDUList.writeto` and `pyfits.writeto` use this automatically when
+    writing to a filename ending in ``.gz``, with the default settings.  To
+    change the settings, pass an instance of this class to them in place of
+    the filename (and close it afterwards, as with any other open file)::
+
+        >>> f = pyfits.ParallelGzipFile('image.fits.gz', compresslevel=6,
+        ...                             workers=8, indexed=True)
+        >>> hdul.writeto(f)
+        >>> f.close()
+
+    Parameters
+    ----------
+    filename : str, optional
+        The name of the file to write; may be omitted if ``fileobj`` is given.
+
+    mode : str, optional
+        Either ``'wb'`` (the default) or ``'ab'``.
+
+    compresslevel : int, optional
+        The compression level, from 1 (fastest) to 9 (smallest output; the
+        default, as for `gzip.GzipFile`).
+
+    fileobj : file, optional
+        A binary file object to write the compressed data to, instead of
+        opening ``filename``.  It is not closed when this object is closed.
+
+    workers : int, optional
+        The number of threads to compress with; defaults to the number of
+        CPUs.  With fewer than two workers the data is compressed in the
+        calling thread.
+
+    block_size : int, optional
+        The amount of uncompressed data in each block.
+
+    indexed : bool, optional
+        If `True`, each block is written as a separate gzip member, with the
+        sizes of the member recorded in its header.  This allows PyFITS to
+        seek directly to any block when the file is read, rather than
+        decompressing everything before it, at the cost of a further small
+        increase in the size of the output.
+    """
+
+    def __init__(self, filename=None, mode='wb', compresslevel=9,
+                 fileobj=None, workers=None, block_size=2880 * 2 ** 8,
+                 indexed=False):
+        mode = mode.replace('b', '') + 'b'
+        if mode not in ('wb', 'ab'):
+            raise ValueError("ParallelGzipFile only supports modes 'wb' and "
+                             "'ab'; got %r" % mode)
+
+        if fileobj is None:
+            fileobj = self._myfileobj = fileobj_open(filename, mode)
+        else:
+            self._myfileobj = None
+        if filename is None:
+            filename = fileobj_name(fileobj)
+
+        self.name = filename
+        self.mode = mode
+        self.fileobj = fileobj
+        self.closed = False
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self.indexed = indexed
+
+        try:
+            import multiprocessing
+            import multiprocessing.pool
+        except ImportError:
+            multiprocessing = None
+
+        if workers is None and multiprocessing is not None:
+            workers = multiprocessing.cpu_count()
+
+        if workers is None or workers < 2 or multiprocessing is None:
+            self._pool = None
+            self._max_pending = 0
+        else:
+            self._pool = multiprocessing.pool.ThreadPool(workers)
+            self._max_pending = 2 * workers
+
+        # Uncompressed data that has not yet made up a full block
+        self._buffer = []
+        self._buffered = 0
+        # The results of compressing the blocks that have not yet been written
+        # out, in order
+        self._pending = []
+        # The number of uncompressed bytes written, and (when not writing each
+        # block as a separate member) the CRC of the uncompressed data
+        self._pos = 0
+        self._crc = 0
+        self._started = False
+
+    def __repr__(self):
+        return '<%s.%s %r>' % (self.__module__, self.__class__.__name__,
+                               self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        if isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data).view(np.uint8).ravel()
+        elif isinstance(data, text_type):
+            data = encode_ascii(data)
+
+        size = len(data)
+        if not size:
+            return
+
+        self._pos += size
+        offset = 0
+        while self._buffered + size - offset >= self.block_size:
+            end = offset + self.block_size - self._buffered
+            self._buffer.append(data[offset:end])
+            self._submit(self._join_buffer())
+            offset = end
+
+        if offset < size:
+            # Arrays are copied, since they may be modified (such as by being
+            # byteswapped back) once written
+            self._buffer.append(self._tostring(data[offset:]))
+            self._buffered += size - offset
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            raise ValueError('Seek from end not supported')
+
+        if offset < self._pos:
+            raise IOError('Negative seek in write mode')
+
+        zeros = b('\0') * min(offset - self._pos, self.block_size)
+        while self._pos < offset:
+            self.write(zeros[:offset - self._pos])
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        """
+        Writes out any blocks that have already been compressed.  The output
+        is only a complete gzip stream once the file has been closed.
+        """
+
+        while self._pending and self._pending[0].ready():
+            self._write_result(self._pending.pop(0))
+
+        self.fileobj.flush()
+
+    def close(self):
+        if self.closed:
+            return
+
+        try:
+            if self._buffered or (self.indexed and not self._started):
+                # (An empty file still gets one, empty, member)
+                self._submit(self._join_buffer())
+
+            while self._pending:
+                self._write_result(self._pending.pop(0))
+
+            if not self.indexed:
+                if not self._started:
+                    self._write_header()
+                # An empty final block, followed by the gzip trailer
+                self.fileobj.write(b('\x03\x00') +
+                                   struct.pack('<II', self._crc & 0xffffffff,
+                                               self._pos & 0xffffffff))
+            self.fileobj.flush()
+        finally:
+            self.closed = True
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+            if self._myfileobj is not None:
+                self._myfileobj.close()
+
+    def _join_buffer(self):
+        data = b('').join([self._tostring(chunk) for chunk in self._buffer])
+        self._buffer = []
+        self._buffered = 0
+        return data
+
+    @staticmethod
+    def _tostring(data):
+        if isinstance(data, np.ndarray):
+            return data.tostring()
+        return data
+
+    def _submit(self, data):
+        """Compress a block, or queue it to be compressed."""
+
+        if not self.indexed:
+            self._crc = zlib.crc32(data, self._crc)
+
+        args = (data, self.compresslevel, self.indexed)
+        if self._pool is None:
+            self._write_result(_compress_gzip_block(*args))
+            return
+
+        self._pending.append(self._pool.apply_async(_compress_gzip_block,
+                                                    args))
+        while len(self._pending) > self._max_pending:
+            self._write_result(self._pending.pop(0))
+
+    def _write_result(self, result):
+        if hasattr(result, 'get'):
+            result = result.get()
+        if not self._started and not self.indexed:
+            self._write_header()
+        self._started = True
+        self.fileobj.write(result)
+
+    def _write_header(self):
+        self.fileobj.write(_gzip_header(self.compresslevel))
+        self._started = True
+
+
+def _gzip_header(compresslevel, extra=None):
+    """
+    Returns a gzip member header, with the given gzip extra field (if any).
+    """
+
+    if compresslevel == 9:
+        xfl = 2
+    elif compresslevel == 1:
+        xfl = 4
+    else:
+        xfl = 0
+
+    # The OS field is set to 'unknown'
+    flags = 0
+    if extra is not None:
+        flags = 4
+    header = GZIP_MAGIC + struct.pack('<BIBB', flags, int(time.time()), xfl,
+                                      255)
+    if extra is not None:
+        header += struct.pack('<H', len(extra)) + extra
+    return header
+
+
+def _compress_gzip_block(data, compresslevel, indexed):
+    """
+    Compresses a block of data for `ParallelGzipFile`.
+
+    If ``indexed`` is `True` a complete gzip member is returned, whose
+    header records the size of the member and of the uncompressed data.
+    Otherwise the raw deflate data is returned, ending at a byte boundary
+    without marking the end of the stream, so that the compressed blocks may
+    be concatenated to form a single deflate stream.
+    """
+
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED,
+                                  -zlib.MAX_WBITS)
+    compressed = compressor.compress(data)
+    if not indexed:
+        return compressed + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    compressed += compressor.flush()
+    trailer = struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data))
+    # The length of the header does not depend on the sizes recorded in it
+    header_size = len(_gzip_header(compresslevel,
+                                   _gzip_index_extra(0, len(data))))
+    extra = _gzip_index_extra(header_size + len(compressed) + len(trailer),
+                              len(data))
+    return _gzip_header(compresslevel, extra) + compressed + trailer
+
+
+def _gzip_index_extra(member_size, size):
+    return GZIP_INDEX_SUBFIELD + struct.pack('<HII', 8, member_size, size)
+
+
+def _read_gzip_index_subfield(fileobj, offset):
+    """
+    Returns the ``(member_size, size)`` recorded in the header of the gzip
+    member at the given offset of a file written by `ParallelGzipFile` with
+    ``indexed=True``, or `None` if there is no such member at that offset.
+    """
+
+    fileobj.seek(offset)
+    header = fileobj.read(12)
+    if (len(header) < 12 or not header.startswith(GZIP_MAGIC) or
+            not ord(header[3:4]) & 4):
+        return None
+
+    extra = fileobj.read(struct.unpack('<H', header[10:])[0])
+    idx = 0
+    while idx + 4 <= len(extra):
+        length = struct.unpack('<H', extra[idx + 2:idx + 4])[0]
+        if extra[idx:idx + 2] == GZIP_INDEX_SUBFIELD and length == 8:
+            return struct.unpack('<II', extra[idx + 4:idx + 12])
+        idx += 4 + length
+
+    return None
+
+
+class _FileRegion(object):
+    """
+    A read-only file-like object for reading a contiguous region of another
+    file, such as a member stored without compression in a zip file.
+    """
+
+    def __init__(self, fileobj, offset, size):
+        self.fileobj = fileobj
+        self.offset = offset
+        self.size = size
+        self.name = fileobj_name(fileobj)
+        self.mode = 'rb'
+        self.closed = False
+        self._pos = 0
+
+    def read(self, size=-1):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        remaining = max(self.size - self._pos, 0)
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+
+        self.fileobj.seek(self.offset + self._pos)
+        data = self.fileobj.read(size)
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self.size
+
+        if offset < 0:
+            raise IOError('Negative seek in file')
+
+        self._pos = offset
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.fileobj.close()
+            self.closed = True
+
+
+class _FileRegionWriter(object):
+    """
+    A file-like object for writing a contiguous region of a `_File` with
+    `_File.pwrite`, so that different regions of the file can be written
+    from multiple threads at once.
+
+    Unlike `_FileRegion`, positions are given as offsets into the whole file
+    (so that HDUs written through it record their correct locations), and
+    writing past the end of the region raises an `IOError`.
+    """
+
+    def __init__(self, fileobj, offset, size):
+        self.fileobj = fileobj
+        self.offset = offset
+        self.size = size
+        self.name = fileobj.name
+        self.mode = 'rb+'
+        self.binary = True
+        self.closed = False
+        self._pos = offset
+
+    def read(self, size=-1):
+        end = self.offset + self.size
+        if size is None or size < 0 or size > end - self._pos:
+            size = max(end - self._pos, 0)
+
+        data = self.fileobj.pread(size, self._pos)
+        self._pos += len(data)
+        return data
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        if isinstance(data, np.ndarray):
+            nbytes = data.nbytes
+        else:
+            nbytes = len(data)
+
+        if self._pos + nbytes > self.offset + self.size:
+            raise IOError(
+                'Writing %d bytes at offset %d would overrun the %d byte '
+                'region at offset %d' % (nbytes, self._pos, self.size,
+                                         self.offset))
+
+        self._pos += self.fileobj.pwrite(data, self._pos)
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self.offset + self.size
+
+        if offset < 0:
+            raise IOError('Negative seek in file')
+
+        self._pos = offset
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def _zip_member_info(zfile, member=None):
+    """
+    Returns the `zipfile.ZipInfo` for the given member of a zip file.  If no
+    member is given the zip file must contain a single file.
+    """
+
+    if member is None:
+        infos = [info for info in zfile.infolist()
+                 if not info.filename.endswith('/')]
+        if len(infos) != 1:
+            raise IOError(
+                "Zip files with multiple members are not supported unless "
+                "the member to open is specified with the member argument.")
+        return infos[0]
+
+    try:
+        return zfile.getinfo(member)
+    except KeyError:
+        raise IOError('There is no member named %r in the zip file.' %
+                      member)
+
+
+def _open_zip_member(filename, info):
+    """
+    Opens a `_FileRegion` for reading the (possibly compressed) data of the
+    member of the zip file ``filename`` described by the `zipfile.ZipInfo`
+    ``info``.
+    """
+
+    fileobj = fileobj_open(filename, 'rb')
+    try:
+        # The local file header is 30 bytes followed by the filename and extra
+        # field, whose lengths may differ from those in the central directory
+        fileobj.seek(info.header_offset)
+        header = fileobj.read(30)
+        if len(header) != 30 or not header.startswith(PKZIP_MAGIC):
+            raise IOError('Bad local file header for zip member %r.' %
+                          info.filename)
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+    except:
+        fileobj.close()
+        raise
+
+    offset = info.header_offset + 30 + name_length + extra_length
+    return _FileRegion(fileobj, offset, info.compress_size)
@@ -1,6 +1,7 @@
 from .base import register_hdu, unregister_hdu, DELAYED
 from .compressed import CompImageHDU
 from .groups import GroupsHDU, GroupData, Group
+from .handle import HDUHandle
 from .hdulist import HDUList
 from .image import PrimaryHDU, ImageHDU
 from .nonstandard import FitsHDU
@@ -9,4 +10,5 @@ from .table import TableHDU, BinTableHDU
 
 __all__ = ['HDUList', 'PrimaryHDU', 'ImageHDU', 'TableHDU', 'BinTableHDU',
            'GroupsHDU', 'GroupData', 'Group', 'CompImageHDU', 'FitsHDU',
-           'StreamingHDU', 'register_hdu', 'unregister_hdu', 'DELAYED']
+           'StreamingHDU', 'HDUHandle', 'register_hdu', 'unregister_hdu',
+           'DELAYED']
@@ -12,8 +12,8 @@ from ..extern.six import string_types
 from ..extern.six.moves import range
 
 import pyfits
-from ..file import _File
-from ..header import Header
+from ..file import _File, MEMMAP_MODES
+from ..header import Header, _BasicHeader
 from ..util import (first, lazyproperty, _is_int, _is_pseudo_unsigned,
                     _unsigned_zero, _pad_length, itersubclasses, encode_ascii,
                     decode_ascii, deprecated, _get_array_mmap, _array_to_file)
@@ -66,6 +66,355 @@ def _hdu_class_from_header(cls, header):
     return klass
 
 
+def _hdr_data_size(header):
+    """
+    Calculate the size (in bytes, not including padding) of the data portion
+    of an HDU from the values of its header.  ``header`` may be a `Header` or
+    any other mapping of keywords to values (such as a `_BasicHeader`).
+    """
+
+    size = 0
+    naxis = header.get('NAXIS', 0)
+    if naxis > 0:
+        size = 1
+        start = 0
+        # For random groups NAXIS1 is 0 and is not included in the product
+        if header.get('GROUPS', False) and header.get('NAXIS1') == 0:
+            start = 1
+        for idx in range(start, naxis):
+            size = size * header['NAXIS' + str(idx + 1)]
+        bitpix = header['BITPIX']
+        gcount = header.get('GCOUNT', 1)
+        pcount = header.get('PCOUNT', 0)
+        size = abs(bitpix) * gcount * (pcount + size) // 8
+    return size
+
+
+def _iter_raw_hdus(fileobj):
+    """
+    Iterate over the HDUs in an open binary file-like object without creating
+    any HDU objects, starting from the current file position.
+
+    For each HDU yields a tuple of ``(header_offset, header, data_offset,
+    data_size)``, where ``header`` is a `_BasicHeader` and ``data_size`` does
+    not include padding.  Only the header blocks are read; the data of each
+    HDU is skipped by seeking past it.
+    """
+
+    offset = fileobj.tell()
+    while True:
+        try:
+            header = _BasicHeader.fromfile(fileobj)
+        except EOFError:
+            return
+
+        data_offset = offset + header.size
+        data_size = _hdr_data_size(header)
+        yield offset, header, data_offset, data_size
+
+        offset = data_offset + data_size + _pad_length(data_size)
+        fileobj.seek(offset)
+
+
+def _compute_checksum(data, sum32=0, blocking="standard"):
+    """
+    Compute the ones-complement checksum of a sequence of bytes.
+
+    Parameters
+    ----------
+    data
+        a memory region to checksum
+
+    sum32
+        incremental checksum value from another region
+
+    blocking
+        "standard", "nonstandard", or "either"
+        selects the block size on which to perform checksumming,
+        originally the blocksize was chosen incorrectly.  "nonstandard"
+        selects the original approach,  "standard" selects the
+        interoperable blocking size of 2880 bytes.  In the context of
+        _compute_checksum, "either" is synonymous with "standard".
+
+    Returns
+    -------
+    ones complement checksum
+    """
+
+    blocklen = {'standard': 2880,
+                'nonstandard': len(data),
+                'either': 2880,  # do standard first
+                True: 2880}[blocking]
+
+    if blocklen == 2880:
+        # When the data is summed in standard-sized blocks the result is the
+        # same as the ones-complement sum of all the 32-bit words in the data,
+        # which can be computed much more efficiently
+        return _ones_complement_sum(data, sum32)
+
+    sum32 = np.uint32(sum32)
+    for i in range(0, len(data), blocklen):
+        length = min(blocklen, len(data) - i)   # ????
+        sum32 = _compute_hdu_checksum(data[i:i + length], sum32)
+    return sum32
+
+
+def _ones_complement_sum(data, sum32=0):
+    """
+    Compute the 32-bit ones-complement sum of the big-endian 32-bit words in a
+    sequence of bytes (zero-padded to a multiple of 4 bytes), added to an
+    existing sum ``sum32``.
+
+    This gives the same result as computing the checksum over standard
+    2880-byte blocks with `_compute_hdu_checksum`, but is much faster for
+    large arrays.
+    """
+
+    data = np.asarray(data).ravel().view(np.uint8)
+    nbytes = len(data) - len(data) % 4
+
+    total = int(sum32)
+    chunksize = _CHECKSUM_CHUNK_SIZE
+    for idx in range(0, nbytes, chunksize):
+        words = data[idx:min(idx + chunksize, nbytes)].view('>u4')
+        total += int(words.sum(dtype=np.uint64))
+
+    if nbytes < len(data):
+        tail = np.zeros(4, dtype=np.uint8)
+        tail[:len(data) - nbytes] = data[nbytes:]
+        total += int(tail.view('>u4')[0])
+
+    return np.uint32(_fold_checksum(total))
+
+
+def _fold_checksum(value):
+    """
+    Reduce an arbitrarily large sum of 32-bit words to a 32-bit ones-
+    complement sum by adding the carries back in ("end-around carry").
+    """
+
+    while value >> 32:
+        value = (value & 0xFFFFFFFF) + (value >> 32)
+    return value
+
+
+def _checksum_add(sum1, sum2):
+    """
+    Add two 32-bit ones-complement sums.  This can be used to combine the
+    sums of two word-aligned regions of an HDU.
+    """
+
+    return np.uint32(_fold_checksum(int(sum1) + int(sum2)))
+
+
+def _checksum_sub(sum1, sum2):
+    """
+    Subtract the 32-bit ones-complement sum ``sum2`` from ``sum1``; for
+    example to remove the contribution of a word-aligned region of an HDU
+    from the sum of the HDU before adding the sum of its new contents.
+
+    The result is never zero (negative zero, 0xFFFFFFFF, is returned
+    instead) since a region containing any non-zero bytes can not have a
+    checksum of zero.
+    """
+
+    return np.uint32(_fold_checksum(int(sum1) + (~int(sum2) & 0xFFFFFFFF)))
+
+
+def _compute_hdu_checksum(data, sum32=0):
+    """
+    Translated from FITS Checksum Proposal by Seaman, Pence, and Rots.
+    Use uint32 literals as a hedge against type promotion to int64.
+
+    This code should only be called with blocks of 2880 bytes
+    Longer blocks result in non-standard checksums with carry overflow
+    Historically,  this code *was* called with larger blocks and for that
+    reason still needs to be for backward compatibility.
+    """
+
+    u8 = np.uint32(8)
+    u16 = np.uint32(16)
+    uFFFF = np.uint32(0xFFFF)
+
+    if data.nbytes % 2:
+        last = data[-1]
+        data = data[:-1]
+    else:
+        last = np.uint32(0)
+
+    data = data.view('>u2')
+
+    hi = sum32 >> u16
+    lo = sum32 & uFFFF
+    hi += np.add.reduce(data[0::2])
+    lo += np.add.reduce(data[1::2])
+
+    if (data.nbytes // 2) % 2:
+        lo += last << u8
+    else:
+        hi += last << u8
+
+    hicarry = hi >> u16
+    locarry = lo >> u16
+
+    while hicarry or locarry:
+        hi = (hi & uFFFF) + locarry
+        lo = (lo & uFFFF) + hicarry
+        hicarry = hi >> u16
+        locarry = lo >> u16
+
+    return (hi << u16) + lo
+
+
+def _rotate_checksum(sum32, nbytes):
+    """
+    Rotate the 32-bit ones-complement sum ``sum32`` right by ``nbytes``
+    bytes.  This gives the contribution of a sequence of bytes summed as if it
+    started on a word boundary to the sum of a larger sequence in which it
+    actually starts ``nbytes`` bytes past a word boundary.
+    """
+
+    shift = 8 * (nbytes % 4)
+    sum32 = int(sum32)
+    if not shift:
+        return np.uint32(sum32)
+
+    return np.uint32(((sum32 >> shift) | (sum32 << (32 - shift))) &
+                     0xFFFFFFFF)
+
+
+class _ChecksumWriter(object):
+    """
+    Wraps a `_File` object being written to, and keeps a running
+    ones-complement sum of all the bytes written through it.
+
+    This is used to compute the ``DATASUM`` of an HDU while its data is being
+    written, so that writing a checksummed HDU takes only a single pass over
+    the data.  All other attributes are passed through to the wrapped file.
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.datasum = np.uint32(0)
+        self._nbytes = 0
+
+    def __getattr__(self, attr):
+        return getattr(self._fileobj, attr)
+
+    def write(self, string):
+        if isinstance(string, np.ndarray):
+            return self.writearray(string)
+
+        string = encode_ascii(string)
+        self._update(np.frombuffer(string, dtype=np.uint8))
+        self._fileobj.write(string)
+
+    def writearray(self, array):
+        self._update(np.ascontiguousarray(array).ravel().view(np.uint8))
+        self._fileobj.writearray(array)
+
+    def _update(self, data):
+        if not len(data):
+            return
+
+        sum32 = _rotate_checksum(_ones_complement_sum(data), self._nbytes)
+        self.datasum = _checksum_add(self.datasum, sum32)
+        self._nbytes += len(data)
+
+
+# The number of bytes to sum at a time in _ones_complement_sum; this ensures
+# that the sum of each chunk can't overflow a 64-bit integer
+_CHECKSUM_CHUNK_SIZE = 2880 * 2 ** 14
+
+
+# _CHECKSUM_MASK and _CHECKSUM_EXCLUDE used for encoding the checksum value into
+# a character string.
+_CHECKSUM_MASK = [0xFF000000,
+                  0x00FF0000,
+                  0x0000FF00,
+                  0x000000FF]
+
+_CHECKSUM_EXCLUDE = [0x3a, 0x3b, 0x3c, 0x3d, 0x3e, 0x3f, 0x40,
+                     0x5b, 0x5c, 0x5d, 0x5e, 0x5f, 0x60]
+
+
+def _encode_byte(byte):
+    """
+    Encode a single byte.
+    """
+
+    quotient = byte // 4 + ord('0')
+    remainder = byte % 4
+
+    ch = np.array(
+        [(quotient + remainder), quotient, quotient, quotient],
+        dtype='int32')
+
+    check = True
+    while check:
+        check = False
+        for x in _CHECKSUM_EXCLUDE:
+            for j in [0, 2]:
+                if ch[j] == x or ch[j + 1] == x:
+                    ch[j] += 1
+                    ch[j + 1] -= 1
+                    check = True
+    return ch
+
+
+def _char_encode(value):
+    """
+    Encodes the checksum `value` using the algorithm described
+    in SPR section A.7.2 and returns it as a 16 character string.
+
+    Parameters
+    ----------
+    value
+        a checksum
+
+    Returns
+    -------
+    ascii encoded checksum
+    """
+
+    value = np.uint32(value)
+
+    asc = np.zeros((16,), dtype='byte')
+    ascii = np.zeros((16,), dtype='byte')
+
+    for i in range(4):
+        byte = (value & _CHECKSUM_MASK[i]) >> ((3 - i) * 8)
+        ch = _encode_byte(byte)
+        for j in range(4):
+            asc[4 * j + i] = ch[j]
+
+    for i in range(16):
+        ascii[i] = asc[(i + 15) % 16]
+
+    return decode_ascii(ascii.tostring())
+
+
+def _char_decode(value):
+    """
+    Decodes a 16 character string encoded by `_char_encode` back into the
+    32-bit value it represents.
+    """
+
+    ascii = np.fromstring(encode_ascii(value), dtype='byte').astype('int32')
+    if len(ascii) != 16:
+        raise ValueError('Invalid checksum string: %r' % value)
+
+    # Undo the rotation applied at the end of _char_encode; each byte of the
+    # value is then the sum of every fourth character, less the offset of
+    # ord('0') added to each character
+    asc = np.roll(ascii, -1)
+    value = 0
+    for i in range(4):
+        byte = asc[i::4].sum() - 4 * ord('0')
+        value = (value << 8) + int(byte)
+    return np.uint32(value)
+
+
 # TODO: Come up with a better __repr__ for HDUs (and for HDULists, for that
 # matter)
 class _BaseHDU(object):
@@ -81,6 +430,19 @@ class _BaseHDU(object):
 
     _default_name = ''
 
+    # Whether the CHECKSUM and DATASUM cards of this HDU type may be computed
+    # while its data is being written (see _update_checksum and _writeto)
+    _single_pass_checksum = False
+
+    # Set by HDUList.writeto() while calling _prewriteto() if the output file
+    # supports rewriting the header after the data has been written
+    _defer_checksum = False
+    _pending_checksum = None
+
+    # The keyword arguments the HDU was read from its file with; see
+    # _ValidHDU.handle
+    _open_kwargs = {}
+
     def __new__(cls, data=None, header=None, *args, **kwargs):
         """
         Iterates through the subclasses of _BaseHDU and uses that class's
@@ -382,7 +744,21 @@ class _BaseHDU(object):
             from_file = True
             if header is None:
                 header_offset = data.tell()
-                header = Header.fromfile(data, endcard=not ignore_missing_end)
+
+                # The header is read with positional reads so that reading it
+                # does not depend on the shared file position
+                def block_iter(nbytes):
+                    offset = header_offset
+                    while True:
+                        block = data.pread(nbytes, offset)
+                        if not block:
+                            break
+                        offset += len(block)
+                        yield block
+
+                header_str, header = Header._from_blocks(
+                    block_iter, True, '', not ignore_missing_end, True)
+                data.seek(header_offset + len(header_str))
             hdu_fileobj = data
             data_offset = data.tell()  # *after* reading the header
         else:
@@ -443,6 +819,8 @@ class _BaseHDU(object):
         hdu._header_offset = header_offset     # beginning of the header area
         hdu._data_offset = data_offset         # beginning of the data area
 
+        hdu._open_kwargs = dict(kwargs, ignore_missing_end=ignore_missing_end)
+
         # data area size, including padding
         size = hdu.size
         hdu._data_size = size + _pad_length(size)
@@ -471,6 +849,31 @@ class _BaseHDU(object):
         else:
             return None
 
+    def _raw_data_writes_through(self):
+        """
+        Returns `True` if changes made to the arrays returned by
+        `_get_raw_data` are written to the file, as they are when the file is
+        memory mapped in update mode.
+        """
+
+        return (not self._buffer and self._file is not None and
+                self._file.memmap and MEMMAP_MODES[self._file.mode] == 'r+')
+
+    def _readinto_raw(self, buf, offset):
+        """
+        Fills the `numpy.uint8` array ``buf`` with the raw bytes starting at
+        ``offset`` of either the HDU's memory buffer or underlying file,
+        reading from the file directly into ``buf`` where possible.
+        """
+
+        if self._buffer:
+            buf[:] = np.frombuffer(self._buffer, dtype=np.uint8,
+                                   count=len(buf), offset=offset)
+        elif self._file.readinto(buf, offset) < len(buf):
+            raise ValueError(
+                'Could not read %d bytes at offset %d: the file may have been '
+                'truncated' % (len(buf), offset))
+
     # TODO: Rework checksum handling so that it's not necessary to add a
     # checksum argument here
     # TODO: The BaseHDU class shouldn't even handle checksums since they're
@@ -518,7 +921,16 @@ class _BaseHDU(object):
         elif (modified or self._new or
                 (checksum and ('CHECKSUM' not in self._header or
                                'DATASUM' not in self._header))):
-            if checksum == 'datasum':
+            if (self._defer_checksum and self._single_pass_checksum and
+                    (checksum is True or checksum in ('standard', 'datasum'))
+                    and self._stored_datasum('standard',
+                                             datasum_keyword) is None):
+                # The data has to be read to compute its datasum anyways, so
+                # only reserve space for the cards for now; their values are
+                # filled in by _writeto() as the data is written
+                self._add_checksum_placeholders(checksum, checksum_keyword,
+                                                datasum_keyword)
+            elif checksum == 'datasum':
                 self.add_datasum(datasum_keyword=datasum_keyword)
             elif checksum == 'nonstandard_datasum':
                 self.add_datasum(blocking='nonstandard',
@@ -538,6 +950,37 @@ class _BaseHDU(object):
                                   checksum_keyword=checksum_keyword,
                                   datasum_keyword=datasum_keyword)
 
+    def _add_checksum_placeholders(self, checksum, checksum_keyword,
+                                   datasum_keyword):
+        """
+        Add the ``CHECKSUM`` (unless ``checksum='datasum'``) and ``DATASUM``
+        cards to the header with dummy values, so that the size of the header
+        is known before the checksums are computed.
+        """
+
+        when = 'data unit checksum updated %s' % self._get_timestamp()
+        self._header[datasum_keyword] = ('0', when)
+
+        if checksum != 'datasum':
+            when = 'HDU checksum updated %s' % self._get_timestamp()
+            self._header.set(checksum_keyword, '0' * 16, when,
+                             before=datasum_keyword)
+
+        self._pending_checksum = (checksum, checksum_keyword, datasum_keyword)
+
+    def _set_checksum_values(self, datasum, pending):
+        """
+        Fill in the values of the cards added by
+        `_add_checksum_placeholders`, given the datasum of the HDU.
+        """
+
+        checksum, checksum_keyword, datasum_keyword = pending
+        self._header[datasum_keyword] = str(datasum)
+
+        if checksum != 'datasum':
+            self._header[checksum_keyword] = self._calculate_checksum(
+                datasum, 'standard', checksum_keyword=checksum_keyword)
+
     def _postwriteto(self):
         # If data is unsigned integer 16, 32 or 64, remove the
         # BSCALE/BZERO cards
@@ -623,14 +1066,16 @@ class _BaseHDU(object):
     def _writedata_direct_copy(self, fileobj):
         """Copies the data directly from one file/buffer to the new file.
 
-        For now this is handled by loading the raw data from the existing data
-        (including any padding) via a memory map or from an already in-memory
-        buffer and using Numpy's existing file-writing facilities to write to
-        the new file.
-
-        If this proves too slow a more direct approach may be used.
+        Data in a file is copied (including any padding) with
+        `_File.copy_to`, which lets the kernel make the copy where possible.
+        Data in an in-memory buffer is written to the new file using Numpy's
+        existing file-writing facilities.
         """
 
+        if self._buffer is None and self._file:
+            return self._file.copy_to(fileobj, self._data_offset,
+                                      self._data_size)
+
         raw = self._get_raw_data(self._data_size, 'ubyte', self._data_offset)
         if raw is not None:
             _array_to_file(raw, fileobj)
@@ -644,9 +1089,32 @@ class _BaseHDU(object):
     # somehow...
     def _writeto(self, fileobj, inplace=False, copy=False):
         # For now fileobj is assumed to be a _File object
+        pending = self._pending_checksum
+        self._pending_checksum = None
+
+        if pending is not None and (inplace and not self._new or
+                                    not fileobj._is_rewritable()):
+            # The header can't be rewritten after writing the data, so compute
+            # the checksums up front as usual
+            self._set_checksum_values(self._calculate_datasum('standard'),
+                                      pending)
+            pending = None
+
         if not inplace or self._new:
             header_offset, _ = self._writeheader(fileobj)
-            data_offset, data_size = self._writedata(fileobj)
+
+            if pending is not None:
+                # Sum the data as it is written, then go back and rewrite the
+                # header (which does not change size) with the final values
+                writer = _ChecksumWriter(fileobj)
+                data_offset, data_size = self._writedata(writer)
+                self._set_checksum_values(writer.datasum, pending)
+                end_offset = fileobj.tell()
+                fileobj.seek(header_offset)
+                self._writeheader(fileobj)
+                fileobj.seek(end_offset)
+            else:
+                data_offset, data_size = self._writedata(fileobj)
 
             # Set the various data location attributes on newly-written HDUs
             if self._new:
@@ -671,12 +1139,11 @@ class _BaseHDU(object):
             # updated here too
             datloc = hdrloc + hdrsize
         elif copy:
-            # Seek to the original header location in the file
-            self._file.seek(hdrloc)
             # Before writing, update the hdrloc with the current file position,
             # which is the hdrloc for the new file
+            old_hdrloc = hdrloc
             hdrloc = fileobj.tell()
-            fileobj.write(self._file.read(hdrsize))
+            self._file.copy_to(fileobj, old_hdrloc, hdrsize)
             # The header size is unchanged, but the data location may be
             # different from before depending on if previous HDUs were resized
             datloc = fileobj.tell()
@@ -856,6 +1323,8 @@ class _ValidHDU(_BaseHDU, _Verify):
     Base class for all HDUs which are not corrupted.
     """
 
+    _single_pass_checksum = True
+
     def __init__(self, data=None, header=None, name=None, **kwargs):
         super(_ValidHDU, self).__init__(data=data, header=header)
         if name is not None:
@@ -880,17 +1349,7 @@ class _ValidHDU(_BaseHDU, _Verify):
         Size (in bytes) of the data portion of the HDU.
         """
 
-        size = 0
-        naxis = self._header.get('NAXIS', 0)
-        if naxis > 0:
-            size = 1
-            for idx in range(naxis):
-                size = size * self._header['NAXIS' + str(idx + 1)]
-            bitpix = self._header['BITPIX']
-            gcount = self._header.get('GCOUNT', 1)
-            pcount = self._header.get('PCOUNT', 0)
-            size = abs(bitpix) * gcount * (pcount + size) // 8
-        return size
+        return _hdr_data_size(self._header)
 
     def filebytes(self):
         """
@@ -938,6 +1397,59 @@ class _ValidHDU(_BaseHDU, _Verify):
         else:
             return None
 
+    def handle(self):
+        """
+        Returns an `HDUHandle` referring to this HDU in the
+        file it was read from.
+
+        The handle can be pickled cheaply, as it contains only the name of the
+        file, the location of the HDU in it, and the options the file was
+        opened with.  It can be used to read the HDU's header and data (or
+        just a section of an image) in another process, without reading the
+        rest of the file or sending the data between processes.
+
+        The HDU must have been read from a file on disk (and be unchanged in
+        the file), or a `ValueError` is raised.
+        """
+
+        from pyfits.hdu.handle import HDUHandle
+
+        name = self._file and self._file.name
+        if (self._new or not isinstance(name, string_types) or
+                not os.path.isfile(name)):
+            raise ValueError('Only HDUs read from a file on disk have '
+                             'handles.')
+
+        return HDUHandle(os.path.abspath(name), self._header_offset,
+                         self._data_offset, self._data_size, name=self.name,
+                         ver=self.ver, memmap=self._file.memmap,
+                         kwargs=self._open_kwargs)
+
+    def to_shared_memory(self):
+        """
+        Copies the data of this HDU into a new named shared memory segment,
+        and returns a `~pyfits.sharedmem.SharedMemoryDescriptor` for it.
+
+        The descriptor can be pickled cheaply and sent to other processes on
+        the same machine, where its ``attach()`` method returns the data
+        without copying it.  This is useful when the data can not simply be
+        memory mapped from the file by each process, for example because it
+        is scaled or compressed, or was created in memory.
+
+        Image data is stored as its final array (after any scaling or
+        decompression); table data is stored in the same format as in a FITS
+        file, including the heap.  If the data has not been read yet (and
+        needs no scaling) it is read from the file directly into the
+        segment.
+
+        The segment remains until the descriptor's ``unlink()`` method is
+        called, or the process that created it exits.
+        """
+
+        from pyfits.sharedmem import _share_raw_data
+
+        return _share_raw_data(self)
+
     def copy(self):
         """
         Make a copy of the HDU, both header and data are copied.
@@ -1259,7 +1771,7 @@ class _ValidHDU(_BaseHDU, _Verify):
         generation of a ``CHECKSUM`` card with a consistent value.
         """
 
-        cs = self._calculate_datasum(blocking)
+        cs = self._get_datasum(blocking, datasum_keyword)
 
         if when is None:
             when = 'data unit checksum updated %s' % self._get_timestamp()
@@ -1312,7 +1824,7 @@ class _ValidHDU(_BaseHDU, _Verify):
                                        datasum_keyword=datasum_keyword)
         else:
             # Just calculate the data checksum
-            data_cs = self._calculate_datasum(blocking)
+            data_cs = self._get_datasum(blocking, datasum_keyword)
 
         if when is None:
             when = 'HDU checksum updated %s' % self._get_timestamp()
@@ -1435,6 +1947,43 @@ class _ValidHDU(_BaseHDU, _Verify):
 
         return datetime.datetime.now().isoformat()[:19]
 
+    def _get_datasum(self, blocking, datasum_keyword='DATASUM'):
+        """
+        Returns the datasum of the HDU's data for use in the ``DATASUM`` and
+        ``CHECKSUM`` cards.
+
+        If the data has not been modified since it was read from the file
+        (that is, it has not been loaded, replaced, or is loaded read-only)
+        the existing value of the ``DATASUM`` card is reused, so that updating
+        the checksum after only modifying the header does not require reading
+        all the data.  Otherwise the datasum is calculated from the data.
+        """
+
+        datasum = self._stored_datasum(blocking, datasum_keyword)
+        if datasum is not None:
+            return datasum
+
+        return self._calculate_datasum(blocking)
+
+    def _stored_datasum(self, blocking, datasum_keyword='DATASUM'):
+        """
+        Returns the value of the existing ``DATASUM`` card if it can be reused
+        for the HDU's data (see `_get_datasum`), or `None` otherwise.
+        """
+
+        if (blocking in ('standard', 'either', True) and
+                self._file is not None and not self._data_replaced and
+                datasum_keyword in self._header and
+                (not self._data_loaded or
+                 (isinstance(self.data, np.ndarray) and
+                  not self.data.flags.writeable))):
+            try:
+                return int(self._header[datasum_keyword])
+            except (TypeError, ValueError):
+                pass
+
+        return None
+
     def _calculate_datasum(self, blocking):
         """
         Calculate the value for the ``DATASUM`` card in the HDU.
@@ -1480,149 +2029,21 @@ class _ValidHDU(_BaseHDU, _Verify):
 
         return s
 
-    def _compute_checksum(self, data, sum32=0, blocking="standard"):
-        """
-        Compute the ones-complement checksum of a sequence of bytes.
-
-        Parameters
-        ----------
-        data
-            a memory region to checksum
-
-        sum32
-            incremental checksum value from another region
-
-        blocking
-            "standard", "nonstandard", or "either"
-            selects the block size on which to perform checksumming,
-            originally the blocksize was chosen incorrectly.  "nonstandard"
-            selects the original approach,  "standard" selects the
-            interoperable blocking size of 2880 bytes.  In the context of
-            _compute_checksum, "either" is synonymous with "standard".
-
-        Returns
-        -------
-        ones complement checksum
-        """
-
-        blocklen = {'standard': 2880,
-                    'nonstandard': len(data),
-                    'either': 2880,  # do standard first
-                    True: 2880}[blocking]
-
-        sum32 = np.uint32(sum32)
-        for i in range(0, len(data), blocklen):
-            length = min(blocklen, len(data) - i)   # ????
-            sum32 = self._compute_hdu_checksum(data[i:i + length], sum32)
-        return sum32
-
-    def _compute_hdu_checksum(self, data, sum32=0):
-        """
-        Translated from FITS Checksum Proposal by Seaman, Pence, and Rots.
-        Use uint32 literals as a hedge against type promotion to int64.
-
-        This code should only be called with blocks of 2880 bytes
-        Longer blocks result in non-standard checksums with carry overflow
-        Historically,  this code *was* called with larger blocks and for that
-        reason still needs to be for backward compatibility.
+    def _compute_checksum(self, data, sum32=0, blocking='standard'):
         """
-
-        u8 = np.uint32(8)
-        u16 = np.uint32(16)
-        uFFFF = np.uint32(0xFFFF)
-
-        if data.nbytes % 2:
-            last = data[-1]
-            data = data[:-1]
-        else:
-            last = np.uint32(0)
-
-        data = data.view('>u2')
-
-        hi = sum32 >> u16
-        lo = sum32 & uFFFF
-        hi += np.add.reduce(data[0::2])
-        lo += np.add.reduce(data[1::2])
-
-        if (data.nbytes // 2) % 2:
-            lo += last << u8
-        else:
-            hi += last << u8
-
-        hicarry = hi >> u16
-        locarry = lo >> u16
-
-        while hicarry or locarry:
-            hi = (hi & uFFFF) + locarry
-            lo = (lo & uFFFF) + hicarry
-            hicarry = hi >> u16
-            locarry = lo >> u16
-
-        return (hi << u16) + lo
-
-    # _MASK and _EXCLUDE used for encoding the checksum value into a character
-    # string.
-    _MASK = [0xFF000000,
-             0x00FF0000,
-             0x0000FF00,
-             0x000000FF]
-
-    _EXCLUDE = [0x3a, 0x3b, 0x3c, 0x3d, 0x3e, 0x3f, 0x40,
-                0x5b, 0x5c, 0x5d, 0x5e, 0x5f, 0x60]
-
-    def _encode_byte(self, byte):
-        """
-        Encode a single byte.
+        Compute the ones-complement checksum of a sequence of bytes.  See
+        `_compute_checksum` at the module level.
         """
 
-        quotient = byte // 4 + ord('0')
-        remainder = byte % 4
-
-        ch = np.array(
-            [(quotient + remainder), quotient, quotient, quotient],
-            dtype='int32')
-
-        check = True
-        while check:
-            check = False
-            for x in self._EXCLUDE:
-                for j in [0, 2]:
-                    if ch[j] == x or ch[j + 1] == x:
-                        ch[j] += 1
-                        ch[j + 1] -= 1
-                        check = True
-        return ch
+        return _compute_checksum(data, sum32, blocking)
 
     def _char_encode(self, value):
         """
-        Encodes the checksum `value` using the algorithm described
-        in SPR section A.7.2 and returns it as a 16 character string.
-
-        Parameters
-        ----------
-        value
-            a checksum
-
-        Returns
-        -------
-        ascii encoded checksum
+        Encodes the checksum ``value`` as a 16 character string.  See
+        `_char_encode` at the module level.
         """
 
-        value = np.uint32(value)
-
-        asc = np.zeros((16,), dtype='byte')
-        ascii = np.zeros((16,), dtype='byte')
-
-        for i in range(4):
-            byte = (value & self._MASK[i]) >> ((3 - i) * 8)
-            ch = self._encode_byte(byte)
-            for j in range(4):
-                asc[4 * j + i] = ch[j]
-
-        for i in range(16):
-            ascii[i] = asc[(i + 15) % 16]
-
-        return decode_ascii(ascii.tostring())
+        return _char_encode(value)
 
 
 class ExtensionHDU(_ValidHDU):
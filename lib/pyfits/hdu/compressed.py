@@ -10,6 +10,7 @@ from ..extern.six import string_types, iteritems
 from ..extern.six.moves import range
 
 from ..card import Card
+from ..chunked import _ArrayChunkedArray
 from ..column import Column, ColDefs, _FormatP, TDEF_RE
 from ..column import KEYWORD_NAMES as TABLE_KEYWORD_NAMES
 from ..fitsrec import FITS_rec
@@ -17,7 +18,9 @@ from ..header import Header
 from ..util import (lazyproperty, _is_pseudo_unsigned, _unsigned_zero,
                     deprecated, _is_int, PyfitsPendingDeprecationWarning)
 from .base import DELAYED, ExtensionHDU
-from .image import _ImageBaseHDU, ImageHDU
+from .image import (_ImageBaseHDU, ImageHDU, _section_region,
+                    _check_read_into, _scale_image_data,
+                    _unscale_image_data)
 from .table import BinTableHDU
 
 try:
@@ -379,6 +382,10 @@ class CompImageHDU(BinTableHDU):
     responsibility).
     """
 
+    # The image checksums are computed from a temporary uncompressed ImageHDU
+    # in _prewriteto(), so they can't be computed while writing the data
+    _single_pass_checksum = False
+
     def __init__(self, data=None, header=None, name=None,
                  compression_type=DEFAULT_COMPRESSION_TYPE,
                  tile_size=None,
@@ -1439,6 +1446,73 @@ class CompImageHDU(BinTableHDU):
         # Determine from the values read from the header
         return tuple(reversed(self._axes))
 
+    def to_shared_memory(self):
+        """
+        Copies the decompressed image data into a new named shared memory
+        segment, and returns a `~pyfits.sharedmem.SharedMemoryDescriptor`
+        from which other processes on the same machine can attach to it as an
+        array without copying it.  The segment remains until the descriptor's
+        ``unlink()`` method is called, or the process that created it exits.
+        """
+
+        from pyfits.sharedmem import _share_image_data
+
+        return _share_image_data(self)
+
+    def read_into(self, out, section=None):
+        """
+        Decompresses the image data, or a section of it, into the existing
+        array ``out``, applying any ``BSCALE``/``BZERO``/``BLANK`` scaling,
+        and returns ``out``; see `ImageHDU.read_into`.
+
+        The whole image is still decompressed into a temporary array, but is
+        then scaled directly into ``out``.
+        """
+
+        if not self.shape:
+            raise ValueError('The HDU has no data.')
+
+        region, shape = _section_region(self.shape, section)
+        _check_read_into(out, shape)
+
+        # Blank values given per tile in a ZBLANK column are handled by the
+        # data attribute
+        if (self._data_loaded or
+                'ZBLANK' in self.compressed_data.columns.names):
+            out[...] = self.data[region].reshape(shape)
+            return out
+
+        data = compression.decompress_hdu(self)[region].reshape(shape)
+        if self._orig_bzero == 0 and self._orig_bscale == 1:
+            out[...] = data
+        else:
+            if out.dtype.kind == 'f':
+                blank = self._header.get('ZBLANK', self._header.get('BLANK'))
+            else:
+                blank = None
+            _scale_image_data(data, out, self._orig_bscale,
+                              self._orig_bzero, blank)
+
+        return out
+
+    def stats(self, stats=None, section=None, ignore_blank=True, exact=True,
+              workers=None):
+        """
+        Computes statistics of the image data, or a section of it, and returns
+        a dict mapping the name of each statistic to its value; see
+        `ImageHDU.stats`.
+
+        The whole image is decompressed into memory first, but no further
+        copies of it are made.
+        """
+
+        if not self.shape:
+            raise ValueError('The HDU has no data.')
+
+        region = _section_region(self.shape, section)[0]
+        chunked = _ArrayChunkedArray(self.data[region], workers=workers)
+        return chunked.stats(stats, ignore_nan=ignore_blank, exact=exact)
+
     @lazyproperty
     def header(self):
         # The header attribute is the header for the image data.  It
@@ -1725,7 +1799,6 @@ class CompImageHDU(BinTableHDU):
 
         # Do the scaling
         if _zero != 0:
-            self.data += -_zero
             self.header['BZERO'] = _zero
         else:
             # Delete from both headers
@@ -1736,7 +1809,6 @@ class CompImageHDU(BinTableHDU):
                     pass
 
         if _scale != 1:
-            self.data /= _scale
             self.header['BSCALE'] = _scale
         else:
             for header in (self.header, self._header):
@@ -1745,8 +1817,19 @@ class CompImageHDU(BinTableHDU):
                 except KeyError:
                     pass
 
-        if self.data.dtype.type != _type:
-            self.data = np.array(np.around(self.data), dtype=_type)  # 0.7.7.1
+        # As in ImageHDU.scale, the data is only scaled in place if its type
+        # does not change
+        data = self.data
+        if data.dtype.type == _type and data.flags.c_contiguous:
+            scaled = data
+        else:
+            scaled = np.empty(data.shape, dtype=_type)
+
+        _unscale_image_data(data, scaled, _scale, _zero,
+                            round=(scaled.dtype != data.dtype or
+                                   scaled.dtype.kind != 'f'))
+        if scaled is not data:
+            self.data = scaled
 
         # Update the BITPIX Card to match the data
         self._bitpix = _ImageBaseHDU.ImgCode[self.data.dtype.name]
@@ -470,6 +470,33 @@ class GroupsHDU(PrimaryHDU, _TableLikeHDU):
             size += output.size * output.itemsize
         return size
 
+    def to_shared_memory(self):
+        # Random groups data is shared in the same way as table data, rather
+        # than as an image
+        from pyfits.sharedmem import _share_raw_data
+
+        return _share_raw_data(self)
+
+    def to_chunked(self, chunks=None, workers=None):
+        raise TypeError('Random groups data can not be read as a chunked '
+                        'array.')
+
+    def read_into(self, out, section=None):
+        raise TypeError('Random groups data can not be read into an image '
+                        'array.')
+
+    def stats(self, stats=None, section=None, ignore_blank=True, exact=True,
+              workers=None):
+        raise TypeError('Statistics of random groups data can not be '
+                        'computed as of an image.')
+
+    def downsample(self, factor, method='mean'):
+        raise TypeError('Random groups data can not be downsampled.')
+
+    def write_pyramid(self, fileobj, factors=(2, 4, 8), method='mean',
+                      compression_type=None, clobber=False):
+        raise TypeError('Random groups data can not be downsampled.')
+
     def _verify(self, option='warn'):
         errs = super(GroupsHDU, self)._verify(option=option)
 
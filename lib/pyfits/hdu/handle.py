@@ -0,0 +1,120 @@
+from __future__ import with_statement
+
+import os
+import threading
+import weakref
+
+from ..file import _File
+from . import compressed
+from .base import _BaseHDU
+
+
+# The files opened by HDU handles in this process, keyed by the process ID
+# (so that a forked process does not share the open files of its parent),
+# file name, and memmap option.  Files are kept open only for as long as an
+# HDU read through a handle refers to them.
+_handle_files = weakref.WeakValueDictionary()
+_handle_files_lock = threading.Lock()
+
+
+class HDUHandle(object):
+    """
+    A lightweight reference to an HDU in a FITS file on disk, returned by
+    ``hdu.handle()``.
+
+    A handle holds only the file name, the location of the HDU in the file,
+    and the options the file was opened with, so it is cheap to pickle and
+    send to another process (for example to the workers of a
+    `multiprocessing.Pool`).  The HDU is read from the file the first time
+    one of the ``hdu``, ``header``, ``data``, or ``section`` attributes is
+    accessed; only the header of this HDU is read, and the data is memory
+    mapped if the original file was opened with ``memmap=True``.  Handles to
+    HDUs in the same file share a single open file in each process.
+
+    A handle always refers to the HDU as it is stored in the file; changes
+    made to the original HDU that have not been written to the file are not
+    seen through the handle.
+    """
+
+    def __init__(self, filename, header_offset, data_offset, data_size,
+                 name=None, ver=None, memmap=False, kwargs=None):
+        self.filename = filename
+        self.header_offset = header_offset
+        self.data_offset = data_offset
+        self.data_size = data_size
+        self.name = name
+        self.ver = ver
+        self.memmap = memmap
+        self.kwargs = kwargs or {}
+        self._hdu = None
+
+    def __repr__(self):
+        return '<%s (%r, %r) at offset %d of %r>' % (
+            self.__class__.__name__, self.name, self.ver, self.header_offset,
+            self.filename)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_hdu'] = None
+        return state
+
+    @property
+    def hdu(self):
+        """The HDU referred to by this handle, read from the file."""
+
+        if self._hdu is None:
+            self._hdu = self._readfrom()
+        return self._hdu
+
+    @property
+    def header(self):
+        return self.hdu.header
+
+    @property
+    def data(self):
+        return self.hdu.data
+
+    @property
+    def section(self):
+        return self.hdu.section
+
+    def close(self):
+        """
+        Releases the HDU read through this handle, if any.  The file is closed
+        once no other HDU read through a handle uses it.
+        """
+
+        self._hdu = None
+
+    def _readfrom(self):
+        key = (os.getpid(), self.filename, self.memmap)
+        with _handle_files_lock:
+            fileobj = _handle_files.get(key)
+            if fileobj is None or fileobj.closed:
+                fileobj = _File(self.filename, mode='readonly',
+                                memmap=self.memmap)
+                _handle_files[key] = fileobj
+
+            saved_compression_enabled = compressed.COMPRESSION_ENABLED
+            try:
+                if self.kwargs.get('disable_image_compression'):
+                    compressed.COMPRESSION_ENABLED = False
+
+                # The header is read starting at the current file position,
+                # which is shared with the other handles using this file
+                fileobj.seek(self.header_offset)
+                hdu = _BaseHDU.readfrom(fileobj, **self.kwargs)
+            except (EOFError, IOError, ValueError):
+                # There is no longer a valid header at this offset
+                hdu = None
+            finally:
+                compressed.COMPRESSION_ENABLED = saved_compression_enabled
+
+        if (hdu is None or hdu._data_offset != self.data_offset or
+                hdu._data_size != self.data_size):
+            raise IOError('The HDU at offset %d of %r has changed since its '
+                          'handle was created.' %
+                          (self.header_offset, self.filename))
+
+        hdu._new = False
+        return hdu
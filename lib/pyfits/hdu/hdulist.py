@@ -4,10 +4,12 @@ import shutil
 import sys
 import warnings
 
+import numpy as np
+
 from ..extern.six import print_
-from ..file import _File
+from ..file import _File, _FileRegionWriter, ParallelGzipFile
 from ..util import (_is_int, _tmp_name, _pad_length, ignore_sigint,
-                    _get_array_mmap, indent, fileobj_closed)
+                    _get_array_mmap, _map_parallel, indent, fileobj_closed)
 from ..verify import _Verify, _ErrList, VerifyError, VerifyWarning
 from . import compressed
 from .base import _BaseHDU, _ValidHDU, _NonstandardHDU, ExtensionHDU
@@ -20,8 +22,10 @@ def fitsopen(name, mode='readonly', memmap=None, save_backup=False, **kwargs):
 
     Parameters
     ----------
-    name : file path, file object or file-like object
-        File to be opened.
+    name : file path, file object, file-like object, URL or `StorageBackend`
+        File to be opened.  Files opened from HTTP URLs in a read-only mode
+        are read on demand using range requests when the server supports
+        them; otherwise the file is downloaded first.
 
     mode : str
         Open mode, 'readonly' (default), 'update', 'append', 'denywrite', or
@@ -87,6 +91,49 @@ def fitsopen(name, mode='readonly', memmap=None, save_backup=False, **kwargs):
             if scaling back to integer values after performing floating point
             operations on the data.
 
+        - **scaled_dtype** : str or dtype
+
+            The floating point data type of scaled image data, such as
+            ``'float32'``.  By default data with ``BITPIX`` of 8 or 16 is
+            scaled to `float32`, and data with larger ``BITPIX`` to
+            `float64`.  This applies only to integer data; scaled floating
+            point data keeps the data type given by its ``BITPIX``.
+
+        - **scale_workers** : int
+
+            If greater than 1, image data is scaled on a pool of this many
+            threads.
+
+        - **native_byteorder** : bool
+
+            If `True`, image and table data is returned in the native byte
+            order of the machine rather than the big-endian byte order of
+            FITS files, so that arithmetic on it does not need to swap bytes.
+            The data is converted once, a chunk at a time, when it is read.
+            This is done in place, including in the private copy-on-write
+            mapping of memory mapped data, except when the file is memory
+            mapped in ``denywrite`` or ``update`` mode: then all the data (for
+            tables, including the heap) is first copied into memory.  The
+            arrays of variable length array columns remain big-endian.  The
+            data is swapped back to big-endian when it is written.
+
+        - **member** : str
+
+            When opening a zip file containing more than one file, the name
+            of the member of the zip file to open.
+
+        - **access** : str
+
+            A hint for how the file will be read: 'sequential' if the HDUs
+            will be read in order from start to finish (as by iterating over
+            the `HDUList`), 'random' if only small parts of the file will be
+            read in no particular order (such as small sections of large
+            images), or 'willneed' if the entire file is expected to be read
+            soon.  The hint is passed on to the operating system where
+            possible.  With 'sequential' or 'willneed' each HDU is prefetched
+            while the previous HDU is being processed when iterating over the
+            `HDUList`.
+
     Returns
     -------
         hdulist : an `HDUList` object
@@ -152,6 +199,8 @@ class HDUList(list, _Verify):
 
     def __iter__(self):
         for idx in range(len(self)):
+            if idx + 1 < len(self):
+                self._prefetch(idx + 1)
             yield self[idx]
 
     def __getitem__(self, key):
@@ -498,14 +547,56 @@ class HDUList(list, _Verify):
         else:
             return found
 
-    def readall(self):
+    def readall(self, workers=None, hdus=None):
         """
         Read data of all HDUs into memory.
+
+        The data of each HDU is read, scaled, and (for compressed image HDUs)
+        decompressed just as it would be on first accessing its ``.data``
+        attribute.  If the file was opened with ``memmap=True`` arrays that
+        do not need scaling are memory-mapped rather than read.
+
+        Parameters
+        ----------
+        workers : int, optional
+            The number of HDUs to read concurrently, each on its own thread.
+            Since the data is read from the file with positional reads, the
+            threads do not need to take turns seeking and reading.  By
+            default the HDUs are read one after another.
+
+        hdus : sequence, optional
+            The HDUs to read, each given by index, ``EXTNAME``, or
+            ``(EXTNAME, EXTVER)`` tuple.  By default the data of all HDUs is
+            read.
+
+        Returns
+        -------
+        errors : list
+            A list of ``(index, exception)`` tuples for the HDUs whose data
+            could not be read (a warning is also issued for each).  An error
+            reading one HDU does not prevent the others being read.
         """
 
-        for hdu in self:
-            if hdu.data is not None:
-                continue
+        if hdus is None:
+            indices = range(len(self))
+        else:
+            indices = [self.index_of(key) for key in hdus]
+
+        def read(idx):
+            try:
+                super(HDUList, self).__getitem__(idx).data
+            except Exception:
+                return idx, sys.exc_info()[1]
+            return idx, None
+
+        errors = []
+        for idx, exc in _map_parallel(read, indices, workers=workers):
+            if exc is not None:
+                warnings.warn('Failed to read the data of HDU %d: %s' %
+                              (idx, exc))
+                errors.append((idx, exc))
+
+        return errors
 
     @ignore_sigint
     def flush(self, output_verify='fix', verbose=False):
@@ -600,7 +691,7 @@ class HDUList(list, _Verify):
                 hdr.set('EXTEND', True, after='NAXIS' + str(n))
 
     def writeto(self, fileobj, output_verify='exception', clobber=False,
-                checksum=False):
+                checksum=False, workers=None):
         """
         Write the `HDUList` to a new file.
 
@@ -623,6 +714,17 @@ class HDUList(list, _Verify):
         checksum : bool
             When `True` adds both ``DATASUM`` and ``CHECKSUM`` cards
             to the headers of all HDU's written to the file.
+
+        workers : int, optional
+            The number of threads to write the HDUs with.  If more than one,
+            the HDUs are first all prepared for writing (scaling their data,
+            updating their headers, and so on) concurrently, which gives the
+            size and so the offset of each HDU in the file.  The HDUs are then
+            written concurrently, each at its own offset.  This is only
+            possible if the output can be written out of order--that is, if it
+            is not compressed, a non-seekable stream, or opened in append
+            mode; otherwise the HDUs are written one after another, as they
+            are by default.
         """
 
         if (len(self) == 0):
@@ -646,15 +748,93 @@ class HDUList(list, _Verify):
         fileobj = _File(fileobj, mode='ostream', clobber=clobber)
         hdulist = self.fromfile(fileobj)
 
-        for hdu in self:
-            hdu._prewriteto(checksum=checksum)
-            try:
-                hdu._writeto(hdulist.__file)
-            finally:
-                hdu._postwriteto()
+        # If the output file allows it, checksums are computed while writing
+        # the data instead of in a separate pass over the data beforehand
+        defer_checksum = bool(checksum) and hdulist.__file._is_rewritable()
+
+        if (workers is not None and workers > 1 and len(self) > 1 and
+                hdulist.__file._is_rewritable() and
+                all(isinstance(hdu, _ValidHDU) for hdu in self)):
+            self._writeto_parallel(hdulist.__file, checksum, workers)
+        else:
+            for hdu in self:
+                hdu._defer_checksum = defer_checksum
+                try:
+                    hdu._prewriteto(checksum=checksum)
+                finally:
+                    hdu._defer_checksum = False
+                try:
+                    hdu._writeto(hdulist.__file)
+                finally:
+                    hdu._postwriteto()
 
         hdulist.close(output_verify=output_verify, closed=closed)
 
+    def _writeto_parallel(self, fileobj, checksum, workers):
+        """
+        Writes the HDUs to the new, rewritable `_File` ``fileobj`` in two
+        phases, each spread over ``workers`` threads.
+
+        First each HDU is prepared for writing, as it is by the serial
+        `writeto`, and the sizes of its header and data are taken from its
+        updated header, giving the layout of the file.  Then all HDUs are
+        written at once, each to its own region of the file with positional
+        writes.  HDUs whose data share memory are always prepared and written
+        by the same thread, one after the other, since writing data may
+        byteswap it in place.
+        """
+
+        hdus = list(self)
+        groups = _shared_memory_groups(hdus)
+
+        def prepare(group):
+            sizes = []
+            for idx in group:
+                hdu = hdus[idx]
+                hdu._defer_checksum = bool(checksum)
+                try:
+                    hdu._prewriteto(checksum=checksum)
+                finally:
+                    hdu._defer_checksum = False
+                sizes.append((idx, len(str(hdu._header)),
+                              _hdu_data_write_size(hdu)))
+            return sizes
+
+        def write(group):
+            for idx in group:
+                offset, size = layout[idx]
+                region = _File(_FileRegionWriter(fileobj, offset, size),
+                               mode='update')
+                hdus[idx]._writeto(region)
+                if region.tell() != offset + size:
+                    raise IOError(
+                        'HDU %d was written as %d bytes, but %d bytes were '
+                        'reserved for it' % (idx, region.tell() - offset,
+                                             size))
+
+        try:
+            sizes = {}
+            for group_sizes in _map_parallel(prepare, groups,
+                                             workers=workers):
+                for idx, header_size, data_size in group_sizes:
+                    sizes[idx] = header_size + data_size
+
+            layout = []
+            offset = fileobj.tell()
+            for idx in range(len(hdus)):
+                layout.append((offset, sizes[idx]))
+                offset += sizes[idx]
+
+            for _ in _map_parallel(write, groups, workers=workers):
+                pass
+
+            # Leave the file positioned after the last HDU, as the serial
+            # write does
+            fileobj.seek(layout[-1][0] + layout[-1][1])
+        finally:
+            for hdu in hdus:
+                hdu._postwriteto()
+
     def close(self, output_verify='exception', verbose=False, closed=True):
         """
         Close the associated FITS file and memmap object, if any.
@@ -743,6 +923,26 @@ class HDUList(list, _Verify):
                 return self.__file.name
         return None
 
+    def _prefetch(self, idx):
+        """
+        If the file was opened with an access pattern hint of 'sequential' or
+        'willneed' starts prefetching the HDU at the given index.
+        """
+
+        fileobj = self.__file
+        if (fileobj is None or fileobj.closed or
+                fileobj.access not in ('sequential', 'willneed')):
+            return
+
+        hdu = super(HDUList, self).__getitem__(idx)
+        if (hdu._file is not fileobj or hdu._header_offset is None or
+                hdu._data_offset is None):
+            return
+
+        fileobj.prefetch(hdu._header_offset,
+                         hdu._data_offset + hdu._data_size -
+                         hdu._header_offset)
+
     @classmethod
     def _readfrom(cls, fileobj=None, data=None, mode=None,
                   memmap=False, save_backup=False, **kwargs):
@@ -752,10 +952,14 @@ class HDUList(list, _Verify):
         implementations are largely the same.
         """
 
+        member = kwargs.pop('member', None)
+        access = kwargs.pop('access', None)
+
         if fileobj is not None:
             if not isinstance(fileobj, _File):
                 # instantiate a FITS file object (ffo)
-                ffo = _File(fileobj, mode=mode, memmap=memmap)
+                ffo = _File(fileobj, mode=mode, memmap=memmap, member=member,
+                            access=access)
             else:
                 ffo = fileobj
             # The pyfits mode is determined by the _File initializer if the
@@ -926,12 +1130,16 @@ class HDUList(list, _Verify):
             # The underlying file is an acutal file object.  The HDUList is
             # resized, so we need to write it to a tmp file, delete the
             # original file, and rename the tmp file to the original file.
-            if self.__file.compression == 'gzip':
-                new_file = gzip.GzipFile(name, mode='ab+')
+            # The new file is not opened in append mode so that unmodified HDUs
+            # may be copied to it by the kernel, which is not possible for
+            # files opened with O_APPEND
+            compressed = self.__file.compression == 'gzip'
+            if compressed:
+                new_file = ParallelGzipFile(name)
             else:
                 new_file = name
 
-            hdulist = self.fromfile(new_file, mode='append')
+            hdulist = self.fromfile(new_file, mode='ostream')
 
             for hdu in self:
                 hdu._writeto(hdulist.__file, inplace=True, copy=True)
@@ -959,7 +1167,7 @@ class HDUList(list, _Verify):
             os.rename(name, old_name)
             os.chmod(old_name, old_mode)
 
-            if isinstance(new_file, gzip.GzipFile):
+            if compressed:
                 old_file = gzip.GzipFile(old_name, mode='rb+')
             else:
                 old_file = old_name
@@ -1062,3 +1270,49 @@ class HDUList(list, _Verify):
                 self._truncate = False
 
         return self._resize
+
+
+def _shared_memory_groups(hdus):
+    """
+    Groups the indices of ``hdus`` so that all HDUs whose data arrays may
+    share memory are in the same group.  Every other HDU is in a group of its
+    own.
+    """
+
+    groups = []
+    bounds = []
+    for idx, hdu in enumerate(hdus):
+        if hdu._has_data and isinstance(hdu.data, np.ndarray):
+            start, end = np.byte_bounds(hdu.data)
+            bounds.append((start, end, idx))
+        else:
+            groups.append([idx])
+
+    # Arrays share memory only if their byte bounds overlap
+    bounds.sort()
+    group_end = None
+    for start, end, idx in bounds:
+        if group_end is not None and start < group_end:
+            groups[-1].append(idx)
+            group_end = max(group_end, end)
+        else:
+            groups.append([idx])
+            group_end = end
+
+    return groups
+
+
+def _hdu_data_write_size(hdu):
+    """
+    Returns the number of bytes, including padding, that ``hdu._writedata``
+    will write for an HDU that has been prepared with ``hdu._prewriteto``.
+    """
+
+    if hdu._data_loaded or hdu._data_needs_rescale:
+        if hdu.data is None:
+            return 0
+        size = hdu.size
+        return size + _pad_length(size)
+
+    # The data is copied as is from the original file
+    return hdu._data_size or 0
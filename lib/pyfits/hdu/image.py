@@ -6,10 +6,17 @@ from ..extern.six.moves import range
 
 from ..header import Header
 from ..util import (_is_pseudo_unsigned, _unsigned_zero, _is_int,
-                    _normalize_slice, lazyproperty)
+                    _normalize_slice, _map_parallel, _contiguous_runs,
+                    _native_byteorder, lazyproperty)
+from ..chunked import _HDUChunkedArray
 from .base import DELAYED, _ValidHDU, ExtensionHDU
 
 
+# The number of elements of image data scaled at a time; this bounds the size
+# of the temporary arrays needed to apply or remove BSCALE/BZERO/BLANK
+_SCALE_CHUNK_SIZE = 2 ** 18
+
+
 class _ImageBaseHDU(_ValidHDU):
     """FITS image HDU base class.
 
@@ -41,7 +48,8 @@ class _ImageBaseHDU(_ValidHDU):
     }
 
     def __init__(self, data=None, header=None, do_not_scale_image_data=False,
-                 uint=False, scale_back=None, **kwargs):
+                 uint=False, scale_back=None, scaled_dtype=None,
+                 scale_workers=None, native_byteorder=False, **kwargs):
         from pyfits.hdu.groups import GroupsHDU
 
         super(_ImageBaseHDU, self).__init__(data=data, header=header)
@@ -101,6 +109,15 @@ class _ImageBaseHDU(_ValidHDU):
 
         self._uint = uint
         self._scale_back = scale_back
+        self._scale_workers = scale_workers
+        self._native_byteorder = native_byteorder
+
+        if scaled_dtype is not None:
+            scaled_dtype = np.dtype(scaled_dtype)
+            if scaled_dtype.kind != 'f':
+                raise ValueError('scaled_dtype must be a floating point data '
+                                 'type; got %r' % scaled_dtype.name)
+        self._scaled_dtype = scaled_dtype
 
         if do_not_scale_image_data:
             self._bzero = 0
@@ -416,8 +433,6 @@ class _ImageBaseHDU(_ValidHDU):
 
         # Do the scaling
         if _zero != 0:
-            # 0.9.6.3 to avoid out of range error for BZERO = +32768
-            self.data += -_zero
             self._header['BZERO'] = _zero
         else:
             try:
@@ -426,16 +441,29 @@ class _ImageBaseHDU(_ValidHDU):
                 pass
 
         if _scale and _scale != 1:
-            self.data /= _scale
             self._header['BSCALE'] = _scale
         else:
+            _scale = 1
             try:
                 del self._header['BSCALE']
             except KeyError:
                 pass
 
-        if self.data.dtype.type != _type:
-            self.data = np.array(np.around(self.data), dtype=_type)
+        # The data is scaled in place if its type does not change; otherwise
+        # the scaled data is written to a new array, leaving the original
+        # data unmodified
+        data = self.data
+        if data.dtype.type == _type and data.flags.c_contiguous:
+            scaled = data
+        else:
+            scaled = np.empty(data.shape, dtype=_type)
+
+        _unscale_image_data(data, scaled, _scale, _zero,
+                            round=(scaled.dtype != data.dtype or
+                                   scaled.dtype.kind != 'f'),
+                            workers=self._scale_workers)
+        if scaled is not data:
+            self.data = scaled
 
         # Update the BITPIX Card to match the data
         self._bitpix = _ImageBaseHDU.ImgCode[self.data.dtype.name]
@@ -450,6 +478,276 @@ class _ImageBaseHDU(_ValidHDU):
         self._orig_bzero = self._bzero
         self._orig_bscale = self._bscale
 
+    def to_shared_memory(self):
+        """
+        Copies the image data, after any scaling, into a new named shared
+        memory segment, and returns a
+        `~pyfits.sharedmem.SharedMemoryDescriptor` from which other processes
+        on the same machine can attach to it as an array without copying it.
+
+        If the data has not been read yet and needs no scaling it is read from
+        the file directly into the segment.  The segment remains until the
+        descriptor's ``unlink()`` method is called, or the process that
+        created it exits.
+        """
+
+        from pyfits.sharedmem import _share_image_data
+
+        return _share_image_data(self)
+
+    def to_chunked(self, chunks=None, workers=None):
+        """
+        Returns the image data as a `~pyfits.chunked.ChunkedArray`: a lazy
+        array split into blocks, which are read from the file and scaled only
+        when they are needed, one block at a time.  This allows computing on
+        images much larger than the available memory.
+
+        Parameters
+        ----------
+        chunks : int or tuple, optional
+            The size of the blocks.  If an int, the approximate size of each
+            block in bytes; blocks are then made of whole rows (or planes,
+            etc.) of the image, so that each block is read from the file in a
+            single read.  If a tuple, the size of the blocks along each axis,
+            in the same order as the axes of ``.data``; `None` or -1 selects
+            the whole axis.  Defaults to blocks of about 16 MB.
+
+        workers : int, optional
+            If greater than 1, blocks are read and computed on a pool of this
+            many threads.
+        """
+
+        if not self.shape:
+            raise ValueError('The HDU has no data.')
+
+        return _HDUChunkedArray(self, chunks, workers)
+
+    def stats(self, stats=None, section=None, ignore_blank=True, exact=True,
+              workers=None):
+        """
+        Computes statistics of the image data, or a section of it, and returns
+        a dict mapping the name of each statistic to its value.
+
+        The data is read and scaled one block of about 16 MB at a time (or
+        taken from ``.data`` if it was already read), so the whole scaled
+        image is never held in memory.  The minimum, maximum, sum, mean,
+        variance, and standard deviation are computed exactly in one pass
+        over the data; percentiles take further passes.  See
+        `pyfits.chunked.ChunkedArray.stats` for details.
+
+        Parameters
+        ----------
+        stats : sequence of str, optional
+            The statistics to compute: any of ``'count'``, ``'sum'``,
+            ``'min'``, ``'max'``, ``'mean'``, ``'var'``, ``'std'``,
+            ``'median'``, and ``'p<q>'`` for the ``q``-th percentile (such as
+            ``'p99.5'``).  Defaults to ``('count', 'min', 'max', 'mean',
+            'std', 'median')``.
+
+        section : tuple, optional
+            The section of the image to use: an integer or a slice with a
+            step of 1 for each axis, as when indexing `section`.
+
+        ignore_blank : bool, optional
+            If `True` (the default), pixels equal to ``BLANK`` and NaN pixels
+            (which are both NaN when the data is read) are ignored.
+            Otherwise every statistic but the count is NaN if there are any.
+
+        exact : bool, optional
+            If `False`, percentiles are interpolated from a histogram of the
+            data in a single pass, rather than selected exactly.
+
+        workers : int, optional
+            If greater than 1, blocks are read and computed on a pool of this
+            many threads.
+        """
+
+        if not self.shape:
+            raise ValueError('The HDU has no data.')
+
+        region = _section_region(self.shape, section)[0]
+        chunked = _HDUChunkedArray(self, workers=workers)
+        return chunked[region].stats(stats, ignore_nan=ignore_blank,
+                                     exact=exact)
+
+    def downsample(self, factor, method='mean'):
+        """
+        Returns a new `ImageHDU` containing the image data binned by
+        ``factor``, such as a preview of a large image.
+
+        The data is read and binned one strip of rows (of about 16 MB) at a
+        time through `section`, so only the binned image is held in memory.
+        The header is a copy of this HDU's header, with ``CRPIXn``,
+        ``CDELTn`` and ``CDi_j`` updated for the binned pixels.
+
+        Parameters
+        ----------
+        factor : int or tuple
+            The number of pixels along each axis combined into one binned
+            pixel, or a tuple giving the number along each axis, in the same
+            order as the axes of ``.data``.  Bins at the ends of axes whose
+            length is not a multiple of the factor contain fewer pixels.
+
+        method : str, optional
+            How the pixels in each bin are combined: ``'mean'`` (the
+            default), ``'max'``, or ``'sum'``.  NaN pixels (including
+            ``BLANK`` pixels) are ignored; bins containing only NaN pixels are
+            NaN.  Mean values are floating point; sums are 64-bit (integers
+            for integer data), and maxima have the data type of the data.
+        """
+
+        from pyfits.pyramid import _downsample
+
+        return _downsample(self, factor, method)
+
+    def write_pyramid(self, fileobj, factors=(2, 4, 8), method='mean',
+                      compression_type=None, clobber=False):
+        """
+        Writes a multi-resolution pyramid of the image data to a new FITS
+        file: an empty primary HDU followed by one image extension for each
+        of ``factors``, containing the data binned by that factor as by
+        `downsample`.
+
+        The extensions are named ``PYRAMID``, with ``EXTVER`` numbering the
+        levels from 1, and ``DOWNSAMn`` keywords giving the binning factor of
+        each axis ``n`` of each level.  All the levels are computed in a
+        single pass over the data, which is read one strip at a time; levels
+        whose factors are multiples of an earlier level's are binned from
+        that level.  The data of each level is written to its place in the
+        file as it is computed, so memory use does not depend on the size of
+        the image.
+
+        Parameters
+        ----------
+        fileobj : file path, file object or file-like object
+            The file to write.  Seekable files, including in-memory files
+            such as `io.BytesIO`, are written in place.  Files that can only
+            be written in order, such as gzip-compressed files (for example
+            a ``.gz`` file name), non-seekable streams, and files opened for
+            appending, are given a copy of the pyramid, which is first
+            written to a temporary file.
+
+        factors : sequence of int or tuple, optional
+            The binning factor of each level (see `downsample`).  Defaults to
+            2, 4, and 8.
+
+        method : str, optional
+            How the pixels in each bin are combined: ``'mean'``, ``'max'``,
+            or ``'sum'``.
+
+        compression_type : str, optional
+            If given, the levels are written as tile-compressed images
+            (`CompImageHDU`) with this compression type, such as
+            ``'RICE_1'``.  The levels are then first written uncompressed to
+            a temporary file, and compressed from there.
+
+        clobber : bool, optional
+            If `True`, overwrite the file if it exists.
+        """
+
+        from pyfits.pyramid import _write_pyramid
+
+        _write_pyramid(self, fileobj, factors, method, compression_type,
+                       clobber)
+
+    def read_into(self, out, section=None):
+        """
+        Reads the image data, or a section of it, into the existing array
+        ``out``, applying any ``BSCALE``/``BZERO``/``BLANK`` scaling, and
+        returns ``out``.
+
+        This avoids allocating new arrays when reading many images of the
+        same shape.  Unscaled data is read from the file directly into
+        ``out``; scaled data is read and scaled through a small temporary
+        buffer.
+
+        Parameters
+        ----------
+        out : `~numpy.ndarray`
+            A writeable, C-contiguous array with the shape of the data (or of
+            the section).  It may have any numeric data type and byte order;
+            for example, a native byte order `float32` array for scaled
+            16-bit data.  ``BLANK`` values are replaced with NaN if ``out``
+            has a floating point type.  Scaled data read into an integer
+            array is scaled in `float64` and then cast to the type of
+            ``out``, truncating any fractional part (for example, unsigned
+            16-bit data stored with ``BZERO = 32768`` can be read into a
+            `uint16` array).
+
+        section : tuple, optional
+            The section of the image to read: an integer or a slice with a
+            step of 1 for each axis, as when indexing `section`.
+        """
+
+        if not self.shape:
+            raise ValueError('The HDU has no data.')
+
+        region, shape = _section_region(self.shape, section)
+        _check_read_into(out, shape)
+
+        if not out.size:
+            return out
+        elif self._data_loaded or (self._file is None and not self._buffer):
+            out[...] = self.data[region].reshape(shape)
+            return out
+
+        raw_dtype = np.dtype(self.NumCode[self._orig_bitpix])
+        raw_dtype = raw_dtype.newbyteorder('>')
+        itemsize = raw_dtype.itemsize
+        scaled = not (self._orig_bzero == 0 and self._orig_bscale == 1 and
+                      self._blank is None)
+
+        run_shape, offsets = _contiguous_runs(self.shape, region)
+        run_size = int(np.prod(run_shape))
+        flat = out.reshape(-1)
+
+        if (not scaled and out.dtype.kind == raw_dtype.kind and
+                out.dtype.itemsize == itemsize):
+            # Read the raw data straight into out, and swap it to the byte
+            # order of out in place
+            buf = flat.view(np.uint8)
+            for idx, offset in enumerate(offsets):
+                start = idx * run_size * itemsize
+                self._readinto_raw(buf[start:start + run_size * itemsize],
+                                   self._data_offset + offset * itemsize)
+            if out.dtype != raw_dtype:
+                out.byteswap(True)
+            return out
+
+        if out.dtype.kind == 'f':
+            blank = self._blank
+        else:
+            blank = None
+
+        chunk_size = min(run_size, _SCALE_CHUNK_SIZE)
+        raw = np.empty(chunk_size, dtype=raw_dtype)
+        if scaled and out.dtype.kind != 'f':
+            # Scaling in place would fail to cast the floating point scale
+            # factors to the integer type of out
+            scaled_buf = np.empty(chunk_size, dtype=np.float64)
+        else:
+            scaled_buf = None
+        pos = 0
+        for offset in offsets:
+            for start in range(0, run_size, chunk_size):
+                count = min(chunk_size, run_size - start)
+                self._readinto_raw(raw[:count].view(np.uint8),
+                                   self._data_offset +
+                                   (offset + start) * itemsize)
+                if scaled and scaled_buf is not None:
+                    _scale_image_data(raw[:count], scaled_buf[:count],
+                                      self._orig_bscale, self._orig_bzero)
+                    flat[pos:pos + count] = scaled_buf[:count]
+                elif scaled:
+                    _scale_image_data(raw[:count], flat[pos:pos + count],
+                                      self._orig_bscale, self._orig_bzero,
+                                      blank)
+                else:
+                    flat[pos:pos + count] = raw[:count]
+                pos += count
+
+        return out
+
     def _verify(self, option='warn'):
         # update_header can fix some things that would otherwise cause
         # verification to fail, so do that now...
@@ -518,7 +816,11 @@ class _ImageBaseHDU(_ValidHDU):
                 if bitpix == bits and self._orig_bzero == 1 << (bits - 1):
                     return dtype
 
-        if bitpix > 16:  # scale integers to Float64
+        # The requested scaled data type applies only to integer data;
+        # floating point data keeps its own precision
+        if self._scaled_dtype is not None and bitpix > 0:
+            return self._scaled_dtype
+        elif bitpix > 16:  # scale integers to Float64
             return np.dtype('float64')
         elif bitpix > 0:  # scale integers to Float32
             return np.dtype('float32')
@@ -558,6 +860,9 @@ class _ImageBaseHDU(_ValidHDU):
 
         raw_data = self._get_raw_data(shape, code, offset)
         raw_data.dtype = raw_data.dtype.newbyteorder('>')
+        if self._native_byteorder:
+            raw_data = _native_byteorder(
+                raw_data, inplace=not self._raw_data_writes_through())
 
         if (self._orig_bzero == 0 and self._orig_bscale == 1 and
                 self._blank is None):
@@ -572,35 +877,19 @@ class _ImageBaseHDU(_ValidHDU):
             # In these cases, we end up with floating-point arrays and have to
             # apply bscale and bzero. We may have to handle BLANK and convert
             # to NaN in the resulting floating-point arrays.
-            if self._blank is not None:
-                blanks = raw_data.flat == self._blank
-                # The size of blanks in bytes is the number of elements in
-                # raw_data.flat.  However, if we use np.where instead we will
-                # only use 8 bytes for each index where the condition is true.
-                # So if the number of blank items is fewer than
-                # len(raw_data.flat) / 8, using np.where will use less memory
-                if blanks.sum() < len(blanks) / 8:
-                    blanks = np.where(blanks)
-
             new_dtype = self._dtype_for_bitpix()
             if new_dtype is not None:
-                data = np.array(raw_data, dtype=new_dtype)
+                data = np.empty(raw_data.shape, dtype=new_dtype)
             else:  # floating point cases
-                if self._file.memmap:
-                    data = raw_data.copy()
+                if self._file is None or self._file.memmap:
+                    data = np.empty_like(raw_data)
                 # if not memmap, use the space already in memory
                 else:
                     data = raw_data
 
-            del raw_data
-
-            if self._orig_bscale != 1:
-                np.multiply(data, self._orig_bscale, data)
-            if self._orig_bzero != 0:
-                data += self._orig_bzero
-
-            if self._blank is not None:
-                data.flat[blanks] = np.nan
+            _scale_image_data(raw_data, data, self._orig_bscale,
+                              self._orig_bzero, self._blank,
+                              workers=self._scale_workers)
 
         return data
 
@@ -806,7 +1095,8 @@ class PrimaryHDU(_ImageBaseHDU):
     _default_name = 'PRIMARY'
 
     def __init__(self, data=None, header=None, do_not_scale_image_data=False,
-                 uint=False, scale_back=None):
+                 uint=False, scale_back=None, scaled_dtype=None,
+                 scale_workers=None, native_byteorder=False):
         """
         Construct a primary HDU.
 
@@ -835,12 +1125,33 @@ class PrimaryHDU(_ImageBaseHDU):
             original BSCALE/BZERO values.  This could lead to loss of accuracy
             if scaling back to integer values after performing floating point
             operations on the data.
+
+        scaled_dtype : str or dtype, optional
+            The floating point data type of scaled image data.  By default
+            data with ``BITPIX`` of 8 or 16 is scaled to `float32`, and data
+            with larger ``BITPIX`` to `float64`; ``scaled_dtype='float32'``
+            halves the memory used by scaled 32-bit data.  This applies only
+            to integer data; scaled floating point data keeps the data type
+            given by its ``BITPIX``.
+
+        scale_workers : int, optional
+            If greater than 1, data is scaled on a pool of this many threads.
+
+        native_byteorder : bool, optional
+            If `True`, data read from a file is returned in the native byte
+            order of the machine rather than the big-endian byte order of FITS
+            files.  The data is converted a chunk at a time when it is read,
+            in place where possible; memory mapped data is converted in its
+            private copy-on-write mapping, except in the ``denywrite`` and
+            ``update`` modes, where a converted copy of all the data is made
+            in memory instead.
         """
 
         super(PrimaryHDU, self).__init__(
             data=data, header=header,
             do_not_scale_image_data=do_not_scale_image_data, uint=uint,
-            scale_back=scale_back)
+            scale_back=scale_back, scaled_dtype=scaled_dtype,
+            scale_workers=scale_workers, native_byteorder=native_byteorder)
 
         # insert the keywords EXTEND
         if header is None:
@@ -889,7 +1200,9 @@ class ImageHDU(_ImageBaseHDU, ExtensionHDU):
     _extension = 'IMAGE'
 
     def __init__(self, data=None, header=None, name=None,
-                 do_not_scale_image_data=False, uint=False, scale_back=None):
+                 do_not_scale_image_data=False, uint=False, scale_back=None,
+                 scaled_dtype=None, scale_workers=None,
+                 native_byteorder=False):
         """
         Construct an image HDU.
 
@@ -922,6 +1235,26 @@ class ImageHDU(_ImageBaseHDU, ExtensionHDU):
             original BSCALE/BZERO values.  This could lead to loss of accuracy
             if scaling back to integer values after performing floating point
             operations on the data.
+
+        scaled_dtype : str or dtype, optional
+            The floating point data type of scaled image data.  By default
+            data with ``BITPIX`` of 8 or 16 is scaled to `float32`, and data
+            with larger ``BITPIX`` to `float64`; ``scaled_dtype='float32'``
+            halves the memory used by scaled 32-bit data.  This applies only
+            to integer data; scaled floating point data keeps the data type
+            given by its ``BITPIX``.
+
+        scale_workers : int, optional
+            If greater than 1, data is scaled on a pool of this many threads.
+
+        native_byteorder : bool, optional
+            If `True`, data read from a file is returned in the native byte
+            order of the machine rather than the big-endian byte order of FITS
+            files.  The data is converted a chunk at a time when it is read,
+            in place where possible; memory mapped data is converted in its
+            private copy-on-write mapping, except in the ``denywrite`` and
+            ``update`` modes, where a converted copy of all the data is made
+            in memory instead.
         """
 
         # This __init__ currently does nothing differently from the base class,
@@ -930,7 +1263,8 @@ class ImageHDU(_ImageBaseHDU, ExtensionHDU):
         super(ImageHDU, self).__init__(
             data=data, header=header, name=name,
             do_not_scale_image_data=do_not_scale_image_data, uint=uint,
-            scale_back=scale_back)
+            scale_back=scale_back, scaled_dtype=scaled_dtype,
+            scale_workers=scale_workers, native_byteorder=native_byteorder)
 
     @classmethod
     def match_header(cls, header):
@@ -955,6 +1289,137 @@ class ImageHDU(_ImageBaseHDU, ExtensionHDU):
         return errs
 
 
+def _scale_image_data(raw_data, data, bscale, bzero, blank=None,
+                      workers=None):
+    """
+    Converts the contiguous array ``raw_data`` to physical values using
+    ``bscale`` and ``bzero``, replacing any ``blank`` values with NaN, and
+    stores the result in ``data`` (which may be ``raw_data`` itself).
+
+    The data is converted a chunk at a time, so the only temporary array used
+    is the mask of the blank values in one chunk.
+    """
+
+    raw_flat = raw_data.reshape(-1)
+    flat = data.reshape(-1)
+
+    def scale(chunk):
+        raw = raw_flat[chunk]
+        scaled = flat[chunk]
+        if blank is not None:
+            blanks = raw == blank
+        if data is not raw_data:
+            scaled[...] = raw
+        if bscale != 1:
+            np.multiply(scaled, bscale, scaled)
+        if bzero != 0:
+            np.add(scaled, bzero, scaled)
+        if blank is not None:
+            scaled[blanks] = np.nan
+
+    for _ in _map_parallel(scale, _flat_chunks(flat.size), workers=workers):
+        pass
+
+
+def _unscale_image_data(data, scaled, bscale, bzero, round=True,
+                        workers=None):
+    """
+    Converts ``data`` from physical values to values stored with ``bscale``
+    and ``bzero``, rounding them if ``round`` is `True`, and stores the result
+    in the contiguous array ``scaled`` (which may be ``data`` itself).
+
+    The data is converted a chunk at a time, so the only temporary array used
+    is one chunk of the data in the data type used for the arithmetic.
+    """
+
+    if data.dtype.kind == 'f':
+        work_dtype = data.dtype
+    elif bscale == 1 and bzero == int(bzero):
+        # Integers offset by an integer BZERO (such as pseudo-unsigned
+        # integers) are converted exactly, using integer arithmetic that
+        # wraps around when converting to the signed type
+        work_dtype = np.promote_types(data.dtype, scaled.dtype)
+        if work_dtype.kind not in 'iu':
+            work_dtype = data.dtype
+        bzero = np.array(bzero).astype(work_dtype)
+        round = False
+    else:
+        work_dtype = np.dtype(np.float64)
+
+    flat = data.reshape(-1)
+    scaled_flat = scaled.reshape(-1)
+    inplace = data is scaled and work_dtype == data.dtype
+
+    def unscale(chunk):
+        if inplace:
+            values = flat[chunk]
+        else:
+            values = np.array(flat[chunk], dtype=work_dtype)
+        if bzero != 0:
+            # 0.9.6.3 to avoid out of range error for BZERO = +32768
+            np.subtract(values, bzero, values)
+        if bscale != 1:
+            np.divide(values, bscale, values)
+        if round:
+            np.around(values, out=values)
+        if not inplace:
+            scaled_flat[chunk] = values
+
+    for _ in _map_parallel(unscale, _flat_chunks(flat.size),
+                           workers=workers):
+        pass
+
+
+def _section_region(shape, key):
+    """
+    Returns the region of an array of the given ``shape`` selected by
+    ``key`` (integers or slices with a step of 1 for each axis) as a tuple of
+    slices, and the shape of the selection.
+    """
+
+    if key is None:
+        key = ()
+    elif not isinstance(key, tuple):
+        key = (key,)
+    if len(key) > len(shape):
+        raise IndexError('too many indices')
+    key += (slice(None),) * (len(shape) - len(key))
+
+    region = []
+    selection_shape = []
+    for k, length in zip(key, shape):
+        if _is_int(k):
+            if not -length <= k < length:
+                raise IndexError('Index %s out of range.' % k)
+            k %= length
+            region.append(slice(k, k + 1))
+        elif isinstance(k, slice):
+            start, stop, step = k.indices(length)
+            if step != 1:
+                raise IndexError('Stepped Slice not supported')
+            region.append(slice(start, max(start, stop)))
+            selection_shape.append(max(0, stop - start))
+        else:
+            raise IndexError('Illegal index %s' % (k,))
+
+    return tuple(region), tuple(selection_shape)
+
+
+def _check_read_into(out, shape):
+    if not isinstance(out, np.ndarray):
+        raise TypeError('out must be a numpy array; got %r' % type(out))
+    if out.shape != tuple(shape):
+        raise ValueError('out has shape %r; expected %r' %
+                         (out.shape, tuple(shape)))
+    if not (out.flags.c_contiguous and out.flags.writeable):
+        raise ValueError('out must be a writeable, C-contiguous array')
+
+
+def _flat_chunks(size):
+    return [slice(start, min(start + _SCALE_CHUNK_SIZE, size))
+            for start in range(0, size, _SCALE_CHUNK_SIZE)]
+
+
 def _iswholeline(indx, naxis):
     if _is_int(indx):
         if indx >= 0 and indx < naxis:
@@ -21,10 +21,16 @@ from ..column import (FITS2NUMPY, KEYWORD_NAMES, KEYWORD_ATTRIBUTES, TDEF_RE,
                       _convert_format, _cmp_recformats, _get_index)
 from ..fitsrec import FITS_rec
 from ..header import Header
-from ..util import lazyproperty, _is_int, _str_to_num, _pad_length, deprecated
+from ..util import (lazyproperty, _is_int, _str_to_num, _pad_length,
+                    _native_byteorder, deprecated)
 from .base import DELAYED, _ValidHDU, ExtensionHDU
 
 
+# The approximate number of bytes of table rows read at a time by
+# BinTableHDU.read_into
+_READ_INTO_CHUNK_SIZE = 2 ** 21
+
+
 class FITSTableDumpDialect(csv.excel):
     """
     A CSV dialect for the PyFITS format of ASCII dumps of FITS tables.
@@ -51,6 +57,9 @@ class _TableLikeHDU(_ValidHDU):
     # after restructuring to support uints by default on a per-column basis
     _uint = False
 
+    # Whether data read from the file is converted to the native byte order
+    _native_byteorder = False
+
     @classmethod
     def match_header(cls, header):
         """
@@ -150,10 +159,26 @@ class _TableLikeHDU(_ValidHDU):
         self._init_tbdata(data)
         return data.view(self._data_type)
 
+    def _get_raw_data(self, shape, code, offset):
+        raw_data = super(_TableLikeHDU, self)._get_raw_data(shape, code,
+                                                            offset)
+        if (self._native_byteorder and raw_data is not None and
+                (not raw_data.flags.writeable or
+                 self._raw_data_writes_through())):
+            # _init_tbdata converts the table to native byte order in place,
+            # so the raw data (including any heap) must be in writeable memory
+            # that is not written back to the file
+            raw_data = raw_data.copy()
+        return raw_data
+
     def _init_tbdata(self, data):
         columns = self.columns
 
         data.dtype = data.dtype.newbyteorder('>')
+        if self._native_byteorder:
+            # Only the table itself is converted; the arrays of variable
+            # length array columns remain big-endian views of the heap
+            _native_byteorder(data)
 
         # hack to enable pseudo-uint support
         data._uint = self._uint
@@ -192,7 +217,8 @@ class _TableBaseHDU(ExtensionHDU, _TableLikeHDU):
     which perform their own heap maintenance.
     """
 
-    def __init__(self, data=None, header=None, name=None, uint=False):
+    def __init__(self, data=None, header=None, name=None, uint=False,
+                 native_byteorder=False):
         """
         Parameters
         ----------
@@ -207,6 +233,15 @@ class _TableBaseHDU(ExtensionHDU, _TableLikeHDU):
 
         uint : bool, optional
             set to `True` if the table contains unsigned integer columns.
+
+        native_byteorder : bool, optional
+            set to `True` to convert the table read from a file to the native
+            byte order of the machine, a chunk of rows at a time.  The table
+            is converted in place, except that memory mapped data in the
+            ``denywrite`` and ``update`` modes (and data in read-only memory)
+            is first copied into memory in full, along with any heap.  The
+            arrays of variable length array columns are not converted, and
+            remain big-endian.
         """
 
         super(_TableBaseHDU, self).__init__(data=data, header=header,
@@ -215,6 +250,7 @@ class _TableBaseHDU(ExtensionHDU, _TableLikeHDU):
         if header is not None and not isinstance(header, Header):
             raise ValueError('header must be a Header object.')
         self._uint = uint
+        self._native_byteorder = native_byteorder
         if data is DELAYED:
             # this should never happen
             if header is None:
@@ -661,6 +697,92 @@ class BinTableHDU(_TableBaseHDU):
         return (card.keyword == 'XTENSION' and
                 xtension in (cls._extension, 'A3DTABLE'))
 
+    def read_into(self, out, columns=None):
+        """
+        Reads columns of the table into the existing structured array
+        ``out``, applying any ``TSCALn``/``TZEROn`` scaling, and returns
+        ``out``.
+
+        This avoids allocating new arrays when reading many tables with the
+        same layout.  The rows are read from the file a few at a time into a
+        small temporary buffer, and each column is converted from there
+        directly into its field of ``out``.
+
+        Parameters
+        ----------
+        out : `~numpy.ndarray`
+            A structured array with one element per row of the table, and
+            one field for each column to read.  The fields may have any byte
+            order and any data type that the column's values can be converted
+            to; logical columns are read as booleans, and string columns as
+            they are stored (including any trailing spaces).
+
+        columns : sequence of str, optional
+            The names of the columns to read into the fields of ``out``, in
+            the order of the fields.  By default the columns with the same
+            names as the fields are read.
+
+        Variable length array and bit (``X`` format) columns are not
+        supported.
+        """
+
+        if not isinstance(out, np.ndarray) or out.dtype.names is None:
+            raise TypeError('out must be a structured numpy array')
+
+        names = out.dtype.names
+        if columns is None:
+            columns = names
+        elif len(columns) != len(names):
+            raise ValueError('%d columns given for the %d fields of out' %
+                             (len(columns), len(names)))
+
+        nrows = self._header['NAXIS2']
+        if out.shape != (nrows,):
+            raise ValueError('out has shape %r; expected %r' %
+                             (out.shape, (nrows,)))
+
+        indices = [_get_index(self.columns.names, name) for name in columns]
+        for idx in indices:
+            column = self.columns[idx]
+            if column.format.format in ('P', 'Q', 'X'):
+                raise ValueError('Column %r has format %s and can not be '
+                                 'read into an array' %
+                                 (column.name, column.format))
+
+        if self._data_loaded or (self._file is None and not self._buffer):
+            for name, idx in zip(names, indices):
+                out[name] = self.data.field(idx)
+            return out
+
+        raw_dtype = self.columns.dtype.newbyteorder('>')
+        row_size = self._header['NAXIS1']
+        chunk_rows = max(1, min(nrows,
+                                _READ_INTO_CHUNK_SIZE // max(row_size, 1)))
+        buf = np.empty(chunk_rows * row_size, dtype=np.uint8)
+
+        for start in range(0, nrows, chunk_rows):
+            count = min(chunk_rows, nrows - start)
+            self._readinto_raw(buf[:count * row_size],
+                               self._data_offset + start * row_size)
+            rows = np.ndarray((count,), dtype=raw_dtype, buffer=buf,
+                              strides=(row_size,))
+
+            for name, idx in zip(names, indices):
+                column = self.columns[idx]
+                field = rows[raw_dtype.names[idx]]
+                dest = out[name][start:start + count]
+                if column.format.format == 'L':
+                    np.equal(field, ord('T'), dest)
+                    continue
+
+                dest[...] = field
+                if column.bscale not in (None, 1):
+                    np.multiply(dest, column.bscale, dest)
+                if column.bzero not in (None, 0):
+                    np.add(dest, column.bzero, dest)
+
+        return out
+
     def _calculate_datasum_with_heap(self, blocking):
         """
         Calculate the value for the ``DATASUM`` card given the input data
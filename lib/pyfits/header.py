@@ -2102,6 +2102,131 @@ class Header(object):
                 prev_key += 1
 
 
+class _BasicHeader(object):
+    """
+    A minimal, read-only header representation built directly from the raw
+    header bytes of an HDU.
+
+    Unlike `Header` this does not create `Card` objects for every card in the
+    header; it only builds an index mapping keywords to the positions of
+    their card images.  A card's value is parsed (through `Card.fromstring`)
+    only when it is actually looked up.  This makes it much cheaper than a
+    full `Header` when only a handful of keyword values are needed, as when
+    scanning the headers of a large number of files.
+
+    Records ``size``, the number of bytes occupied by the header (including
+    padding), and ``end_offset``, the offset of the ``END`` card within the
+    header.
+    """
+
+    def __init__(self, header_str):
+        self._raw = header_str
+        self._index = {}
+        self._values = {}
+        self.size = len(header_str)
+        self.end_offset = None
+
+        clen = Card.length
+        for offset in range(0, len(header_str), clen):
+            keyword = header_str[offset:offset + 8]
+            if keyword == 'CONTINUE':
+                continue
+            elif header_str[offset:offset + clen] == END_CARD:
+                self.end_offset = offset
+                break
+            elif keyword == 'HIERARCH':
+                keyword = header_str[offset + 9:offset + clen]
+                keyword = keyword.split('=', 1)[0].strip()
+
+            keyword = keyword.strip().upper()
+            self._index.setdefault(keyword, []).append(offset)
+
+    @classmethod
+    def fromfile(cls, fileobj):
+        """
+        Read the raw header from the current position of ``fileobj`` (a
+        binary-mode file-like object), stopping at the block containing the
+        ``END`` card.  Raises `EOFError` if there are no more headers in the
+        file.
+        """
+
+        blocks = []
+        while True:
+            block = fileobj.read(BLOCK_SIZE)
+            if not blocks and not block.strip(encode_ascii('\0')):
+                # Either the end of the file, or (non-standard) zero padding
+                # at the end of the file
+                raise EOFError()
+            elif not block:
+                raise IOError('Header missing END card.')
+
+            end_found, block = Header._find_end_card(block, Card.length)
+            blocks.append(decode_ascii(block))
+            if end_found:
+                break
+
+        return cls(''.join(blocks))
+
+    def __contains__(self, keyword):
+        return self._normalize(keyword) in self._index
+
+    def __getitem__(self, keyword):
+        keyword = self._normalize(keyword)
+        if keyword not in self._values:
+            if keyword not in self._index:
+                raise KeyError("Keyword %r not found." % keyword)
+
+            values = [self._parse(offset) for offset in self._index[keyword]]
+            if keyword in Card._commentary_keywords:
+                self._values[keyword] = values
+            else:
+                self._values[keyword] = values[0]
+
+        return self._values[keyword]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, keyword, default=None):
+        try:
+            return self[keyword]
+        except KeyError:
+            return default
+
+    def card_offsets(self, keyword):
+        """
+        Returns the offsets, relative to the start of the header, of all the
+        card images for the given keyword.
+        """
+
+        return list(self._index.get(self._normalize(keyword), []))
+
+    def card_image(self, offset):
+        """
+        Return the full card image (including any ``CONTINUE`` cards) of the
+        card beginning at the given offset.
+        """
+
+        clen = Card.length
+        end = offset + clen
+        while self._raw[end:end + 8] == 'CONTINUE':
+            end += clen
+        return self._raw[offset:end]
+
+    def tostring(self):
+        return self._raw
+
+    @staticmethod
+    def _normalize(keyword):
+        return Card.normalize_keyword(keyword).upper()
+
+    def _parse(self, offset):
+        return Card.fromstring(self.card_image(offset)).value
+
+
 class _CardAccessor(object):
     """
     This is a generic class for wrapping a Header in such a way that you can
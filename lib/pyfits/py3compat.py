@@ -54,8 +54,10 @@ if PY3:  # pragma: py3
 
     # See the docstring for pyfits.util.fileobj_open for why we need to replace
     # this function
-    def fileobj_open(filename, mode):
-        return open(filename, mode, buffering=0)
+    def fileobj_open(filename, mode, buffering=None):
+        if buffering is None:
+            buffering = 0
+        return open(filename, mode, buffering=buffering)
     pyfits.util.fileobj_open = fileobj_open
 
     # Support the io.IOBase.readable/writable methods
@@ -0,0 +1,406 @@
+"""
+Downsampling image data by binning it, and writing multi-resolution
+"pyramids" of downsampled images to a single FITS file; see
+``hdu.downsample()`` and ``hdu.write_pyramid()``.
+"""
+
+from __future__ import division, with_statement
+
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+from .extern.six.moves import range, zip, reduce
+from .file import _File
+from .util import (_is_int, _is_pseudo_unsigned, _unsigned_zero, _pad_length,
+                   fileobj_closed)
+
+
+# The approximate size in bytes of each strip of the source image read at
+# once
+STRIP_SIZE = 16 * 1024 * 1024
+
+# The ways pixels can be combined when binning
+METHODS = ('mean', 'max', 'sum')
+
+# Keywords of the source header that do not apply to the binned data
+_REMOVED_KEYWORDS = ('BSCALE', 'BZERO', 'BLANK', 'CHECKSUM', 'DATASUM')
+
+_CRPIX_RE = re.compile(r'^CRPIX(\d+)[A-Z]?$')
+_CDELT_RE = re.compile(r'^CDELT(\d+)[A-Z]?$')
+_CD_RE = re.compile(r'^CD\d+_(\d+)[A-Z]?$')
+
+
+def _downsample(hdu, factor, method='mean'):
+    """
+    Returns a new `ImageHDU` with the data of ``hdu`` binned by ``factor``,
+    reading the data one strip at a time.
+    """
+
+    from .hdu.image import ImageHDU
+
+    factors = _check_binning(hdu, [factor], method)[0]
+    dtype = _source_dtype(hdu)
+    data = np.empty(_binned_shape(hdu.shape, factors),
+                    dtype=_binned_dtype(dtype, method))
+
+    for _, start, rows in _iter_binned_strips(hdu, [factors], method):
+        data[start:start + len(rows)] = rows
+
+    return ImageHDU(data, header=_binned_header(hdu.header, factors))
+
+
+def _write_pyramid(hdu, fileobj, factors, method='mean',
+                   compression_type=None, clobber=False):
+    """
+    Writes the data of ``hdu`` binned by each of ``factors`` to ``fileobj``,
+    one image extension for each, in a single pass over the data of ``hdu``.
+    """
+
+    from .hdu.compressed import CompImageHDU
+    from .hdu.hdulist import HDUList
+    from .hdu.image import PrimaryHDU
+
+    levels = _check_binning(hdu, factors, method)
+
+    if compression_type is None:
+        closed = fileobj_closed(fileobj)
+        f = _File(fileobj, mode='ostream', clobber=clobber)
+        try:
+            if f._is_rewritable():
+                _write_levels(hdu, f, levels, method)
+                return
+
+            # Compressed files and streams can only be written in order, so
+            # the pyramid is written to a temporary file and copied to them
+            tempdir = tempfile.mkdtemp()
+            try:
+                temp = _File(_write_temporary_levels(hdu, tempdir, levels,
+                                                     method))
+                try:
+                    temp.copy_to(f, 0, temp.size)
+                finally:
+                    temp.close()
+            finally:
+                shutil.rmtree(tempdir)
+        finally:
+            if closed:
+                f.close()
+            else:
+                f.flush()
+        return
+
+    # The sizes of the compressed images are not known until they are
+    # compressed, so the levels are first written uncompressed to a
+    # temporary file, and then compressed one at a time from it
+    tempdir = tempfile.mkdtemp()
+    try:
+        name = _write_temporary_levels(hdu, tempdir, levels, method)
+        with HDUList.fromfile(name, memmap=True) as pyramid:
+            hdus = [PrimaryHDU(header=pyramid[0].header)]
+            for level in pyramid[1:]:
+                hdus.append(CompImageHDU(level.data, level.header,
+                                         compression_type=compression_type))
+            HDUList(hdus).writeto(fileobj, clobber=clobber)
+    finally:
+        shutil.rmtree(tempdir)
+
+
+def _write_temporary_levels(hdu, tempdir, levels, method):
+    name = os.path.join(tempdir, 'pyramid.fits')
+    f = _File(name, mode='ostream')
+    try:
+        _write_levels(hdu, f, levels, method)
+    finally:
+        f.close()
+    return name
+
+
+def _write_levels(hdu, f, levels, method):
+    """
+    Writes the pyramid to the new, rewritable `_File` ``f``.  The headers are
+    written first, leaving space for the data of each level, which is then
+    written to its place in the file as it is computed.
+    """
+
+    from .hdu.image import PrimaryHDU, ImageHDU
+    from .chunked import _broadcast_to
+
+    dtype = _binned_dtype(_source_dtype(hdu), method)
+
+    primary = PrimaryHDU()
+    primary.header['EXTEND'] = True
+    f.write(primary.header.tostring())
+    offset = len(primary.header.tostring())
+
+    offsets = []
+    for level, binning in enumerate(levels):
+        shape = _binned_shape(hdu.shape, binning)
+        header = _binned_header(hdu.header, binning)
+        header['EXTNAME'] = 'PYRAMID'
+        header['EXTVER'] = level + 1
+        for axis, axis_factor in enumerate(reversed(binning)):
+            header['DOWNSAM%d' % (axis + 1)] = (
+                axis_factor, 'downsampling factor of axis %d' % (axis + 1))
+        # The header is created from an array of the shape of the level that
+        # uses no memory
+        level_hdu = ImageHDU(_broadcast_to(np.zeros(1, dtype=dtype), shape),
+                             header=header)
+        header = level_hdu.header.tostring()
+        f.pwrite(header, offset)
+        offsets.append(offset + len(header))
+        size = int(np.prod(shape)) * dtype.itemsize
+        offset += len(header) + size + _pad_length(size)
+
+    # The padding of the last level ends the file; any other gaps are filled
+    # with zeros when it is written
+    padding = _pad_length(size)
+    if padding:
+        f.pwrite(np.zeros(padding, dtype=np.uint8), offset - padding)
+
+    row_sizes = [int(np.prod(_binned_shape(hdu.shape, binning)[1:])) *
+                 dtype.itemsize for binning in levels]
+    for level, start, rows in _iter_binned_strips(hdu, levels, method):
+        if _is_pseudo_unsigned(rows.dtype):
+            rows = np.array(rows - _unsigned_zero(rows.dtype),
+                            dtype='>i%d' % rows.dtype.itemsize)
+        else:
+            rows = rows.astype(rows.dtype.newbyteorder('>'))
+        f.pwrite(rows, offsets[level] + start * row_sizes[level])
+
+
+def _check_binning(hdu, factors, method):
+    """
+    Checks the arguments of `_downsample` or `_write_pyramid`, and returns
+    the binning factors of each level along each axis.
+    """
+
+    if not hdu.shape:
+        raise ValueError('The HDU has no data.')
+    if method not in METHODS:
+        raise ValueError('method must be one of %s; got %r' %
+                         (', '.join(repr(m) for m in METHODS), method))
+
+    levels = []
+    for factor in factors:
+        if _is_int(factor):
+            binning = (factor,) * len(hdu.shape)
+        else:
+            binning = tuple(factor)
+            if len(binning) != len(hdu.shape):
+                raise ValueError('factor must have one value for each of the '
+                                 '%d axes of the image; got %r' %
+                                 (len(hdu.shape), factor))
+        if not all(_is_int(f) and f >= 1 for f in binning):
+            raise ValueError('Binning factors must be positive integers; '
+                             'got %r' % (factor,))
+        levels.append(tuple(int(f) for f in binning))
+
+    if not levels:
+        raise ValueError('At least one binning factor is required.')
+    return levels
+
+
+def _source_dtype(hdu):
+    from .chunked import _HDUChunkedArray
+
+    return _HDUChunkedArray(hdu).dtype
+
+
+def _binned_shape(shape, binning):
+    return tuple(-(-length // factor)
+                 for length, factor in zip(shape, binning))
+
+
+def _binned_dtype(dtype, method):
+    """The data type of data of type ``dtype`` binned by ``method``."""
+
+    if method == 'max':
+        return np.dtype(dtype.name)
+    elif method == 'mean':
+        return np.result_type(dtype.name, np.float32)
+    elif dtype.kind == 'f':
+        return np.dtype(np.float64)
+    elif dtype.kind == 'u':
+        return np.dtype(np.uint64)
+    else:
+        return np.dtype(np.int64)
+
+
+def _binned_header(header, binning):
+    """
+    Returns a copy of ``header`` for the image binned by ``binning``, with
+    the world coordinate keywords updated to match it.
+    """
+
+    header = header.copy()
+    for keyword in _REMOVED_KEYWORDS:
+        if keyword in header:
+            del header[keyword]
+
+    naxis = len(binning)
+    for idx, keyword in enumerate(header.keys()):
+        for regex in (_CRPIX_RE, _CDELT_RE, _CD_RE):
+            match = regex.match(keyword)
+            if not match:
+                continue
+            axis = int(match.group(1))
+            if not 1 <= axis <= naxis:
+                continue
+            # FITS axes are numbered in the reverse order of the array axes
+            factor = binning[naxis - axis]
+            value = header[idx]
+            if regex is _CRPIX_RE:
+                # The center of the first binned pixel is at the center of
+                # the first factor pixels
+                header[idx] = (value - 0.5) / factor + 0.5
+            else:
+                header[idx] = value * factor
+
+    return header
+
+
+def _iter_binned_strips(hdu, levels, method):
+    """
+    Reads the data of ``hdu`` one strip of rows at a time, and yields
+    ``(level, start, rows)`` tuples giving the rows of the data binned by
+    each of ``levels`` computed from each strip, and the index of the first
+    of them.
+    """
+
+    shape = hdu.shape
+    dtype = _source_dtype(hdu)
+
+    # Strips hold a whole number of bins of every level
+    height = reduce(_lcm, [binning[0] for binning in levels])
+    row_size = int(np.prod(shape[1:])) * dtype.itemsize
+    height *= max(1, STRIP_SIZE // max(1, row_size * height))
+
+    # Each level is binned from the previous level it is a multiple of, if
+    # there is one, rather than from the strip itself
+    sources = []
+    for idx, binning in enumerate(levels):
+        source = None
+        for prev in range(idx):
+            if all(f % p == 0 for f, p in zip(binning, levels[prev])):
+                source = prev
+        sources.append(source)
+
+    for start in range(0, shape[0], height):
+        stop = min(start + height, shape[0])
+        if hdu._data_loaded or (hdu._file is None and hdu._buffer is None):
+            strip = hdu.data[start:stop]
+        else:
+            strip = hdu.section[start:stop]
+
+        states = []
+        for idx, binning in enumerate(levels):
+            if sources[idx] is None:
+                state = _bin_strip(strip, binning, method)
+            else:
+                relative = tuple(f // p for f, p in
+                                 zip(binning, levels[sources[idx]]))
+                state = _bin_state(states[sources[idx]], relative, method)
+            states.append(state)
+            yield idx, start // binning[0], _finish(state, method, dtype)
+
+
+def _bin_strip(strip, binning, method):
+    """
+    Bins a strip of the source data, and returns the state from which the
+    binned data is computed: the maximum of each bin for the ``'max'``
+    method, or the sum and number of the non-NaN values in each bin.
+    """
+
+    if method == 'max':
+        return _reduceat(np.fmax, strip, binning)
+
+    nans = None
+    if strip.dtype.kind == 'f':
+        nans = np.isnan(strip)
+        if nans.any():
+            strip = np.where(nans, 0, strip)
+        else:
+            nans = None
+        total = _reduceat(np.add, strip, binning, dtype=np.float64)
+    elif strip.dtype.kind == 'u':
+        total = _reduceat(np.add, strip, binning, dtype=np.uint64)
+    else:
+        total = _reduceat(np.add, strip, binning, dtype=np.int64)
+
+    if nans is not None:
+        counts = _reduceat(np.add, ~nans, binning, dtype=np.intp)
+    else:
+        # Every bin is full but those at the edges of the image
+        lengths = [np.diff(np.append(np.arange(0, length, factor), length))
+                   for length, factor in zip(strip.shape, binning)]
+        counts = reduce(np.multiply.outer, lengths)
+
+    return total, counts
+
+
+def _bin_state(state, binning, method):
+    """Bins the state of a previous level further by ``binning``."""
+
+    if method == 'max':
+        return _reduceat(np.fmax, state, binning)
+    return (_reduceat(np.add, state[0], binning),
+            _reduceat(np.add, state[1], binning))
+
+
+def _finish(state, method, dtype):
+    """Returns the binned data of ``dtype`` computed from a binned state."""
+
+    out_dtype = _binned_dtype(dtype, method)
+    if method == 'max':
+        return state.astype(out_dtype)
+
+    total, counts = state
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if method == 'mean':
+            data = np.true_divide(total, counts).astype(out_dtype)
+        else:
+            data = total.astype(out_dtype)
+    if out_dtype.kind == 'f':
+        # Bins with only NaN values are NaN
+        data[counts == 0] = np.nan
+    return data
+
+
+def _reduceat(ufunc, data, binning, dtype=None):
+    """Reduces each bin of ``data`` with ``ufunc``, one axis at a time."""
+
+    for axis, factor in enumerate(binning):
+        if factor == 1 and dtype is None:
+            continue
+
+        # The full bins are reduced as an extra axis of the data, which is
+        # much faster than ufunc.reduceat; a partial bin at the end of the
+        # axis is reduced separately
+        length = data.shape[axis]
+        full = length - length % factor
+        before = (slice(None),) * axis
+        head = data[before + (slice(0, full),)]
+        reduced = ufunc.reduce(
+            head.reshape(data.shape[:axis] + (full // factor, factor) +
+                         data.shape[axis + 1:]),
+            axis=axis + 1, dtype=dtype)
+        if full < length:
+            tail = ufunc.reduce(data[before + (slice(full, None),)],
+                                axis=axis, dtype=dtype, keepdims=True)
+            reduced = np.concatenate([reduced, tail], axis=axis)
+
+        data = reduced
+        dtype = None
+
+    return data
+
+
+def _lcm(a, b):
+    x, y = a, b
+    while y:
+        x, y = y, x % y
+    return a * b // x
@@ -40,16 +40,42 @@ Example uses of fitscheck:
 7. Delete checksum keywords::
 
     $ fitscheck --checksum none --write *.fits
+
+8. Verify the checksums of many files using 8 processes, reporting the
+   throughput for each file and overall::
+
+    $ fitscheck -j 8 --verbose *.fits
+
+9. Write new checksums by patching only the ``CHECKSUM`` and ``DATASUM``
+   cards in place, rather than rewriting each file::
+
+    $ fitscheck --update *.fits
+
+By default standard checksums are verified by reading the header and data
+blocks of each file directly, without going through `pyfits.open`; use
+``--no-raw`` to verify them through `pyfits.open` instead.
 """
 
 
+import datetime
 import logging
 import optparse
+import os
 import sys
 import textwrap
+import time
 import warnings
 
+import numpy as np
+
 import pyfits
+from pyfits.card import Card
+from pyfits.convenience import (_raw_header_cards, _raw_insert_card,
+                                _write_raw_header)
+from pyfits.file import _File
+from pyfits.hdu.base import (_iter_raw_hdus, _compute_checksum,
+                             _ones_complement_sum, _CHECKSUM_CHUNK_SIZE)
+from pyfits.util import encode_ascii, _pad_length, _map_parallel
 
 
 log = logging.getLogger('fitscheck')
@@ -101,7 +127,25 @@ def handle_options(args):
         default=False, action='store_true')
 
     parser.add_option(
-        '-v', '--verbose', dest='verbose', help='Generate extra output.',
+        '-u', '--update', dest='update_inplace',
+        help='Write out file checksums by updating only the CHECKSUM and '
+             'DATASUM cards in place, if possible.  Implies --write.',
+        default=False, action='store_true')
+
+    parser.add_option(
+        '-j', '--jobs', dest='jobs', type='int',
+        help='Number of files to process in parallel.  Defaults to 1.',
+        default=1, metavar='N')
+
+    parser.add_option(
+        '--no-raw', dest='raw',
+        help='Verify checksums through pyfits.open() instead of reading the '
+             'file blocks directly.',
+        default=True, action='store_false')
+
+    parser.add_option(
+        '-v', '--verbose', dest='verbose',
+        help='Generate extra output, including the throughput for each file.',
         default=False, action='store_true')
 
     global OPTIONS
@@ -110,6 +154,9 @@ def handle_options(args):
     if OPTIONS.checksum_kind == 'none':
         OPTIONS.checksum_kind = False
 
+    if OPTIONS.update_inplace:
+        OPTIONS.write_file = True
+
     return fits_files
 
 
@@ -131,8 +178,10 @@ def verify_checksums(filename):
 
     errors = 0
     try:
-        hdulist = pyfits.open(filename, checksum=OPTIONS.checksum_kind)
-    except UserWarning, w:
+        hdulist = pyfits.open(filename, checksum=OPTIONS.checksum_kind,
+                              access='sequential')
+    except UserWarning:
+        w = sys.exc_info()[1]
         remainder = '.. ' + ' '.join(str(w).split(' ')[1:]).strip()
         # if "Checksum" in str(w) or "Datasum" in str(w):
         log.warn('BAD %r %s' % (filename, remainder))
@@ -152,6 +201,95 @@ def verify_checksums(filename):
     return errors
 
 
+def verify_checksums_raw(filename):
+    """
+    Like `verify_checksums`, but verifies standard checksums by reading the
+    header and data blocks of each HDU directly from the file, without
+    creating any HDU objects.
+
+    Returns the number of errors and a list of the datasums computed for each
+    HDU.
+    """
+
+    error = None
+    datasums = []
+    fileobj = _File(filename, mode='readonly', access='sequential')
+    try:
+        for idx, hdu in enumerate(_iter_raw_hdus(fileobj)):
+            header_offset, header, data_offset, data_size = hdu
+            # The remaining datasums are still computed after an error, in
+            # case the file is updated anyways with --force
+            datasum = _raw_datasum(fileobj, data_offset, data_size)
+            datasums.append(datasum)
+            if error is None:
+                error = _verify_raw_hdu(idx, header, datasum)
+    finally:
+        fileobj.close()
+
+    if error is None:
+        log.info('OK %r' % filename)
+        return 0, datasums
+
+    kind, message = error
+    if kind == 'BAD' and OPTIONS.checksum_kind == 'either':
+        # Fall back on also trying nonstandard checksums
+        return verify_checksums(filename), datasums
+
+    log.warn('%s %r .. %s' % (kind, filename, message))
+    return 1, datasums
+
+
+def _verify_raw_hdu(idx, header, datasum):
+    """
+    Verify the checksums in the header of a raw HDU given the datasum of its
+    data; returns `None` if they are valid, or the kind of error and a message
+    otherwise.
+    """
+
+    if 'CHECKSUM' in header:
+        # The sum of an HDU including its CHECKSUM card is negative zero
+        header_str = np.fromstring(encode_ascii(header.tostring()),
+                                   dtype='ubyte')
+        if _compute_checksum(header_str, datasum) != 0xFFFFFFFF:
+            return 'BAD', 'Checksum verification failed for HDU #%d' % idx
+    elif not OPTIONS.ignore_missing:
+        return 'MISSING', 'Checksum not found in HDU #%d' % idx
+
+    if 'DATASUM' in header:
+        try:
+            valid = int(header['DATASUM']) == datasum
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            return 'BAD', 'Datasum verification failed for HDU #%d' % idx
+    elif not OPTIONS.ignore_missing:
+        return 'MISSING', 'Datasum not found in HDU #%d' % idx
+
+    return None
+
+
+def _raw_datasum(fileobj, offset, size):
+    """
+    Compute the standard datasum of ``size`` bytes (plus padding) of a file,
+    reading at most ``_CHECKSUM_CHUNK_SIZE`` bytes at a time.
+    """
+
+    fileobj.seek(offset)
+    size += _pad_length(size)
+    datasum = 0
+    while size > 0:
+        chunk = fileobj.read(min(size, _CHECKSUM_CHUNK_SIZE))
+        if not chunk:
+            raise IOError('File is truncated; expected %d more bytes of data '
+                          'at offset %d' % (size, fileobj.tell()))
+        # Chunks are a multiple of 4 bytes long (except possibly the last),
+        # so their sums can simply be added together
+        datasum = _ones_complement_sum(np.fromstring(chunk, dtype='ubyte'),
+                                       datasum)
+        size -= len(chunk)
+    return int(datasum)
+
+
 def verify_compliance(filename):
     """Check for FITS standard compliance."""
 
@@ -161,7 +299,7 @@ def verify_compliance(filename):
     except pyfits.VerifyError:
         exc = sys.exc_info()[1]
         log.warn('NONCOMPLIANT %r .. %s' %
-                 (filename), str(exc).replace('\n', ' '))
+                 (filename, str(exc).replace('\n', ' ')))
         return 1
     return 0
 
@@ -184,6 +322,65 @@ def update(filename):
         hdulist.close()
 
 
+def update_inplace(filename, datasums):
+    """
+    Sets the ``CHECKSUM`` and ``DATASUM`` keywords for each HDU of `filename`
+    by rewriting only those cards in the file, given the datasum of each HDU.
+
+    Returns `False` without modifying the file if this is not possible (for
+    example if there is no room left in a header for new cards).
+    """
+
+    fileobj = _File(filename, mode='update')
+    try:
+        if fileobj.compression:
+            return False
+
+        hdus = list(_iter_raw_hdus(fileobj))
+        if len(hdus) != len(datasums):
+            return False
+
+        timestamp = datetime.datetime.now().isoformat()[:19]
+        updates = []
+        for hdu, datasum in zip(hdus, datasums):
+            header = hdu[1]
+            cards = _raw_header_cards(header)
+            if cards is None:
+                return False
+
+            keywords = [image[:8].rstrip() for image in cards]
+            if 'CONTINUE' in keywords:
+                # The cards can't be matched up with the keywords reliably
+                return False
+
+            datasum_card = Card('DATASUM', str(datasum),
+                                'data unit checksum updated %s' % timestamp)
+            checksum_card = Card('CHECKSUM', '0' * 16,
+                                 'HDU checksum updated %s' % timestamp)
+            if 'DATASUM' in keywords:
+                cards[keywords.index('DATASUM')] = datasum_card.image
+            else:
+                _raw_insert_card(cards, datasum_card.image)
+
+            keywords = [image[:8].rstrip() for image in cards]
+            if 'CHECKSUM' in keywords:
+                cards[keywords.index('CHECKSUM')] = checksum_card.image
+            else:
+                cards.insert(keywords.index('DATASUM'), checksum_card.image)
+
+            if len(cards) + 1 > header.size // Card.length:
+                return False
+            updates.append((hdu, cards, datasum))
+
+        # Only start modifying the file once it's known that all the headers
+        # can be updated
+        for hdu, cards, datasum in updates:
+            _write_raw_header(fileobj, hdu, cards, datasum)
+        return True
+    finally:
+        fileobj.close()
+
+
 def process_file(filename):
     """
     Handle a single .fits file,  returning the count of checksum and compliance
@@ -191,13 +388,24 @@ def process_file(filename):
     """
 
     try:
-        checksum_errors = verify_checksums(filename)
+        datasums = None
+        if OPTIONS.raw and OPTIONS.checksum_kind in ('standard', 'either'):
+            checksum_errors, datasums = verify_checksums_raw(filename)
+        else:
+            checksum_errors = verify_checksums(filename)
         if OPTIONS.compliance:
             compliance_errors = verify_compliance(filename)
         else:
             compliance_errors = 0
         if OPTIONS.write_file and checksum_errors == 0 or OPTIONS.force:
-            update(filename)
+            # Compliance fixes and nonstandard checksums require rewriting
+            # the whole file
+            if (OPTIONS.update_inplace and datasums is not None and
+                    not OPTIONS.compliance and
+                    update_inplace(filename, datasums)):
+                log.info('UPDATED %r' % filename)
+            else:
+                update(filename)
         return checksum_errors + compliance_errors
     except Exception:
         exc = sys.exc_info()[1]
@@ -205,6 +413,39 @@ def process_file(filename):
         return 1
 
 
+def _process_file_job(args):
+    """
+    Calls `process_file` in a (possibly separate) worker process, returning
+    the filename, the number of errors, the size of the file in bytes, and the
+    time it took to process.
+    """
+
+    global OPTIONS
+    OPTIONS, filename = args
+    if not log.handlers:
+        setup_logging()
+
+    start = time.time()
+    errors = process_file(filename)
+    elapsed = time.time() - start
+
+    try:
+        size = os.path.getsize(filename)
+    except OSError:
+        size = 0
+
+    return filename, errors, size, elapsed
+
+
+def _format_throughput(size, elapsed):
+    megabytes = size / 1e6
+    if elapsed > 0:
+        rate = '%.1f MB/s' % (megabytes / elapsed)
+    else:
+        rate = '-- MB/s'
+    return '%.1f MB in %.2f s (%s)' % (megabytes, elapsed, rate)
+
+
 def main():
     """
     Processes command line parameters into options and files,  then checks
@@ -212,10 +453,21 @@ def main():
     """
 
     errors = 0
+    total_size = 0
     fits_files = handle_options(sys.argv[1:])
     setup_logging()
-    for filename in fits_files:
-        errors += process_file(filename)
+
+    start = time.time()
+    jobs = [(OPTIONS, filename) for filename in fits_files]
+    for filename, file_errors, size, elapsed in _map_parallel(
+            _process_file_job, jobs, workers=OPTIONS.jobs, pool='process'):
+        log.info('%r: %s' % (filename, _format_throughput(size, elapsed)))
+        errors += file_errors
+        total_size += size
+    elapsed = time.time() - start
+
+    log.info('%d files: %s' % (len(fits_files),
+                               _format_throughput(total_size, elapsed)))
     if errors:
         log.warn('%d errors' % errors)
     return int(bool(errors))
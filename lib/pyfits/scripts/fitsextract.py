@@ -0,0 +1,149 @@
+"""
+``fitsextract`` is a command line script based on pyfits for extracting HDUs
+from one or more .fits files and writing them to a new file.
+
+The headers and data of the selected HDUs are copied as raw FITS blocks
+(using `pyfits.concatenate`), so this is fast even for very large files.  The
+headers are only modified where necessary--for example to convert the first
+HDU written to a primary HDU, or to renumber ``EXTVER`` with
+``--renumber-extver``.
+
+HDUs are selected with ``-e``/``--ext``, which may be given any number of
+times and takes either an HDU index or an ``EXTNAME`` optionally followed by
+a comma and an ``EXTVER``.  As when indexing an `HDUList`, an ``EXTNAME``
+without an ``EXTVER`` selects only the first HDU with that name in each file.
+If no HDUs are selected all HDUs are taken from each file (apart from the
+empty primary HDUs of all but the first file).
+
+Example uses of fitsextract:
+
+1. Extract the second ``SCI`` extension from a file::
+
+    $ fitsextract -e SCI,2 -o sci2.fits image.fits
+
+2. Extract the primary HDU and the first two extensions from a file::
+
+    $ fitsextract -e 0 -e 1 -e 2 -o first.fits image.fits
+
+3. Combine the first ``SCI`` extension of each of many files into a single
+   file, renumbering them, with 8 files copied concurrently::
+
+    $ fitsextract -e SCI --renumber-extver -j 8 -o all.fits *.fits
+"""
+
+
+import logging
+import optparse
+import sys
+import textwrap
+
+import pyfits
+
+
+log = logging.getLogger('fitsextract')
+
+
+def handle_options(args):
+    if not len(args):
+        args = ['-h']
+
+    parser = optparse.OptionParser(usage=textwrap.dedent("""
+        fitsextract [options] -o <output .fits file> <.fits files...>
+
+        .e.g. fitsextract -e SCI,1 -o sci.fits example.fits
+
+        Writes the selected HDUs from each of the given .fits files to a new
+        .fits file.
+        """.strip()))
+
+    parser.add_option(
+        '-o', '--output', dest='output',
+        help='The file to write the HDUs to (required).',
+        metavar='FILE')
+
+    parser.add_option(
+        '-e', '--ext', dest='exts', action='append',
+        help='An HDU to take from each file, given as an HDU index or as '
+             'EXTNAME[,EXTVER]; an EXTNAME alone selects the first HDU with '
+             'that name.  May be given any number of times.  Defaults to all '
+             'HDUs.',
+        default=None, metavar='EXT')
+
+    parser.add_option(
+        '--renumber-extver', dest='renumber_extver',
+        help='Renumber the EXTVER of the HDUs with each EXTNAME from 1.',
+        default=False, action='store_true')
+
+    parser.add_option(
+        '--clobber', dest='clobber',
+        help='Overwrite the output file if it exists.',
+        default=False, action='store_true')
+
+    parser.add_option(
+        '-j', '--jobs', dest='jobs', type='int',
+        help='Number of input files to copy in parallel.  Defaults to 1.',
+        default=1, metavar='N')
+
+    options, fits_files = parser.parse_args(args)
+
+    if not options.output:
+        parser.error('an output file must be given with -o')
+    if not fits_files:
+        parser.error('at least one input file must be given')
+
+    if options.exts is not None:
+        try:
+            options.exts = [parse_ext(ext) for ext in options.exts]
+        except ValueError:
+            parser.error(str(sys.exc_info()[1]))
+
+    return options, fits_files
+
+
+def parse_ext(ext):
+    """
+    Converts an HDU given on the command line as either an HDU index or as
+    ``EXTNAME[,EXTVER]`` to the form accepted by `pyfits.concatenate`.
+    """
+
+    if ext.isdigit():
+        return int(ext)
+
+    if ',' not in ext:
+        return ext
+
+    extname, extver = ext.rsplit(',', 1)
+    try:
+        return (extname, int(extver))
+    except ValueError:
+        raise ValueError('invalid EXTVER in %r' % ext)
+
+
+def setup_logging():
+    log.setLevel(logging.WARNING)
+    if log.handlers:
+        return
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    log.addHandler(handler)
+
+
+def main():
+    """
+    Processes command line parameters into options and files, then writes the
+    selected HDUs from the files to the output file.
+    """
+
+    options, fits_files = handle_options(sys.argv[1:])
+    setup_logging()
+
+    try:
+        pyfits.concatenate(fits_files, options.output, exts=options.exts,
+                           renumber_extver=options.renumber_extver,
+                           clobber=options.clobber, workers=options.jobs)
+    except (IOError, IndexError, KeyError, ValueError):
+        log.error('fitsextract: %s' % sys.exc_info()[1])
+        return 1
+
+    return 0
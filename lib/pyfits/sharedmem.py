@@ -0,0 +1,259 @@
+"""
+Placing the data of HDUs in named shared memory segments, so that it can be
+used by other processes on the same machine without copying it; see
+``hdu.to_shared_memory()``.
+"""
+
+from __future__ import with_statement
+
+import atexit
+import mmap
+import os
+import stat
+import tempfile
+import threading
+import uuid
+
+import numpy as np
+
+from .file import _File
+from .header import Header
+from .util import _pad_length
+
+
+# Segments are created as files in this directory; on Linux this is where
+# POSIX shm_open() creates named shared memory segments, so the segments are
+# kept in memory and never written to disk
+if os.path.isdir('/dev/shm'):
+    SHARED_MEMORY_DIR = '/dev/shm'
+else:
+    SHARED_MEMORY_DIR = tempfile.gettempdir()
+
+
+# The names of the segments created by this process that have not been
+# unlinked yet, mapped to the ID of the creating process (so that forked
+# processes do not unlink their parent's segments on exit)
+_segments = {}
+_segments_lock = threading.Lock()
+
+
+class SharedMemoryDescriptor(object):
+    """
+    Describes HDU data placed in a named shared memory segment by
+    ``hdu.to_shared_memory()``.
+
+    A descriptor is small, and can be pickled and sent to another process on
+    the same machine, where `attach` returns the data backed directly by the
+    shared memory segment.  Image data is stored as the final array of the
+    HDU (after any scaling or decompression), so `attach` returns an
+    `~numpy.ndarray`.  Table data is stored as the raw table and heap, as it
+    would be in a FITS file, so `attach` returns a `FITS_rec` whose columns
+    are views of the segment (columns that need scaling are converted when
+    they are accessed, as usual).
+
+    The segment exists until `unlink` is called, or when the descriptor is
+    used as a context manager, until the ``with`` block exits.  Segments not
+    unlinked by the process that created them are unlinked when it exits.
+    As with POSIX shared memory, data already attached from a segment
+    remains valid after it is unlinked; the memory is freed once all
+    attached arrays have been garbage collected.
+    """
+
+    def __init__(self, name, size, header, dtype=None, shape=None,
+                 uint=False):
+        self.name = name
+        self.size = size
+        self.header = header
+        self.dtype = dtype
+        self.shape = shape
+        self.uint = uint
+
+    def __repr__(self):
+        if self.dtype is not None:
+            desc = 'array of shape %r and dtype %r' % (self.shape, self.dtype)
+        else:
+            desc = 'table data'
+        return '<%s %r: %s (%d bytes)>' % (self.__class__.__name__, self.name,
+                                          desc, self.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.unlink()
+
+    @property
+    def path(self):
+        """The path of the file backing the segment."""
+
+        return os.path.join(SHARED_MEMORY_DIR, self.name)
+
+    def attach(self):
+        """
+        Returns the data stored in the segment, without copying it.  Changes
+        made to the returned data are seen by every process attached to the
+        segment.
+        """
+
+        buffer = _map_segment(self.path, self.size)
+
+        if self.dtype is not None:
+            return np.ndarray(self.shape, dtype=self.dtype, buffer=buffer)
+
+        from .hdu.base import _BaseHDU, DELAYED
+
+        # The data is read from the segment as from the buffer of an HDU
+        # created with fromstring()
+        hdu = _BaseHDU(data=DELAYED, header=Header.fromstring(self.header))
+        if self.uint:
+            hdu._uint = True
+        hdu._buffer = buffer
+        hdu._header_offset = 0
+        hdu._data_offset = 0
+        hdu._data_size = self.size
+        return hdu.data
+
+    def unlink(self):
+        """
+        Removes the segment's name, so that it can not be attached to any
+        more.  Does nothing if the segment was already unlinked.
+        """
+
+        _remove_segment(self.name)
+
+
+def _share_image_data(hdu):
+    """
+    Places the data of an image HDU in a new segment as the array returned by
+    its ``.data`` attribute, and returns its `SharedMemoryDescriptor`.
+
+    If the data has not been read yet, and does not need to be scaled, it is
+    read from the file directly into the segment.
+    """
+
+    from .hdu.image import _ImageBaseHDU
+
+    if (not hdu._data_loaded and isinstance(hdu, _ImageBaseHDU) and
+            (hdu._file is not None or hdu._buffer is not None) and
+            hdu._orig_bzero == 0 and hdu._orig_bscale == 1 and
+            hdu._blank is None and hdu.shape):
+        dtype = np.dtype(_ImageBaseHDU.NumCode[hdu._orig_bitpix])
+        dtype = dtype.newbyteorder('>')
+        shape = hdu.shape
+        size = int(np.prod(shape)) * dtype.itemsize
+        name, buffer = _create_segment(size)
+        try:
+            hdu._readinto_raw(np.ndarray(size, dtype=np.uint8, buffer=buffer),
+                              hdu._data_offset)
+        except:
+            _remove_segment(name)
+            raise
+    else:
+        data = hdu.data
+        if data is None:
+            raise ValueError('The HDU has no data.')
+
+        dtype = data.dtype
+        shape = data.shape
+        size = data.nbytes
+        name, buffer = _create_segment(size)
+        np.ndarray(shape, dtype=dtype, buffer=buffer)[...] = data
+
+    return SharedMemoryDescriptor(name, size, str(hdu.header),
+                                  dtype=dtype.str, shape=shape)
+
+
+def _share_raw_data(hdu):
+    """
+    Places the data of an HDU in a new segment as it would be written to a
+    FITS file (including any heap and padding), and returns its
+    `SharedMemoryDescriptor`.
+
+    If the data has not been read yet it is copied from the file directly
+    into the segment.
+    """
+
+    if hdu._data_loaded or hdu._data_needs_rescale:
+        if hdu.data is None:
+            raise ValueError('The HDU has no data.')
+
+        # Update the header (and the raw data of tables) to match the data,
+        # just as when writing the HDU to a file
+        hdu._prewriteto(checksum=False)
+        try:
+            size = hdu.size
+            size += _pad_length(size)
+            name, buffer = _create_segment(size)
+            try:
+                hdu._writedata(_File(buffer, mode='update'))
+            except:
+                _remove_segment(name)
+                raise
+            header = str(hdu._header)
+        finally:
+            hdu._postwriteto()
+    else:
+        size = hdu._data_size
+        name, buffer = _create_segment(size)
+        try:
+            hdu._readinto_raw(np.ndarray(size, dtype=np.uint8, buffer=buffer),
+                              hdu._data_offset)
+        except:
+            _remove_segment(name)
+            raise
+        header = str(hdu._header)
+
+    return SharedMemoryDescriptor(name, size, header,
+                                  uint=getattr(hdu, '_uint', False))
+
+
+def _create_segment(size):
+    """
+    Creates a new shared memory segment of ``size`` bytes, and returns its
+    name and a writeable `mmap.mmap` of it.
+    """
+
+    name = 'pyfits-%s' % uuid.uuid4().hex
+    path = os.path.join(SHARED_MEMORY_DIR, name)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL,
+                 stat.S_IRUSR | stat.S_IWUSR)
+    try:
+        # An empty mmap is not allowed, so empty segments are given one byte
+        os.ftruncate(fd, max(size, 1))
+        buffer = mmap.mmap(fd, max(size, 1))
+    except:
+        os.close(fd)
+        os.remove(path)
+        raise
+
+    os.close(fd)
+    with _segments_lock:
+        _segments[name] = os.getpid()
+    return name, buffer
+
+
+def _map_segment(path, size):
+    fd = os.open(path, os.O_RDWR)
+    try:
+        return mmap.mmap(fd, max(size, 1))
+    finally:
+        os.close(fd)
+
+
+def _remove_segment(name):
+    with _segments_lock:
+        _segments.pop(name, None)
+
+    try:
+        os.remove(os.path.join(SHARED_MEMORY_DIR, name))
+    except OSError:
+        pass
+
+
+def _cleanup_segments():
+    pid = os.getpid()
+    for name, creator in list(_segments.items()):
+        if creator == pid:
+            _remove_segment(name)
+
+atexit.register(_cleanup_segments)
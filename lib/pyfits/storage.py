@@ -0,0 +1,500 @@
+"""
+Storage backends allow FITS files to be read from (and optionally written to)
+storage other than local files and file-like objects, such as an object store
+that only supports reading byte ranges of a file.
+
+A backend is a subclass of `StorageBackend` that implements, at a minimum, the
+`StorageBackend.size` and `StorageBackend.read_range` methods.  An instance of
+the backend may then be passed to `pyfits.open` in place of a filename::
+
+    >>> hdul = pyfits.open(MyObjectStoreBackend('bucket/image.fits'))
+
+All reads from a backend go through a cache of fixed-size blocks of the file,
+so that reading headers and sections of arrays results in a small number of
+large ranged reads rather than many small ones.  The block size and the size
+of the cache can be set separately for each backend.
+"""
+
+from __future__ import division, with_statement
+
+import os
+import threading
+
+import numpy as np
+
+from .extern.six import b
+from .extern.six.moves import urllib
+
+
+__all__ = ['StorageBackend', 'MemoryBackend', 'LocalFileBackend',
+           'HTTPBackend']
+
+
+class StorageBackend(object):
+    """
+    Base class for storage backends.
+
+    Subclasses must implement `size` and `read_range`; backends that support
+    writing should also set ``writable = True`` and implement `write_range`
+    and `truncate`.
+
+    Parameters
+    ----------
+    block_size : int, optional
+        The size in bytes of the blocks read from the backend and kept in the
+        cache.  All reads from the backend are made in multiples of this size.
+
+    cache_blocks : int, optional
+        The maximum number of blocks to keep in the cache; least recently used
+        blocks are discarded first.
+
+    readahead : int, optional
+        The number of additional blocks to read following the last block
+        requested whenever a read misses the cache.  Consecutive blocks that
+        are not in the cache are always read with a single request.
+    """
+
+    block_size = 2880 * 2 ** 8
+    cache_blocks = 64
+    readahead = 1
+
+    # Whether or not the backend supports write_range and truncate
+    writable = False
+
+    # The name of the file, used for display purposes and in error messages
+    name = None
+
+    def __init__(self, block_size=None, cache_blocks=None, readahead=None):
+        if block_size is not None:
+            if block_size <= 0:
+                raise ValueError('block_size must be a positive integer')
+            self.block_size = block_size
+        if cache_blocks is not None:
+            self.cache_blocks = cache_blocks
+        if readahead is not None:
+            self.readahead = readahead
+
+    def __repr__(self):
+        return '<%s.%s %r>' % (self.__module__, self.__class__.__name__,
+                               self.name)
+
+    def size(self):
+        """Returns the current size of the file in bytes."""
+
+        raise NotImplementedError
+
+    def read_range(self, offset, size):
+        """
+        Returns ``size`` bytes of the file starting at ``offset``.  Fewer bytes
+        are returned only if the end of the file is reached.
+        """
+
+        raise NotImplementedError
+
+    def write_range(self, offset, data):
+        """
+        Writes the bytes ``data`` to the file starting at ``offset``, extending
+        the file if necessary.
+        """
+
+        raise IOError('%s does not support writing.' %
+                      self.__class__.__name__)
+
+    def truncate(self, size):
+        """Truncates (or extends) the file to ``size`` bytes."""
+
+        raise IOError('%s does not support writing.' %
+                      self.__class__.__name__)
+
+    def flush(self):
+        """Ensures that all writes made so far are stored."""
+
+    def close(self):
+        """Releases any resources held by the backend."""
+
+
+class MemoryBackend(StorageBackend):
+    """
+    A backend that stores the file in memory.
+
+    Parameters
+    ----------
+    data : bytes, optional
+        The initial contents of the file; by default the file is empty.
+
+    name : str, optional
+        A name for the file.
+
+    Additional keyword arguments are passed to `StorageBackend`.
+    """
+
+    writable = True
+
+    def __init__(self, data=b(''), name=None, **kwargs):
+        super(MemoryBackend, self).__init__(**kwargs)
+        self.data = bytearray(data)
+        self.name = name
+
+    def size(self):
+        return len(self.data)
+
+    def read_range(self, offset, size):
+        return bytes(self.data[offset:offset + size])
+
+    def write_range(self, offset, data):
+        if offset > len(self.data):
+            self.truncate(offset)
+        self.data[offset:offset + len(data)] = data
+
+    def truncate(self, size):
+        if size < len(self.data):
+            del self.data[size:]
+        else:
+            self.data.extend(b('\0') * (size - len(self.data)))
+
+
+class LocalFileBackend(StorageBackend):
+    """
+    A backend for files on the local filesystem.  This is mainly useful for
+    testing the behavior of other backends against local files.
+
+    Parameters
+    ----------
+    filename : str
+        The path to the file.
+
+    writable : bool, optional
+        If `True` the file is opened for both reading and writing, and created
+        if it does not exist; otherwise it is opened read-only.
+
+    Additional keyword arguments are passed to `StorageBackend`.
+    """
+
+    def __init__(self, filename, writable=False, **kwargs):
+        super(LocalFileBackend, self).__init__(**kwargs)
+        self.name = filename
+        self.writable = writable
+        if writable:
+            mode = os.path.exists(filename) and 'rb+' or 'wb+'
+        else:
+            mode = 'rb'
+        self._file = open(filename, mode)
+        self._lock = threading.Lock()
+
+    def size(self):
+        self._file.flush()
+        return os.fstat(self._file.fileno()).st_size
+
+    def read_range(self, offset, size):
+        if hasattr(os, 'pread') and not self.writable:
+            return os.pread(self._file.fileno(), size, offset)
+
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(size)
+
+    def write_range(self, offset, data):
+        if not self.writable:
+            return super(LocalFileBackend, self).write_range(offset, data)
+
+        with self._lock:
+            self._file.seek(offset)
+            self._file.write(data)
+
+    def truncate(self, size):
+        if not self.writable:
+            return super(LocalFileBackend, self).truncate(size)
+
+        with self._lock:
+            self._file.truncate(size)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class HTTPBackend(StorageBackend):
+    """
+    A read-only backend for files served over HTTP (or HTTPS), which reads
+    only the parts of the file that are needed using HTTP range requests.
+
+    When the server does not support range requests ``accepts_ranges`` is
+    `False` and the backend can not be used; `pyfits.open` falls back on
+    downloading the entire file in this case.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the file.
+
+    timeout : float, optional
+        Timeout in seconds for each request made to the server.
+
+    Additional keyword arguments are passed to `StorageBackend`.
+    """
+
+    def __init__(self, url, timeout=None, **kwargs):
+        super(HTTPBackend, self).__init__(**kwargs)
+        self.name = url
+        self.timeout = timeout
+        self.accepts_ranges = False
+        self._size = None
+
+        # Request the first byte of the file, both to determine whether the
+        # server supports range requests and to find the size of the file
+        response = self._request(0, 1)
+        try:
+            content_range = response.info().get('Content-Range')
+            if response.getcode() == 206 and content_range:
+                total = content_range.rsplit('/', 1)[-1].strip()
+                if total.isdigit():
+                    self._size = int(total)
+                    self.accepts_ranges = True
+        finally:
+            response.close()
+
+    def size(self):
+        if not self.accepts_ranges:
+            raise IOError('%s does not support range requests.' % self.name)
+        return self._size
+
+    def read_range(self, offset, size):
+        size = min(size, self.size() - offset)
+        if size <= 0:
+            return b('')
+
+        response = self._request(offset, size)
+        try:
+            data = response.read()
+            if response.getcode() != 206:
+                # The server sent the whole file after all
+                data = data[offset:offset + size]
+        finally:
+            response.close()
+
+        return data
+
+    def _request(self, offset, size):
+        request = urllib.request.Request(self.name)
+        request.add_header('Range',
+                           'bytes=%d-%d' % (offset, offset + size - 1))
+        if self.timeout is None:
+            return urllib.request.urlopen(request)
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+
+class _BlockCache(object):
+    """
+    A least recently used cache of fixed-size blocks of the file stored in a
+    `StorageBackend`, which is used for all reads from the backend.
+
+    Blocks missing from the cache are read from the backend in as few
+    requests as possible; runs of consecutive missing blocks are coalesced
+    into a single ranged read, along with ``readahead`` blocks following the
+    last block requested.  The backend is not locked while it is being read
+    from, so reads from multiple threads may proceed concurrently.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.block_size = backend.block_size
+        self.max_blocks = max(backend.cache_blocks, 1)
+        self.readahead = max(backend.readahead, 0)
+
+        self._blocks = {}
+        # Block numbers in the cache, least recently used first
+        self._lru = []
+        self._size = None
+        self._lock = threading.RLock()
+
+        # Statistics on the effectiveness of the cache
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+
+    def size(self):
+        with self._lock:
+            if self._size is None:
+                self._size = self.backend.size()
+            return self._size
+
+    def read(self, offset, size):
+        """Reads up to ``size`` bytes from the file starting at ``offset``."""
+
+        size = min(size, self.size() - offset)
+        if size <= 0:
+            return b('')
+
+        block_size = self.block_size
+        first = offset // block_size
+        last = (offset + size - 1) // block_size
+
+        blocks = {}
+        missing = []
+        with self._lock:
+            for idx in range(first, last + 1):
+                if idx in self._blocks:
+                    blocks[idx] = self._blocks[idx]
+                    self._lru.remove(idx)
+                    self._lru.append(idx)
+                else:
+                    missing.append(idx)
+
+            self.hits += len(blocks)
+            self.misses += len(missing)
+
+        if missing:
+            if missing[-1] == last:
+                nblocks = (self.size() + block_size - 1) // block_size
+                for idx in range(last + 1,
+                                 min(last + 1 + self.readahead, nblocks)):
+                    if idx in self._blocks:
+                        break
+                    missing.append(idx)
+
+            fetched = self._fetch(missing)
+            blocks.update(fetched)
+
+            with self._lock:
+                for idx in sorted(fetched):
+                    if idx not in self._blocks:
+                        self._lru.append(idx)
+                    self._blocks[idx] = fetched[idx]
+
+                while len(self._lru) > self.max_blocks:
+                    del self._blocks[self._lru.pop(0)]
+
+        data = b('').join(blocks[idx] for idx in range(first, last + 1))
+        start = offset - first * block_size
+        return data[start:start + size]
+
+    def write(self, offset, data):
+        """
+        Writes ``data`` to the backend at ``offset`` and discards any cached
+        blocks that it overlaps.
+        """
+
+        self.backend.write_range(offset, data)
+        self._invalidate(offset, len(data))
+
+    def truncate(self, size):
+        self.backend.truncate(size)
+        self._invalidate(0, None)
+
+    def _invalidate(self, offset, size):
+        with self._lock:
+            first = offset // self.block_size
+            if size is None:
+                last = None
+            else:
+                last = (offset + size) // self.block_size
+
+            for idx in list(self._lru):
+                if idx >= first and (last is None or idx <= last):
+                    self._lru.remove(idx)
+                    del self._blocks[idx]
+
+            self._size = None
+
+    def _fetch(self, indices):
+        """
+        Reads the blocks with the given (sorted) indices from the backend,
+        making one request for each run of consecutive blocks.
+        """
+
+        block_size = self.block_size
+        runs = []
+        for idx in indices:
+            if runs and runs[-1][1] == idx:
+                runs[-1][1] = idx + 1
+            else:
+                runs.append([idx, idx + 1])
+
+        blocks = {}
+        for start, stop in runs:
+            data = self.backend.read_range(start * block_size,
+                                           (stop - start) * block_size)
+            self.requests += 1
+            for idx in range(start, stop):
+                pos = (idx - start) * block_size
+                blocks[idx] = data[pos:pos + block_size]
+
+        return blocks
+
+
+class _BackendFile(object):
+    """
+    A file-like object for reading and writing a file stored in a
+    `StorageBackend` through a `_BlockCache`.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self.cache = _BlockCache(backend)
+        self.closed = False
+        self._pos = 0
+
+    @property
+    def len(self):
+        return self.cache.size()
+
+    def read(self, size=-1):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        if size is None or size < 0:
+            size = max(self.cache.size() - self._pos, 0)
+
+        data = self.cache.read(self._pos, size)
+        self._pos += len(data)
+        return data
+
+    def pread(self, size, offset):
+        """Reads up to ``size`` bytes at ``offset`` without seeking."""
+
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        return self.cache.read(offset, size)
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        if isinstance(data, np.ndarray):
+            data = data.tostring()
+
+        self.cache.write(self._pos, data)
+        self._pos += len(data)
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self.cache.size()
+        elif whence != 0:
+            raise ValueError('Invalid whence value: %r' % whence)
+
+        if offset < 0:
+            raise IOError('Negative seek offset: %d' % offset)
+
+        self._pos = offset
+
+    def tell(self):
+        return self._pos
+
+    def truncate(self, size=None):
+        if size is None:
+            size = self._pos
+        self.cache.truncate(size)
+
+    def flush(self):
+        self.backend.flush()
+
+    def close(self):
+        if not self.closed:
+            self.backend.close()
+            self.closed = True
@@ -1,12 +1,16 @@
 from __future__ import division, with_statement  # confidence high
 
-import warnings
+import os
 import sys
+import warnings
 
 import numpy as np
 
 import pyfits as fits
-from ..hdu.base import _ValidHDU
+from ..hdu.base import (_ValidHDU, _compute_hdu_checksum,
+                        _ones_complement_sum, _checksum_add, _checksum_sub,
+                        _char_encode, _char_decode)
+from ..scripts import fitscheck
 from . import PyfitsTestCase
 from .test_table import comparerecords
 
@@ -356,6 +360,181 @@ class TestChecksumFunctions(PyfitsTestCase):
             assert 'DATASUM' in hdul[1].header
             assert (data == hdul[1].data).all()
 
+    def test_setval_delval_update_checksum(self):
+        """
+        Tests that the CHECKSUM card is kept up to date when keywords are
+        modified in place by `setval()` and `delval()`.
+        """
+
+        self.copy_file('checksum.fits')
+        fits.setval(self.temp('checksum.fits'), 'FOO', value='BAR', ext=1)
+        fits.setval(self.temp('checksum.fits'), 'TTYPE1', value='T', ext=1)
+
+        with fits.open(self.temp('checksum.fits'), checksum=True) as hdul:
+            assert hdul[1].header['FOO'] == 'BAR'
+            assert hdul[1].header['TTYPE1'] == 'T'
+            assert hdul[1].verify_checksum() == 1
+
+        fits.delval(self.temp('checksum.fits'), 'FOO', ext=1)
+
+        with fits.open(self.temp('checksum.fits'), checksum=True) as hdul:
+            assert 'FOO' not in hdul[1].header
+            assert hdul[1].verify_checksum() == 1
+
+    def test_checksum_arithmetic(self):
+        """
+        Tests the ones-complement arithmetic used for computing checksums
+        against the blockwise algorithm from the FITS checksum proposal.
+        """
+
+        def blockwise(data, sum32=0):
+            sum32 = np.uint32(sum32)
+            for idx in range(0, len(data), 2880):
+                sum32 = _compute_hdu_checksum(data[idx:idx + 2880], sum32)
+            return sum32
+
+        rand = np.random.RandomState(42)
+        for size in (0, 1, 3, 2880, 2883, 28800):
+            for data in (rand.randint(0, 256, size).astype(np.uint8),
+                         np.zeros(size, dtype=np.uint8),
+                         np.ones(size, dtype=np.uint8) * 255):
+                for sum32 in (0, 1234, 0xFFFFFFFF):
+                    assert (_ones_complement_sum(data, sum32) ==
+                            blockwise(data, sum32))
+
+        data = rand.randint(0, 256, 2880 * 10).astype(np.uint8)
+        total = _ones_complement_sum(data)
+        new = rand.randint(0, 256, 2880).astype(np.uint8)
+        updated = _checksum_add(
+            _checksum_sub(total, _ones_complement_sum(data[2880:5760])),
+            _ones_complement_sum(new))
+        data[2880:5760] = new
+        assert updated == _ones_complement_sum(data)
+
+        for value in (0, 1, 0xFFFFFFFF, 1234567890):
+            assert _char_decode(_char_encode(value)) == value
+
+    def test_update_header_only_reuses_datasum(self):
+        """
+        Updating the checksum of an HDU in which only the header was modified
+        should not require recomputing the datasum from the data.
+        """
+
+        fits.writeto(self.temp('tmp.fits'), np.arange(1000), checksum=True)
+
+        with fits.open(self.temp('tmp.fits'), mode='update') as hdul:
+            def fail(blocking):
+                raise AssertionError('the datasum was recalculated')
+            hdul[0]._calculate_datasum = fail
+            hdul[0].header['FOO'] = 'BAR'
+
+        with fits.open(self.temp('tmp.fits'), checksum=True) as hdul:
+            assert hdul[0].header['FOO'] == 'BAR'
+            assert hdul[0].verify_checksum() == 1
+            assert hdul[0].verify_datasum() == 1
+
+        # Now if the data is modified the datasum must be updated
+        with fits.open(self.temp('tmp.fits'), mode='update') as hdul:
+            hdul[0].data[0] = 42
+
+        with fits.open(self.temp('tmp.fits'), checksum=True) as hdul:
+            assert hdul[0].data[0] == 42
+            assert hdul[0].verify_checksum() == 1
+            assert hdul[0].verify_datasum() == 1
+
+    def test_setval_incremental_checksum(self):
+        """
+        Tests that `setval()` can update the CHECKSUM of an HDU without a
+        DATASUM card incrementally.
+        """
+
+        fits.writeto(self.temp('tmp.fits'), np.arange(1000), checksum=True)
+
+        def hdu_checksum(filename):
+            with fits.open(filename) as hdul:
+                hdu = hdul[0]
+                return hdu._calculate_checksum(
+                        hdu._calculate_datasum('standard'), 'standard')
+
+        # Replace the DATASUM card with a blank card and set the correct
+        # CHECKSUM for the whole HDU directly in the file
+        with open(self.temp('tmp.fits'), 'rb') as f:
+            contents = f.read()
+        offset = contents.index(b'DATASUM')
+        contents = contents[:offset] + b' ' * 80 + contents[offset + 80:]
+        with open(self.temp('tmp.fits'), 'wb') as f:
+            f.write(contents)
+        checksum = hdu_checksum(self.temp('tmp.fits'))
+        offset = contents.index(b'CHECKSUM') + 11
+        contents = (contents[:offset] + checksum.encode('ascii') +
+                    contents[offset + 16:])
+        with open(self.temp('tmp.fits'), 'wb') as f:
+            f.write(contents)
+
+        fits.setval(self.temp('tmp.fits'), 'FOO', value='BAR')
+        with fits.open(self.temp('tmp.fits')) as hdul:
+            assert hdul[0].header['FOO'] == 'BAR'
+            assert 'DATASUM' not in hdul[0].header
+            assert (hdul[0].header['CHECKSUM'] ==
+                    hdu_checksum(self.temp('tmp.fits')))
+
+    def test_writeto_single_pass_checksum(self):
+        """
+        Tests that when writing to a seekable file the checksums are computed
+        while writing the data, without a separate pass over the data, and
+        that they are the same as those computed the old way (as is still
+        done when writing to a file in append mode).
+        """
+
+        c1 = fits.Column(name='var', format='PJ()',
+                         array=np.array([[45.0, 56], np.array([11, 12, 13])],
+                                        'O'))
+        c2 = fits.Column(name='xyz', format='2I', array=[[11, 3], [12, 4]])
+        hdul = fits.HDUList([fits.PrimaryHDU(np.arange(101, dtype='>i2')),
+                             fits.BinTableHDU.from_columns([c1, c2])])
+        with open(self.temp('tmp2.fits'), 'ab') as f:
+            hdul.writeto(f, checksum=True)
+
+        def fail(blocking):
+            raise AssertionError('data was read to compute its checksum')
+
+        for hdu in hdul:
+            hdu._calculate_datasum = fail
+        hdul.writeto(self.temp('tmp.fits'), checksum=True)
+
+        with fits.open(self.temp('tmp.fits'), checksum=True) as hdul1:
+            with fits.open(self.temp('tmp2.fits')) as hdul2:
+                for hdu1, hdu2 in zip(hdul1, hdul2):
+                    assert hdu1.header == hdu2.header
+
+        assert hdul1[1].header['CHECKSUM'] == 'YIGoaIEmZIEmaIEm'
+        assert hdul1[1].header['DATASUM'] == '1507485'
+
+    def test_writeto_single_pass_checksum_unaligned(self):
+        """
+        Tests the checksums computed while writing a table whose rows and heap
+        are not aligned to 32-bit words.
+        """
+
+        c1 = fits.Column(name='abc', format='3A', array=['a', 'bcd', 'ef'])
+        c2 = fits.Column(name='var', format='PB()',
+                         array=np.array([[1, 2, 3], [4], [5, 6]], 'O'))
+        tbhdu = fits.BinTableHDU.from_columns([c1, c2])
+        tbhdu.writeto(self.temp('tmp.fits'), checksum=True)
+
+        # Opening with checksum=True raises an exception if the checksums are
+        # wrong
+        with fits.open(self.temp('tmp.fits'), checksum=True) as hdul:
+            assert hdul[1].header['CHECKSUM'] != '0' * 16
+            assert hdul[1].header['DATASUM'] != '0'
+
+    def test_writeto_single_pass_datasum_only(self):
+        hdu = fits.PrimaryHDU(np.arange(100))
+        hdu.writeto(self.temp('tmp.fits'), checksum='datasum')
+        with fits.open(self.temp('tmp.fits'), checksum=True) as hdul:
+            assert 'CHECKSUM' not in hdul[0].header
+            assert hdul[0].header['DATASUM'] == '4950'
+
     def test_open_update_mode_update_checksum(self):
         """
         Regression test for https://aeon.stsci.edu/ssb/trac/pyfits/ticket/148, part
@@ -399,3 +578,46 @@ class TestChecksumFunctions(PyfitsTestCase):
             assert header2['FOO'] == 'BAR'
             assert (data2['TIME'][1:] == data['TIME'][1:]).all()
             assert data2['TIME'][0] == 42
+
+
+class TestFitscheck(PyfitsTestCase):
+    def fitscheck(self, *args):
+        argv = sys.argv
+        sys.argv = ['fitscheck'] + list(args)
+        try:
+            return fitscheck.main()
+        finally:
+            sys.argv = argv
+
+    def test_verify_raw(self):
+        self.copy_file('checksum.fits')
+        assert self.fitscheck(self.temp('checksum.fits')) == 0
+        assert self.fitscheck('-j', '2', self.temp('checksum.fits'),
+                              self.data('checksum.fits')) == 0
+
+        # Corrupt a byte of the table data
+        with fits.open(self.temp('checksum.fits')) as hdul:
+            offset = hdul[1]._data_offset
+        with open(self.temp('checksum.fits'), 'rb+') as f:
+            f.seek(offset)
+            byte = f.read(1)
+            f.seek(offset)
+            f.write(b'\x00' if byte != b'\x00' else b'\x01')
+
+        assert self.fitscheck(self.temp('checksum.fits')) == 1
+
+    def test_update_inplace(self):
+        self.copy_file('tb.fits')
+        size = os.path.getsize(self.temp('tb.fits'))
+        assert self.fitscheck(self.temp('tb.fits')) == 1
+        assert self.fitscheck('--update', self.temp('tb.fits')) == 1
+        assert self.fitscheck('--update', '--force',
+                              self.temp('tb.fits')) == 1
+        assert os.path.getsize(self.temp('tb.fits')) == size
+        assert self.fitscheck(self.temp('tb.fits')) == 0
+        assert self.fitscheck('--no-raw', self.temp('tb.fits')) == 0
+
+        with fits.open(self.temp('tb.fits'), checksum=True) as hdul:
+            assert 'CHECKSUM' in hdul[1].header
+            assert hdul[1].header['DATASUM'] == str(
+                hdul[1]._calculate_datasum('standard'))
@@ -5,17 +5,18 @@ import mmap
 import os
 import shutil
 import sys
+import threading
 import warnings
 import zipfile
 
 import numpy as np
 
-from ..extern.six import BytesIO
+from ..extern.six import BytesIO, b
 
 import pyfits as fits
-from ..convenience import _getext
-from ..file import _File
-from ..util import PyfitsDeprecationWarning
+from ..convenience import _getext, _setval_inplace
+from ..file import _File, _IndexedGzipFile
+from ..util import PyfitsDeprecationWarning, _get_array_mmap
 from . import PyfitsTestCase
 from .util import catch_warnings, ignore_warnings, CaptureStdio
 
@@ -548,6 +549,253 @@ class TestConvenienceFunctions(PyfitsTestCase):
         assert 'CRPIX1' in hdul[0].header
         assert hdul[0].header['CRPIX1'] == 1.0
 
+    def test_setval_inplace(self):
+        """
+        Tests that `setval()` and `delval()` produce the same result when
+        patching a file in place as updating the header through `open()`.
+        """
+
+        self.copy_file('test0.fits')
+        shutil.copy(self.temp('test0.fits'), self.temp('test1.fits'))
+
+        updates = [('ROOTNAME', 'foo', None), ('CRPIX1', 2.0, 'new comment'),
+                   ('NEWKEY', 42, 'a new keyword')]
+
+        for keyword, value, comment in updates:
+            assert _setval_inplace(self.temp('test0.fits'), 1, keyword,
+                                   value, comment, False, {})
+            with fits.open(self.temp('test1.fits'), mode='update') as hdul:
+                hdul[1].header.set(keyword, value, comment)
+
+        fits.delval(self.temp('test0.fits'), 'EXPNAME', ext=1)
+        with fits.open(self.temp('test1.fits'), mode='update') as hdul:
+            del hdul[1].header['EXPNAME']
+
+        with open(self.temp('test0.fits'), 'rb') as f:
+            contents = f.read()
+        with open(self.temp('test1.fits'), 'rb') as f:
+            assert f.read() == contents
+
+        with fits.open(self.temp('test0.fits')) as hdul:
+            assert hdul[1].header['ROOTNAME'] == 'foo'
+            assert hdul[1].header.comments['CRPIX1'] == 'new comment'
+            assert hdul[1].header['NEWKEY'] == 42
+            assert 'EXPNAME' not in hdul[1].header
+
+    def test_setval_header_growth(self):
+        """
+        Tests that `setval()` falls back on rewriting the file when the header
+        needs another block.
+        """
+
+        header = fits.Header([('KEY%d' % idx, idx) for idx in range(30)])
+        fits.writeto(self.temp('test.fits'), np.arange(100), header=header)
+        hdrsize = len(str(fits.getheader(self.temp('test.fits'))))
+
+        for idx in range(30, 40):
+            fits.setval(self.temp('test.fits'), 'KEY%d' % idx, value=idx)
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            assert hdul[0]._data_offset > hdrsize
+            assert hdul[0].header['KEY39'] == 39
+            assert (hdul[0].data == np.arange(100)).all()
+
+        assert not _setval_inplace(self.temp('test.fits'), 0, 'NAXIS1', 50,
+                                   None, False, {})
+        assert not _setval_inplace(self.temp('test.fits'), 0, 'HISTORY', 'a',
+                                   None, False, {})
+        assert not _setval_inplace(self.temp('test.fits'), 0, 'LONGSTR',
+                                   'a' * 100, None, False, {})
+
+    def test_delval_inplace_keeps_size(self):
+        """
+        Deleting cards in place pads the header with blank cards if needed
+        so that the data does not move.
+        """
+
+        header = fits.Header([('KEY%d' % idx, idx) for idx in range(40)])
+        fits.writeto(self.temp('test.fits'), np.arange(100), header=header)
+        size = os.path.getsize(self.temp('test.fits'))
+
+        for idx in range(10):
+            fits.delval(self.temp('test.fits'), 'KEY%d' % idx)
+
+        assert os.path.getsize(self.temp('test.fits')) == size
+        with fits.open(self.temp('test.fits')) as hdul:
+            assert 'KEY9' not in hdul[0].header
+            assert hdul[0].header['KEY10'] == 10
+            assert (hdul[0].data == np.arange(100)).all()
+
+    def test_scan_headers(self):
+        """
+        Tests that `scan_headers()` returns the same keyword values as
+        `getval()`.
+        """
+
+        filenames = [self.data(name) for name in
+                     ('test0.fits', 'tb.fits', 'o4sp040b0_raw.fits')]
+        keywords = ['BITPIX', 'NAXIS', 'EXTNAME', 'NOTAKEYWORD']
+
+        for ext in (0, 1):
+            rows = list(fits.scan_headers(filenames, keywords, ext=ext))
+            assert len(rows) == 3
+            for filename, row in zip(filenames, rows):
+                header = fits.getheader(filename, ext)
+                assert row[0] == filename
+                assert row[1:] == tuple(header.get(keyword)
+                                        for keyword in keywords)
+
+        rows = list(fits.scan_headers(filenames, ['NAXIS1'], ext=('sci', 2),
+                                      ignore_errors=True, default=-1))
+        assert rows == [(filenames[0], 40), (filenames[1], -1),
+                        (filenames[2], 62)]
+
+        assert_raises(KeyError, list,
+                      fits.scan_headers(filenames, ['NAXIS1'], ext='sci'))
+        assert_raises(IndexError, list,
+                      fits.scan_headers(filenames, ['NAXIS'], ext=10))
+
+    def test_scan_headers_long_values(self):
+        """
+        Tests `scan_headers()` with CONTINUE cards and commentary keywords.
+        """
+
+        header = fits.Header()
+        header['LONGSTR'] = 'abc' * 100
+        header['HISTORY'] = 'first'
+        header['HISTORY'] = 'second'
+        fits.writeto(self.temp('long.fits'), np.arange(10), header=header)
+
+        row = list(fits.scan_headers([self.temp('long.fits')],
+                                     ['longstr', 'HISTORY']))[0]
+        assert row[1] == 'abc' * 100
+        assert row[2] == ['first', 'second']
+
+    def test_scan_headers_parallel(self):
+        filenames = [self.data(name) for name in
+                     ('test0.fits', 'tb.fits', 'arange.fits')] * 4
+        serial = list(fits.scan_headers(filenames, ['NAXIS', 'BITPIX']))
+
+        for pool in ('thread', 'process'):
+            rows = list(fits.scan_headers(filenames, ['NAXIS', 'BITPIX'],
+                                          workers=3, pool=pool))
+            assert rows == serial
+
+        assert_raises(ValueError, list,
+                      fits.scan_headers(filenames, ['NAXIS'], workers=2,
+                                        pool='foo'))
+
+    def test_scan_headers_as_array(self):
+        filenames = [self.data(name) for name in ('test0.fits', 'tb.fits')]
+        arr = fits.scan_headers(filenames, ['NAXIS', 'BITPIX', 'EXTNAME'],
+                                ext=1, as_array=True)
+        assert arr.dtype.names == ('filename', 'NAXIS', 'BITPIX', 'EXTNAME')
+        assert arr['NAXIS'].dtype.kind == 'i'
+        assert arr['EXTNAME'].dtype.kind == 'O'
+        assert list(arr['NAXIS']) == [2, 2]
+        assert list(arr['BITPIX']) == [16, 8]
+        assert list(arr['EXTNAME']) == ['SCI', None]
+
+    def test_extract(self):
+        fits.extract(self.data('test0.fits'), self.temp('sci.fits'),
+                     [('SCI', 3), 'SCI'])
+        with fits.open(self.temp('sci.fits')) as hdul:
+            hdul.verify('exception')
+            assert len(hdul) == 2
+            assert isinstance(hdul[0], fits.PrimaryHDU)
+            assert hdul[0].header['EXTEND'] is True
+            assert 'PCOUNT' not in hdul[0].header
+            assert hdul[1].header['EXTVER'] == 1
+            for hdu, ext in zip(hdul, (3, 1)):
+                assert (hdu.data ==
+                        fits.getdata(self.data('test0.fits'), ext)).all()
+
+        assert_raises(IOError, fits.extract, self.data('test0.fits'),
+                      self.temp('sci.fits'), [1])
+        assert_raises(KeyError, fits.extract, self.data('test0.fits'),
+                      self.temp('foo.fits'), ['FOO'])
+
+        # A table can't be written as the primary HDU, so an empty primary
+        # HDU is written before it
+        fits.extract(self.data('tb.fits'), self.temp('tb.fits'), [1])
+        with fits.open(self.temp('tb.fits')) as hdul:
+            assert len(hdul) == 2
+            assert hdul[0].data is None
+            assert (hdul[1].data['c1'] ==
+                    fits.getdata(self.data('tb.fits'))['c1']).all()
+
+    def test_concatenate(self):
+        hdul = fits.HDUList([fits.PrimaryHDU(np.arange(100)),
+                             fits.ImageHDU(np.ones((10, 10)), name='SCI')])
+        hdul.writeto(self.temp('a.fits'), checksum=True)
+        hdul = fits.HDUList([fits.PrimaryHDU(),
+                             fits.ImageHDU(np.zeros(5), name='SCI')])
+        hdul.writeto(self.temp('b.fits'))
+
+        inputs = [self.temp('a.fits'), self.temp('b.fits')]
+        for workers in (None, 2):
+            with ignore_warnings():
+                fits.concatenate(inputs, self.temp('out.fits'),
+                                 renumber_extver=True, clobber=True,
+                                 workers=workers)
+            with catch_warnings():
+                # Raise an exception on a checksum mismatch
+                warnings.simplefilter('error', UserWarning)
+                hdul = fits.open(self.temp('out.fits'), checksum=True)
+            with hdul:
+                hdul.verify('exception')
+                # The empty primary HDU of the second file is skipped
+                assert len(hdul) == 3
+                assert (hdul[0].data == np.arange(100)).all()
+                assert (hdul[1].data == 1).all()
+                assert (hdul[2].data == 0).all()
+                assert [hdu.header.get('EXTVER') for hdu in hdul] == \
+                    [None, 1, 2]
+
+        # The primary HDU of each file is converted to an image extension,
+        # while the unchanged header of the first file is copied as is
+        with ignore_warnings():
+            fits.concatenate(inputs, self.temp('out.fits'), exts=[0],
+                             clobber=True)
+        with open(self.temp('a.fits'), 'rb') as f:
+            expected = f.read(2880 * 2)
+        with open(self.temp('out.fits'), 'rb') as f:
+            assert f.read(2880 * 2) == expected
+        with fits.open(self.temp('out.fits'), checksum=True) as hdul:
+            hdul.verify('exception')
+            assert len(hdul) == 2
+            assert hdul[1].header['XTENSION'] == 'IMAGE'
+            assert 'EXTEND' not in hdul[1].header
+            assert hdul[1].data is None
+
+        # 'PRIMARY' refers to the first HDU of each file, as in HDUList
+        with ignore_warnings():
+            fits.concatenate(inputs, self.temp('primary.fits'),
+                             exts=['primary'], clobber=True)
+        with open(self.temp('out.fits'), 'rb') as f:
+            expected = f.read()
+        with open(self.temp('primary.fits'), 'rb') as f:
+            assert f.read() == expected
+
+    def test_fitsextract(self):
+        from ..scripts import fitsextract
+
+        argv = sys.argv
+        sys.argv = ['fitsextract', '-e', 'SCI,2', '-e', '0', '-o',
+                    self.temp('sci.fits'), self.data('test0.fits')]
+        try:
+            assert fitsextract.main() == 0
+            # The output file already exists
+            assert fitsextract.main() == 1
+        finally:
+            sys.argv = argv
+
+        with fits.open(self.temp('sci.fits')) as hdul:
+            assert len(hdul) == 2
+            assert hdul[1].header['XTENSION'] == 'IMAGE'
+            assert (hdul[0].data ==
+                    fits.getdata(self.data('test0.fits'), 'SCI', 2)).all()
+
 
 class TestFileFunctions(PyfitsTestCase):
     """
@@ -587,6 +835,131 @@ class TestFileFunctions(PyfitsTestCase):
         with ignore_warnings():
             assert len(fits.open(self._make_gzip_file('test0.fz'))) == 5
 
+    def test_gzip_random_access(self):
+        """
+        Tests reading HDUs out of order from a gzip file, which seeks both
+        forwards and backwards in the decompressed data.
+        """
+
+        gzfile = self._make_gzip_file()
+        with fits.open(self.data('test0.fits')) as hdul1:
+            with fits.open(gzfile) as hdul2:
+                for idx in (3, 1, 4, 2):
+                    assert (hdul1[idx].data == hdul2[idx].data).all()
+                assert (hdul1[2].section[5:10, 3:7] ==
+                        hdul2[2].section[5:10, 3:7]).all()
+
+    def test_indexed_gzip_file(self):
+        with open(self.data('test0.fits'), 'rb') as f:
+            contents = f.read()
+
+        # Write a gzip file with multiple members followed by some padding
+        with open(self.temp('test0.fits.gz'), 'wb') as f:
+            for idx in range(0, len(contents), 10000):
+                gz = gzip.GzipFile(fileobj=f, mode='wb')
+                gz.write(contents[idx:idx + 10000])
+                gz.close()
+            f.write(b'\x00' * 100)
+
+        gz = _IndexedGzipFile(self.temp('test0.fits.gz'), spacing=2880)
+        try:
+            assert gz.read() == contents
+            assert len(gz._index.points) > len(contents) // 10000
+            for offset, size in [(0, 100), (40000, 5000), (2879, 2),
+                                 (len(contents) - 10, 100), (12345, 30000)]:
+                gz.seek(offset)
+                assert gz.read(size) == contents[offset:offset + size]
+                assert gz.tell() == min(offset + size, len(contents))
+            gz.seek(-10, 2)
+            assert gz.read() == contents[-10:]
+        finally:
+            gz.close()
+
+        # A second reader for the same file reuses the index
+        gz2 = _IndexedGzipFile(self.temp('test0.fits.gz'), spacing=2880)
+        try:
+            assert gz2._index is gz._index
+            gz2.seek(40000)
+            assert gz2.read(100) == contents[40000:40100]
+        finally:
+            gz2.close()
+
+    def _check_indexed_gzip_file(self, filename, contents):
+        # A new reader, with no index built by earlier reads, finds the size
+        # and the data of every member from the member headers
+        _IndexedGzipFile._index_cache.clear()
+        del _IndexedGzipFile._index_cache_keys[:]
+        gz = _IndexedGzipFile(filename)
+        try:
+            gz.seek(0, 2)
+            assert gz.tell() == len(contents)
+            gz.seek(len(contents) // 2)
+            assert gz.read(100) == contents[len(contents) // 2:
+                                            len(contents) // 2 + 100]
+            gz.seek(0)
+            assert len(gz.read()) == len(contents)
+        finally:
+            gz.close()
+
+    def test_parallel_gzip_file(self):
+        contents = b('abc') + np.arange(100000, dtype='>i4').tostring()
+        for workers in (1, 3):
+            for indexed in (False, True):
+                f = fits.ParallelGzipFile(self.temp('test.gz'),
+                                          compresslevel=1, workers=workers,
+                                          block_size=10000, indexed=indexed)
+                f.write(contents[:3])
+                f.write(np.arange(100000, dtype='>i4'))
+                assert f.tell() == len(contents)
+                f.seek(100, 1)
+                f.close()
+
+                with gzip.open(self.temp('test.gz'), 'rb') as gz:
+                    assert gz.read() == contents + b('\0') * 100
+                if indexed:
+                    self._check_indexed_gzip_file(self.temp('test.gz'),
+                                                  contents + b('\0') * 100)
+
+        # An empty file is still a valid gzip file
+        fits.ParallelGzipFile(self.temp('test.gz')).close()
+        with gzip.open(self.temp('test.gz'), 'rb') as gz:
+            assert gz.read() == b('')
+
+    def test_writeto_gzip(self):
+        """
+        New .gz files are written with ParallelGzipFile, or may be written to
+        one directly.
+        """
+
+        data = np.arange(100000, dtype=np.int32).reshape((100, 1000))
+        hdul = fits.HDUList([fits.PrimaryHDU(data),
+                             fits.ImageHDU(data[:10], name='SCI')])
+        hdul.writeto(self.temp('test.fits'))
+        with open(self.temp('test.fits'), 'rb') as f:
+            contents = f.read()
+
+        hdul.writeto(self.temp('test.fits.gz'))
+        with gzip.open(self.temp('test.fits.gz'), 'rb') as gz:
+            assert gz.read() == contents
+
+        f = fits.ParallelGzipFile(self.temp('indexed.fits.gz'), workers=2,
+                                  block_size=2880 * 10, indexed=True)
+        hdul.writeto(f)
+        f.close()
+        with gzip.open(self.temp('indexed.fits.gz'), 'rb') as gz:
+            assert gz.read() == contents
+        self._check_indexed_gzip_file(self.temp('indexed.fits.gz'), contents)
+
+        # The index of member offsets is built from the member headers alone
+        with fits.open(self.temp('indexed.fits.gz')) as hdul2:
+            gz = hdul2._HDUList__file._File__file
+            assert isinstance(gz, _IndexedGzipFile)
+            assert gz._index.member_sizes
+            assert gz._index.size == len(contents)
+            assert len(gz._index.points) >= len(contents) // (2880 * 10)
+            assert (hdul2['SCI'].data == data[:10]).all()
+            assert (hdul2[0].section[50:52] == data[50:52]).all()
+
     def test_writeto_append_mode_gzip(self):
         """Regression test for
         https://github.com/spacetelescope/PyFITS/issues/33
@@ -650,6 +1023,299 @@ class TestFileFunctions(PyfitsTestCase):
 
         assert_raises(IOError, fits.open, zfile.filename)
 
+    def test_open_zip_member(self):
+        """
+        Tests opening a member of a zip file with multiple members by name,
+        for members that are stored with and without compression.
+        """
+
+        for compression in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            zfile = zipfile.ZipFile(self.temp('test.zip'), 'w', compression)
+            zfile.write(self.data('test0.fits'), 'test0.fits')
+            zfile.write(self.data('tb.fits'), 'data/tb.fits')
+            zfile.writestr('foo', 'bar')
+            zfile.close()
+
+            for memmap in (False, True):
+                with fits.open(self.data('test0.fits')) as hdul1:
+                    with fits.open(self.temp('test.zip'), member='test0.fits',
+                                   memmap=memmap) as hdul2:
+                        assert len(hdul2) == 5
+                        for idx in (4, 1, 3):
+                            assert hdul1[idx].header == hdul2[idx].header
+                            assert (hdul1[idx].data == hdul2[idx].data).all()
+
+                with fits.open(self.data('tb.fits')) as hdul1:
+                    with fits.open(zipfile.ZipFile(self.temp('test.zip')),
+                                   member='data/tb.fits',
+                                   memmap=memmap) as hdul2:
+                        assert (hdul1[1].data == hdul2[1].data).all()
+
+            assert_raises(IOError, fits.open, self.temp('test.zip'))
+            assert_raises(IOError, fits.open, self.temp('test.zip'),
+                          member='bar')
+
+    def test_open_zip_member_memmap(self):
+        """
+        Members stored without compression are mapped straight from the zip
+        file.
+        """
+
+        zf = self._make_zip_file()
+        with fits.open(zf, memmap=True) as hdul:
+            assert _get_array_mmap(hdul[1].data) is not None
+
+    def test_shared_mmap(self):
+        """
+        All arrays read from a file that is not mapped copy-on-write share a
+        single mmap, which is released when the file is closed.
+        """
+
+        hdul = fits.open(self.data('test0.fits'), mode='denywrite',
+                         memmap=True)
+        mm = _get_array_mmap(hdul[1].data)
+        assert mm is not None
+        assert hdul._HDUList__file._mmap is mm
+        for hdu in hdul[2:]:
+            assert _get_array_mmap(hdu.data) is mm
+        del mm
+
+        # Arrays still in use keep the mmap open after the file is closed
+        data = hdul[1].data
+        hdul.close()
+        assert hdul._HDUList__file._mmap is None
+        assert data.sum() == fits.getdata(self.data('test0.fits'), 1).sum()
+
+    def test_shared_mmap_views(self):
+        """
+        The mmap is closed with the file only if no arrays read from it, or
+        views of them, are still in use.
+        """
+
+        with fits.open(self.data('test0.fits')) as hdul:
+            offset = hdul[1]._data_offset
+            expected = hdul[1].data.copy()
+
+        f = _File(self.data('test0.fits'), mode='denywrite', memmap=True)
+        view = f.readarray(offset=offset, dtype='>i2',
+                           shape=expected.shape)[1:]
+        mm = f._mmap
+        f.close()
+        assert (view == expected[1:]).all()
+        assert mm[0:6] == b('SIMPLE')
+
+        f = _File(self.data('test0.fits'), mode='denywrite', memmap=True)
+        assert f.readarray(offset=offset, dtype='>i2', shape=(10,)).size
+        mm = f._mmap
+        f.close()
+        assert_raises(ValueError, mm.__getitem__, 0)
+
+    def test_copyonwrite_mmap(self):
+        """
+        In the modes that map the file copy-on-write changes made to one array
+        are not seen through other arrays of the same data.
+        """
+
+        expected = fits.getdata(self.data('test0.fits'), 1)
+        self.copy_file('test0.fits')
+        for mode in ('readonly', 'copyonwrite', 'append'):
+            with fits.open(self.temp('test0.fits'), mode=mode,
+                           memmap=True) as hdul:
+                hdul[1].data[0, 0] = 999
+                assert hdul[1].section[0, 0] == expected[0, 0]
+                f = hdul._HDUList__file
+                data = f.readarray(offset=hdul[1]._data_offset, dtype='>i2',
+                                   shape=expected.shape)
+                assert (data == expected).all()
+                assert hdul[1].data[0, 0] == 999
+                assert (_get_array_mmap(data) is not
+                        _get_array_mmap(hdul[1].data))
+        assert (fits.getdata(self.temp('test0.fits'), 1) == expected).all()
+
+    def test_shared_mmap_remap(self):
+        """
+        The mmap is replaced with a larger one when the file grows.
+        """
+
+        self.copy_file('test0.fits')
+        with fits.open(self.temp('test0.fits'), mode='append',
+                       memmap=True) as hdul:
+            data = hdul[1].data.copy()
+            mm = _get_array_mmap(hdul[1].data)
+            hdul.append(fits.ImageHDU(np.arange(100, dtype=np.int32)))
+            hdul.flush()
+
+        with fits.open(self.temp('test0.fits'), memmap=True) as hdul:
+            assert len(hdul) == 6
+            assert (hdul[1].data == data).all()
+            assert (hdul[5].data == np.arange(100)).all()
+
+        f = _File(self.temp('test0.fits'), mode='update', memmap=True)
+        try:
+            size = f.size
+            first = f._get_mmap(size)
+            assert f._get_mmap(size) is first
+            f.seek(0, 2)
+            f.write(fits.ImageHDU(np.arange(10)).header.tostring().encode('ascii'))
+            second = f._get_mmap(f.tell())
+            assert second is not first
+            assert len(second) > size
+            # No arrays used the old mmap, so it was closed
+            assert_raises(ValueError, first.__getitem__, 0)
+        finally:
+            f.close()
+
+    def test_pread(self):
+        """
+        Positional reads do not use or change the file position, whether or
+        not the file supports os.pread.
+        """
+
+        with open(self.data('test0.fits'), 'rb') as f:
+            expected = f.read()
+
+        for filename in (self.data('test0.fits'), self._make_gzip_file()):
+            f = _File(filename)
+            try:
+                f.seek(100)
+                assert f.pread(80, 2880) == expected[2880:2960]
+                assert f.pread(80, len(expected) - 40) == expected[-40:]
+                assert f.pread(80, len(expected)) == b('')
+                assert f.tell() == 100
+            finally:
+                f.close()
+
+    def test_concurrent_reads(self):
+        """
+        Data and sections of different HDUs in the same HDUList can be read
+        from several threads at once.
+        """
+
+        expected = [fits.getdata(self.data('test0.fits'), idx)
+                    for idx in range(1, 5)]
+
+        for filename in (self.data('test0.fits'), self._make_gzip_file()):
+            for memmap in (False, True):
+                hdul = fits.open(filename, memmap=memmap)
+                errors = []
+
+                def read(idx):
+                    try:
+                        for _ in range(20):
+                            hdu = hdul[idx + 1]
+                            assert (hdu.section[:, :] == expected[idx]).all()
+                            assert (hdu.section[1:5, 2:4] ==
+                                    expected[idx][1:5, 2:4]).all()
+                    except Exception:
+                        errors.append(sys.exc_info()[1])
+
+                threads = [threading.Thread(target=read, args=(idx % 4,))
+                           for idx in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+                hdul.close()
+                assert not errors, errors
+
+    def test_access_hints(self):
+        """
+        Files can be opened with any access pattern hint and read as usual.
+        """
+
+        expected = [fits.getdata(self.data('test0.fits'), idx)
+                    for idx in range(1, 5)]
+
+        for access in ('sequential', 'random', 'willneed'):
+            for memmap in (False, True):
+                with fits.open(self.data('test0.fits'), memmap=memmap,
+                               access=access) as hdul:
+                    assert hdul._HDUList__file.access == access
+                    for hdu, data in zip(hdul[1:], expected):
+                        assert (hdu.data == data).all()
+
+        assert_raises(ValueError, fits.open, self.data('test0.fits'),
+                      access='backwards')
+
+    def test_sequential_prefetch(self):
+        """
+        With sequential access each HDU is prefetched while iterating over
+        the HDUList.
+        """
+
+        with fits.open(self.data('test0.fits'), access='sequential') as hdul:
+            prefetched = []
+            fileobj = hdul._HDUList__file
+            fileobj.prefetch = lambda offset, size: prefetched.append(offset)
+            for idx, hdu in enumerate(hdul):
+                # The next HDU is prefetched before this one is returned
+                assert len(prefetched) == min(idx + 1, 4)
+            assert prefetched == [hdu._header_offset for hdu in hdul[1:]]
+
+        # Without a hint nothing is prefetched
+        with fits.open(self.data('test0.fits')) as hdul:
+            fileobj = hdul._HDUList__file
+            fileobj.prefetch = lambda offset, size: prefetched.append(offset)
+            list(hdul)
+            assert len(prefetched) == 4
+
+    def test_prefetch_backend(self):
+        """Prefetching from a storage backend fills its block cache."""
+
+        with open(self.data('test0.fits'), 'rb') as f:
+            backend = fits.MemoryBackend(f.read(), block_size=2880,
+                                         cache_blocks=100, readahead=0)
+
+        f = _File(backend, access='sequential')
+        try:
+            f.prefetch(2880, 2880 * 4)
+            f._prefetch_thread.join()
+            cache = f._File__file.cache
+            assert sorted(cache._blocks) == [1, 2, 3, 4]
+            assert f.pread(2880 * 4, 2880) == backend.read_range(2880,
+                                                                 2880 * 4)
+            assert cache.hits == 4
+        finally:
+            f.close()
+
+    def test_copy_to(self):
+        """
+        Copy ranges of one file to another, by the kernel where possible.
+        """
+
+        with open(self.data('test0.fits'), 'rb') as f:
+            expected = f.read()
+
+        src = _File(self.data('test0.fits'))
+        dst = _File(self.temp('copy.fits'), mode='ostream')
+        try:
+            dst.write(expected[:2880])
+            assert src.copy_to(dst, 2880, len(expected) - 2880) == \
+                    len(expected) - 2880
+            assert dst.tell() == len(expected)
+            stats = dst.copy_stats
+            assert stats['kernel'] + stats['chunked'] == len(expected) - 2880
+            if hasattr(os, 'sendfile') or hasattr(os, 'copy_file_range'):
+                assert stats['kernel'] == len(expected) - 2880
+        finally:
+            src.close()
+            dst.close()
+
+        with open(self.temp('copy.fits'), 'rb') as f:
+            assert f.read() == expected
+
+        # Copies that the kernel can't make are made in chunks
+        src = _File(self._make_gzip_file())
+        dst = _File(BytesIO(), mode='ostream')
+        try:
+            assert src.copy_to(dst, 0, len(expected)) == len(expected)
+            assert dst.copy_stats == {'kernel': 0, 'chunked': len(expected)}
+            assert_raises(ValueError, src.copy_to, dst, len(expected) - 10,
+                          20)
+        finally:
+            src.close()
+
     def test_read_open_file(self):
         """Read from an existing file object."""
 
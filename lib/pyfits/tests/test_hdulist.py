@@ -2,6 +2,7 @@ from __future__ import division, with_statement  # confidence high
 
 import glob
 import os
+import pickle
 import sys
 
 import numpy as np
@@ -9,6 +10,7 @@ import numpy as np
 from ..extern.six import BytesIO
 
 import pyfits as fits
+from ..util import _map_parallel
 from ..verify import VerifyError
 from . import PyfitsTestCase
 from .util import catch_warnings, ignore_warnings
@@ -16,6 +18,12 @@ from .util import catch_warnings, ignore_warnings
 from nose.tools import assert_raises
 
 
+def _read_handle(handle):
+    # Run in the worker processes of test_hdu_handles
+    return (handle.header['EXTVER'], handle.section[2:4, 1:3].tolist(),
+            handle.hdu._file.memmap)
+
+
 class TestHDUListFunctions(PyfitsTestCase):
     @ignore_warnings
     def test_update_name(self):
@@ -755,3 +763,134 @@ class TestHDUListFunctions(PyfitsTestCase):
 
             # Finally, without mmaping B
             test(True, False)
+
+    def test_readall(self):
+        data = np.arange(10000, dtype=np.int16).reshape((100, 100))
+        hdul = fits.HDUList([fits.PrimaryHDU()])
+        for idx in range(6):
+            hdu = fits.ImageHDU((data + idx).astype(np.float32), name='SCI')
+            hdu.header['EXTVER'] = idx + 1
+            hdu.scale('int16', bscale=0.5, bzero=idx)
+            hdul.append(hdu)
+        hdul.writeto(self.temp('test.fits'))
+
+        for workers in (None, 3):
+            with fits.open(self.temp('test.fits'), memmap=False) as hdul:
+                assert hdul.readall(workers=workers) == []
+                for idx, hdu in enumerate(hdul[1:]):
+                    assert hdu._data_loaded
+                    assert hdu.data.dtype == np.float32
+                    assert (hdu.data == data + idx).all()
+
+        with fits.open(self.temp('test.fits')) as hdul:
+            assert hdul.readall(workers=2, hdus=[2, ('SCI', 4)]) == []
+            assert [hdu._data_loaded for hdu in hdul] == \
+                [False, False, True, False, True, False, False]
+
+        # Truncate the file partway through the data of the last HDU; the
+        # other HDUs are still read
+        with fits.open(self.temp('test.fits')) as hdul:
+            size = hdul[6]._data_offset + 1000
+        with open(self.temp('test.fits'), 'rb+') as f:
+            f.truncate(size)
+
+        with catch_warnings(record=True) as w:
+            with fits.open(self.temp('test.fits'), memmap=False) as hdul:
+                errors = hdul.readall(workers=3)
+                assert len(errors) == 1
+                assert errors[0][0] == 6
+                assert isinstance(errors[0][1], ValueError)
+                assert not hdul[6]._data_loaded
+                assert (hdul[5].data == data + 4).all()
+            assert 'Failed to read the data of HDU 6' in \
+                '\n'.join(str(warning.message) for warning in w)
+
+    def test_writeto_parallel(self):
+        data = np.arange(100, dtype=np.int32)
+        vla = np.array([np.arange(idx) for idx in range(10)], dtype=object)
+        table = fits.new_table([
+            fits.Column(name='a', format='J', array=np.arange(10)),
+            fits.Column(name='v', format='PJ()', array=vla)])
+        hdul = fits.HDUList([
+            fits.PrimaryHDU(np.arange(1000, dtype=np.float32)),
+            fits.ImageHDU(data, name='SHARED'),
+            # This HDU's data shares memory with the previous HDU's, so the
+            # two must not be written at the same time
+            fits.ImageHDU(data[10:], name='SHARED'), table,
+            fits.ImageHDU(np.arange(20, dtype=np.uint16), uint=True),
+            fits.ImageHDU()])
+        hdul[2].header['EXTVER'] = 2
+
+        hdul.writeto(self.temp('serial.fits'))
+        hdul.writeto(self.temp('parallel.fits'), workers=3)
+        assert (open(self.temp('parallel.fits'), 'rb').read() ==
+                open(self.temp('serial.fits'), 'rb').read())
+        assert 'BZERO' not in hdul[4].header
+
+        with fits.open(self.temp('parallel.fits'), uint=True) as hdul2:
+            assert hdul2[1]._data_offset == hdul[1]._data_offset
+            assert (hdul2[2].data == data[10:]).all()
+            assert hdul2[4].data.dtype == np.uint16
+            assert (hdul2[3].data.field('v')[5] == np.arange(5)).all()
+
+            # The data of HDUs read from a file is copied from it unmodified
+            hdul2.writeto(self.temp('copy.fits'), workers=3)
+        assert (open(self.temp('copy.fits'), 'rb').read() ==
+                open(self.temp('serial.fits'), 'rb').read())
+
+        hdul.writeto(self.temp('checksum.fits'), checksum=True, workers=3)
+        with catch_warnings(record=True) as w:
+            with fits.open(self.temp('checksum.fits'), checksum=True) as hdul2:
+                assert 'CHECKSUM' in hdul2[3].header
+                assert (hdul2[1].data == data).all()
+            assert len(w) == 0
+
+        # An open file is left positioned after the last HDU, as it is by
+        # the serial write
+        size = os.path.getsize(self.temp('serial.fits'))
+        with open(self.temp('fileobj.fits'), 'wb') as f:
+            hdul.writeto(f, workers=2)
+            assert f.tell() == size
+
+        # Compressed output can only be written in sequence
+        hdul.writeto(self.temp('parallel.fits.gz'), workers=3)
+        with fits.open(self.temp('parallel.fits.gz')) as hdul2:
+            assert (hdul2[2].data == data[10:]).all()
+
+    def test_hdu_handles(self):
+        data = np.arange(10000, dtype=np.float32).reshape((100, 100))
+        hdul = fits.HDUList([fits.PrimaryHDU()])
+        for idx in range(4):
+            hdu = fits.ImageHDU(data + idx, name='SCI')
+            hdu.header['EXTVER'] = idx + 1
+            hdu.scale('int16', bscale=0.5, bzero=idx)
+            hdul.append(hdu)
+        hdul.append(fits.new_table([fits.Column(name='a', format='J',
+                                                array=np.arange(10))]))
+
+        # Only HDUs read from a file have handles
+        assert_raises(ValueError, hdul[1].handle)
+        hdul.writeto(self.temp('test.fits'))
+
+        with fits.open(self.temp('test.fits'), memmap=True) as hdul:
+            handles = [hdu.handle() for hdu in hdul]
+            assert handles[3].name == 'SCI' and handles[3].ver == 3
+            # The handle does not include the header or data
+            assert len(pickle.dumps(handles[1], 2)) < 1000
+
+        results = list(_map_parallel(_read_handle, handles[1:5], workers=2,
+                                     pool='process'))
+        for idx, (extver, section, memmap) in enumerate(results):
+            assert extver == idx + 1
+            assert section == (data[2:4, 1:3] + idx).tolist()
+            assert memmap
+
+        handle = pickle.loads(pickle.dumps(handles[5]))
+        assert (handle.data.field('a') == np.arange(10)).all()
+        handle.close()
+
+        # The handle refers to the HDU in the file as it was when the handle
+        # was created
+        with fits.open(self.temp('test.fits'), mode='update') as hdul:
+            hdul[2].header['HISTORY'] = 'x' * 72 * 36
+        assert_raises(IOError, lambda: handles[3].data)
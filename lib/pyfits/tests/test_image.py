@@ -1,5 +1,6 @@
 from __future__ import division, with_statement
 
+import gzip
 import math
 import os
 import time
@@ -10,6 +11,9 @@ import numpy as np
 import pyfits as fits
 from ..util import PyfitsDeprecationWarning, PyfitsPendingDeprecationWarning
 from ..hdu.compressed import SUBTRACTIVE_DITHER_1, DITHER_SEED_CHECKSUM
+from ..hdu import image
+from .. import util
+from .. import chunked, pyramid
 from . import PyfitsTestCase
 from .test_table import comparerecords
 from .util import catch_warnings, ignore_warnings, CaptureStdio
@@ -544,6 +548,366 @@ class TestImageFunctions(PyfitsTestCase):
         assert (d.section[0:2, 0:2] == dat[0:2, 0:2]).all()
         assert not d._data_loaded
 
+    def test_to_chunked(self):
+        raw = np.arange(210, dtype=np.int16).reshape((7, 5, 6))
+        raw[2, 3, 4] = -999
+        hdu = fits.PrimaryHDU(raw)
+        hdu.header['BSCALE'] = 0.5
+        hdu.header['BZERO'] = 3
+        hdu.header['BLANK'] = -999
+        hdu.writeto(self.temp('test.fits'))
+        dat = fits.getdata(self.temp('test.fits'))
+
+        hdul = fits.open(self.temp('test.fits'))
+        d = hdul[0]
+        # Blocks of whole planes, of whole rows, and of parts of rows
+        for chunks in (None, 100, (3, 2, 4)):
+            c = d.to_chunked(chunks, workers=2)
+            assert c.shape == dat.shape
+            assert c.dtype == dat.dtype
+            assert (np.isnan(c.compute()) == np.isnan(dat)).all()
+            assert (c[3:, 2, ::4].compute() == dat[3:, 2, ::4]).all()
+            assert (c[..., -1].compute() == dat[..., -1]).all()
+            assert c[1, 2, 3] == dat[1, 2, 3]
+            assert ((c * 2 - dat + 1)[:2].compute() == dat[:2] + 1).all()
+            # The blank pixel is in the third plane
+            assert np.isnan(c.sum())
+            for axis in (None, 0, 2):
+                assert np.allclose(c[3:].sum(axis=axis),
+                                   dat[3:].sum(axis=axis))
+                assert np.allclose(c[3:].std(axis=axis),
+                                   dat[3:].std(axis=axis))
+            assert c[:2].max() == dat[:2].max()
+        assert not d._data_loaded
+
+    def test_scale_in_chunks(self):
+        raw = np.arange(-50, 50, dtype=np.int32).reshape((10, 10))
+        raw[3, 3] = -999
+        hdu = fits.PrimaryHDU(raw)
+        hdu.header['BSCALE'] = 0.5
+        hdu.header['BZERO'] = 3
+        hdu.header['BLANK'] = -999
+        hdu.writeto(self.temp('test.fits'))
+        expected = raw * 0.5 + 3
+        expected[3, 3] = np.nan
+
+        saved_chunk_size = image._SCALE_CHUNK_SIZE
+        image._SCALE_CHUNK_SIZE = 7
+        try:
+            for kwargs in ({}, {'scaled_dtype': 'float32',
+                                'scale_workers': 2}):
+                data = fits.getdata(self.temp('test.fits'), **kwargs)
+                assert data.dtype == kwargs.get('scaled_dtype', 'float64')
+                assert ((data == expected) |
+                        (np.isnan(data) & np.isnan(expected))).all()
+
+            values = np.linspace(-100, 100, 100).reshape((10, 10))
+            hdu = fits.ImageHDU(values.copy(), scale_workers=2)
+            hdu.scale('int16', bscale=0.25, bzero=7)
+            assert hdu.data.dtype == np.int16
+            assert (hdu.data == np.around((values - 7) / 0.25)).all()
+
+            # Integer data is scaled exactly
+            hdu = fits.ImageHDU(np.array([0, 1, 32768, 65535],
+                                         dtype=np.uint16))
+            hdu.scale('int16', bzero=32768)
+            assert (hdu.data == [-32768, -32767, 0, 32767]).all()
+        finally:
+            image._SCALE_CHUNK_SIZE = saved_chunk_size
+
+        assert_raises(ValueError, fits.ImageHDU, scaled_dtype='int32')
+
+        # scaled_dtype does not reduce the precision of floating point data
+        hdu = fits.PrimaryHDU(np.linspace(0, 1, 10))
+        hdu.header['BSCALE'] = 2.0
+        hdu.header['BZERO'] = 1.0
+        hdu.writeto(self.temp('float.fits'))
+        data = fits.getdata(self.temp('float.fits'), scaled_dtype='float32')
+        assert data.dtype.itemsize == 8
+        assert (data == np.linspace(0, 1, 10) * 2.0 + 1.0).all()
+
+    def test_read_into(self):
+        raw = np.arange(120, dtype=np.int16).reshape((4, 5, 6))
+        raw[1, 2, 3] = -999
+        hdu = fits.ImageHDU(raw)
+        hdu.header['BSCALE'] = 0.5
+        hdu.header['BZERO'] = 3
+        hdu.header['BLANK'] = -999
+        fits.HDUList([fits.PrimaryHDU(raw), hdu]).writeto(
+            self.temp('test.fits'))
+        with open(self.temp('test.fits'), 'rb') as f:
+            gz = gzip.open(self.temp('test.fits.gz'), 'wb')
+            gz.write(f.read())
+            gz.close()
+
+        for filename in ('test.fits', 'test.fits.gz'):
+            hdul = fits.open(self.temp(filename))
+
+            # Unscaled data is read straight into the array, in native order
+            out = np.empty((2, 5, 6), dtype=np.int16)
+            assert hdul[0].read_into(out, slice(1, 3)) is out
+            assert (out == raw[1:3]).all()
+
+            scaled = raw * 0.5 + 3
+            scaled[1, 2, 3] = np.nan
+            out = np.empty((4, 5, 6), dtype=np.float32)
+            hdul[1].read_into(out)
+            assert (np.isnan(out) == np.isnan(scaled)).all()
+            assert (out[~np.isnan(out)] == scaled[~np.isnan(scaled)]).all()
+            out = np.empty((3, 2), dtype='>f8')
+            hdul[1].read_into(out, (slice(1, 4), 4, slice(2, 4)))
+            assert (out == scaled[1:4, 4, 2:4]).all()
+
+            # Scaled data can be read into an integer array
+            out = np.empty((2, 5, 6), dtype=np.int32)
+            hdul[1].read_into(out, slice(2, 4))
+            assert (out == (raw[2:4] * 0.5 + 3).astype(np.int32)).all()
+
+            assert not hdul[0]._data_loaded
+            assert not hdul[1]._data_loaded
+            assert_raises(ValueError, hdul[1].read_into, out)
+            hdul.close()
+
+    def test_read_into_uint(self):
+        data = np.array([0, 1, 32767, 32768, 65535], dtype=np.uint16)
+        fits.PrimaryHDU(data).writeto(self.temp('test.fits'))
+        with fits.open(self.temp('test.fits')) as hdul:
+            out = np.empty(5, dtype=np.uint16)
+            hdul[0].read_into(out)
+            assert (out == data).all()
+            assert not hdul[0]._data_loaded
+
+    def test_stats(self):
+        rng = np.random.RandomState(0)
+        raw = rng.randint(-1000, 1000, size=(40, 50)).astype(np.int16)
+        raw[::3, ::7] = -999
+        hdu = fits.ImageHDU(raw)
+        hdu.header['BSCALE'] = 0.5
+        hdu.header['BZERO'] = 3
+        hdu.header['BLANK'] = -999
+        hdu.writeto(self.temp('test.fits'))
+        scaled = raw * 0.5 + 3
+        scaled[raw == -999] = np.nan
+
+        names = ['count', 'sum', 'min', 'max', 'mean', 'var', 'std',
+                 'median', 'p0', 'p2.5', 'p90', 'p100']
+
+        def expected(data):
+            data = data[~np.isnan(data)]
+            values = {'count': data.size, 'sum': data.sum(),
+                      'min': data.min(), 'max': data.max(),
+                      'mean': data.mean(), 'var': data.var(),
+                      'std': data.std(), 'median': np.median(data)}
+            for q in (0, 2.5, 90, 100):
+                values['p%g' % q] = np.percentile(data, q)
+            return values
+
+        # Use small blocks and histograms, so that the percentiles need
+        # several passes over the data to be found exactly
+        saved = (chunked._HISTOGRAM_BINS, chunked._SELECT_SIZE,
+                 chunked.DEFAULT_CHUNK_SIZE)
+        chunked._HISTOGRAM_BINS = 4
+        chunked._SELECT_SIZE = 10
+        chunked.DEFAULT_CHUNK_SIZE = 1000
+        try:
+            with fits.open(self.temp('test.fits')) as hdul:
+                stats = hdul[1].stats(names)
+                ref = expected(scaled)
+                for name in names:
+                    assert np.allclose(stats[name], ref[name]), name
+                assert not hdul[1]._data_loaded
+
+                stats = hdul[1].stats(names, section=(slice(5, 30), 7),
+                                      workers=2)
+                ref = expected(scaled[5:30, 7])
+                for name in names:
+                    assert np.allclose(stats[name], ref[name]), name
+
+                stats = hdul[1].stats(['count', 'min', 'median'],
+                                      ignore_blank=False)
+                assert stats['count'] == raw.size
+                assert np.isnan(stats['min']) and np.isnan(stats['median'])
+
+                # Approximate percentiles are within one bin of the data
+                stats = hdul[1].stats(['median'], exact=False)
+                assert abs(stats['median'] - np.median(
+                    scaled[~np.isnan(scaled)])) <= 1000 / 4.0
+
+                assert_raises(ValueError, hdul[1].stats, ['mode'])
+        finally:
+            (chunked._HISTOGRAM_BINS, chunked._SELECT_SIZE,
+             chunked.DEFAULT_CHUNK_SIZE) = saved
+
+        # Loaded data, and data with infinite values
+        data = np.array([[-np.inf, 1, 2], [3, np.inf, np.inf]])
+        stats = fits.ImageHDU(data).stats(['min', 'p0', 'median', 'p100'])
+        assert stats == {'min': -np.inf, 'p0': -np.inf, 'median': 2.5,
+                         'p100': np.inf}
+
+    def _binned(self, data, factor, method):
+        # Bins a 2-D array by looping over the bins
+        rows = -(-data.shape[0] // factor)
+        cols = -(-data.shape[1] // factor)
+        binned = np.empty((rows, cols))
+        for row in range(rows):
+            for col in range(cols):
+                values = data[row * factor:(row + 1) * factor,
+                              col * factor:(col + 1) * factor]
+                values = values[~np.isnan(values)]
+                if not values.size:
+                    binned[row, col] = np.nan
+                else:
+                    binned[row, col] = getattr(values, method)()
+        return binned
+
+    def test_downsample(self):
+        raw = np.arange(37 * 50, dtype=np.int16).reshape((37, 50))
+        raw[3:7, 4:8] = -999
+        hdu = fits.ImageHDU(raw)
+        hdu.header['BSCALE'] = 0.5
+        hdu.header['BZERO'] = 3
+        hdu.header['BLANK'] = -999
+        hdu.header['CRPIX1'] = 10.0
+        hdu.header['CDELT1'] = 0.25
+        hdu.header['CD2_1'] = 2.0
+        hdu.writeto(self.temp('test.fits'))
+        scaled = raw * 0.5 + 3
+        scaled[3:7, 4:8] = np.nan
+
+        # Read the image a few rows at a time
+        saved_strip_size = pyramid.STRIP_SIZE
+        pyramid.STRIP_SIZE = 1000
+        try:
+            with fits.open(self.temp('test.fits')) as hdul:
+                for method in ('mean', 'max', 'sum'):
+                    for factor in (1, 3, 4):
+                        binned = hdul[1].downsample(factor, method)
+                        assert isinstance(binned, fits.ImageHDU)
+                        assert np.allclose(
+                            binned.data, self._binned(scaled, factor, method),
+                            equal_nan=True)
+                assert not hdul[1]._data_loaded
+
+                header = hdul[1].downsample(4).header
+                assert header['CRPIX1'] == (10.0 - 0.5) / 4 + 0.5
+                assert header['CDELT1'] == 1.0
+                assert header['CD2_1'] == 8.0
+                assert 'BSCALE' not in header and 'BLANK' not in header
+
+                binned = hdul[1].downsample((2, 5), 'max')
+                assert binned.data.shape == (19, 10)
+                assert binned.data[0, 0] == scaled[:2, :5].max()
+        finally:
+            pyramid.STRIP_SIZE = saved_strip_size
+
+        # Unscaled integer data keeps its type for the max, and is summed
+        # exactly
+        hdu = fits.ImageHDU(np.arange(10, dtype=np.int32))
+        assert hdu.downsample(4, 'max').data.tolist() == [3, 7, 9]
+        assert hdu.downsample(4, 'sum').data.dtype == np.int64
+        assert hdu.downsample(4, 'mean').data.tolist() == [1.5, 5.5, 8.5]
+        assert_raises(ValueError, hdu.downsample, 0)
+        assert_raises(ValueError, hdu.downsample, 2, 'median')
+
+    def test_write_pyramid(self):
+        data = np.random.RandomState(0).random_sample((60, 45))
+        data[10:20, 10:20] = np.nan
+        hdu = fits.ImageHDU(data)
+        hdu.writeto(self.temp('test.fits'))
+
+        saved_strip_size = pyramid.STRIP_SIZE
+        pyramid.STRIP_SIZE = 1000
+        try:
+            for filename in ('pyramid.fits', 'pyramid.fits.gz'):
+                with fits.open(self.temp('test.fits')) as hdul:
+                    hdul[1].write_pyramid(self.temp(filename),
+                                          factors=(2, 3, 4, 16))
+                    assert not hdul[1]._data_loaded
+
+                with fits.open(self.temp(filename)) as hdul:
+                    hdul.verify('exception')
+                    assert len(hdul) == 5
+                    for level, factor in enumerate((2, 3, 4, 16)):
+                        hdu = hdul['PYRAMID', level + 1]
+                        assert hdu.header['DOWNSAM1'] == factor
+                        assert hdu.header['DOWNSAM2'] == factor
+                        assert np.allclose(
+                            hdu.data, self._binned(data, factor, 'mean'),
+                            equal_nan=True)
+        finally:
+            pyramid.STRIP_SIZE = saved_strip_size
+
+        # Data already in memory, and unsigned integers
+        data = np.arange(60000, 60000 + 35 * 4, dtype=np.uint16)
+        hdu = fits.ImageHDU(data.reshape((35, 4)))
+        hdu.write_pyramid(self.temp('uint.fits'), factors=[(2, 1)],
+                          method='max')
+        with fits.open(self.temp('uint.fits'), uint=True) as hdul:
+            assert hdul[1].data.dtype == np.uint16
+            assert (hdul[1].data ==
+                    data.reshape((35, 4))[1::2].tolist() + [data[-4:]]).all()
+
+        assert_raises(IOError, hdu.write_pyramid, self.temp('uint.fits'))
+
+    def test_native_byteorder(self):
+        raw = np.arange(120, dtype=np.int32).reshape((4, 5, 6))
+        hdu = fits.ImageHDU(raw)
+        hdu.scale('int16', bzero=32768)
+        fits.HDUList([fits.PrimaryHDU(raw), hdu]).writeto(
+            self.temp('test.fits'))
+
+        for memmap in (True, False):
+            hdul = fits.open(self.temp('test.fits'), memmap=memmap,
+                             native_byteorder=True)
+            assert hdul[0].data.dtype == np.dtype('int32')
+            assert hdul[0].data.dtype.isnative
+            assert (hdul[0].data == raw).all()
+            assert hdul[0].section[1:3, 2].dtype.isnative
+            assert (hdul[0].section[1:3, 2] == raw[1:3, 2]).all()
+            assert hdul[1].data.dtype.isnative
+            assert (hdul[1].data == raw).all()
+
+            hdul[0].data[0, 0, 0] = -1
+            hdul.writeto(self.temp('test2.fits'), clobber=True)
+            assert hdul[0].data.dtype.isnative
+            hdul.close()
+
+            with fits.open(self.temp('test2.fits')) as hdul:
+                assert hdul[0].data[0, 0, 0] == -1
+                assert (hdul[0].data.flat[1:] == raw.flat[1:]).all()
+                assert (hdul[1].data == raw).all()
+
+        # Without native_byteorder the data is big-endian, as in the file
+        with fits.open(self.temp('test.fits')) as hdul:
+            assert hdul[0].data.dtype == np.dtype('>i4')
+            assert hdul[0].data[0, 0, 0] == 0
+
+    def test_native_byteorder_memmap(self):
+        raw = np.arange(120, dtype=np.int32).reshape((4, 5, 6))
+        fits.PrimaryHDU(raw).writeto(self.temp('test.fits'))
+        with open(self.temp('test.fits'), 'rb') as f:
+            contents = f.read()
+
+        saved_chunk_size = util._BYTESWAP_CHUNK_SIZE
+        util._BYTESWAP_CHUNK_SIZE = 28
+        try:
+            for mode in ('readonly', 'denywrite', 'update'):
+                with fits.open(self.temp('test.fits'), mode=mode,
+                               memmap=True, native_byteorder=True) as hdul:
+                    data = hdul[0].data
+                    assert data.dtype.isnative
+                    assert (data == raw).all()
+                    # In the copy-on-write modes the data is converted in
+                    # its own mapping of the file instead of being copied
+                    assert ((util._get_array_mmap(data) is not None) ==
+                            (mode == 'readonly'))
+
+                # Converting the data does not change the file
+                with open(self.temp('test.fits'), 'rb') as f:
+                    assert f.read() == contents
+        finally:
+            util._BYTESWAP_CHUNK_SIZE = saved_chunk_size
+
     def test_do_not_scale_image_data(self):
         hdul = fits.open(self.data('scale.fits'), do_not_scale_image_data=True)
         assert hdul[0].data.dtype == np.dtype('>i2')
@@ -808,6 +1172,21 @@ class TestCompressedImage(PyfitsTestCase):
             assert isinstance(hdul[1], fits.CompImageHDU)
             assert np.all(hdul[1].data == np.arange(100, dtype=np.int32))
 
+    def test_write_compressed_pyramid(self):
+        data = np.arange(100 * 80, dtype=np.int16).reshape((100, 80))
+        fits.ImageHDU(data).write_pyramid(self.temp('pyramid.fits'),
+                                          factors=(2, 4), method='max',
+                                          compression_type='RICE_1')
+
+        with fits.open(self.temp('pyramid.fits')) as hdul:
+            assert len(hdul) == 3
+            for hdu, factor in zip(hdul[1:], (2, 4)):
+                assert isinstance(hdu, fits.CompImageHDU)
+                assert hdu.header['DOWNSAM1'] == factor
+                assert hdu.data.dtype == np.int16
+                assert (hdu.data ==
+                        data[factor - 1::factor, factor - 1::factor]).all()
+
     def test_comp_image(self):
         argslist = [
             (np.zeros((2, 10, 10), dtype=np.float32), 'RICE_1', 16),
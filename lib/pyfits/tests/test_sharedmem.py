@@ -0,0 +1,106 @@
+from __future__ import division, with_statement
+
+import os
+import pickle
+
+import numpy as np
+
+import pyfits as fits
+from ..sharedmem import _segments, _cleanup_segments
+from ..util import _map_parallel
+from . import PyfitsTestCase
+
+from nose.tools import assert_raises
+
+
+def _attach(descriptor):
+    # Run in the worker processes of test_attach_in_other_processes
+    data = descriptor.attach()
+    if data.dtype.names:
+        return (data.field('a').tolist(),
+                [data.field('v')[idx].tolist() for idx in range(4)])
+    return data.dtype.str, data.tolist()
+
+
+class TestSharedMemory(PyfitsTestCase):
+    def setup(self):
+        super(TestSharedMemory, self).setup()
+        self.image = np.arange(100, dtype=np.float32).reshape((10, 10))
+        self.vla = np.array([np.arange(idx) for idx in range(10)],
+                            dtype=object)
+        hdu = fits.ImageHDU(self.image.copy(), name='SCI')
+        hdu.scale('int16', bscale=0.5, bzero=3)
+        table = fits.BinTableHDU.from_columns([
+            fits.Column(name='a', format='J', array=np.arange(10)),
+            fits.Column(name='v', format='PJ()', array=self.vla)])
+        fits.HDUList([fits.PrimaryHDU(np.arange(50, dtype=np.int16)), hdu,
+                      table]).writeto(self.temp('test.fits'))
+
+    def teardown(self):
+        _cleanup_segments()
+        super(TestSharedMemory, self).teardown()
+
+    def test_share_image(self):
+        with fits.open(self.temp('test.fits')) as hdul:
+            # Unscaled data is read from the file directly into the segment
+            desc = hdul[0].to_shared_memory()
+            assert not hdul[0]._data_loaded
+            assert desc.dtype == '>i2'
+            assert (desc.attach() == np.arange(50)).all()
+
+            # Scaled data is shared as its final, scaled array
+            desc = hdul[1].to_shared_memory()
+            assert desc.dtype == np.dtype(np.float32).str
+            data = desc.attach()
+            assert (data == self.image).all()
+
+        # Changes made to the data are seen through every attachment
+        data[0, 0] = 99
+        assert desc.attach()[0, 0] == 99
+
+        assert_raises(ValueError, fits.PrimaryHDU().to_shared_memory)
+
+    def test_share_table(self):
+        with fits.open(self.temp('test.fits')) as hdul:
+            for loaded in (False, True):
+                if loaded:
+                    hdul[2].data.field('a')[:] += 1
+                desc = hdul[2].to_shared_memory()
+                data = desc.attach()
+                assert isinstance(data, fits.FITS_rec)
+                assert (data.field('a') == np.arange(10) + loaded).all()
+                for idx in range(10):
+                    assert (data.field('v')[idx] == self.vla[idx]).all()
+
+    def test_attach_in_other_processes(self):
+        with fits.open(self.temp('test.fits')) as hdul:
+            descs = [hdu.to_shared_memory() for hdu in hdul]
+
+        # The descriptors do not contain the data
+        assert len(pickle.dumps(descs[1], 2)) < 2880 * 2
+        results = list(_map_parallel(_attach, descs, workers=2,
+                                     pool='process'))
+        assert results[0] == ('>i2', list(range(50)))
+        assert results[1][1] == self.image.tolist()
+        assert results[2] == (list(range(10)),
+                              [list(range(idx)) for idx in range(4)])
+
+        # The worker processes did not remove the segments when they exited
+        assert all(os.path.exists(desc.path) for desc in descs)
+
+    def test_unlink(self):
+        with fits.open(self.temp('test.fits')) as hdul:
+            with hdul[0].to_shared_memory() as desc:
+                data = desc.attach()
+                assert desc.name in _segments
+            assert not os.path.exists(desc.path)
+            assert desc.name not in _segments
+            # Data already attached is still valid
+            assert (data == np.arange(50)).all()
+            assert_raises(OSError, desc.attach)
+            desc.unlink()
+
+            # Segments not unlinked are removed when the process exits
+            desc = hdul[0].to_shared_memory()
+            _cleanup_segments()
+            assert not os.path.exists(desc.path)
@@ -0,0 +1,252 @@
+from __future__ import division, with_statement
+
+import os
+import threading
+
+import numpy as np
+
+from ..extern.six import b
+from ..extern.six.moves import BaseHTTPServer
+
+import pyfits as fits
+from ..storage import (MemoryBackend, LocalFileBackend, HTTPBackend,
+                       _BlockCache, _BackendFile)
+from . import PyfitsTestCase
+from .util import catch_warnings
+
+from nose.tools import assert_raises
+
+
+class CountingBackend(MemoryBackend):
+    """A MemoryBackend that records each ranged read made from it."""
+
+    def __init__(self, *args, **kwargs):
+        super(CountingBackend, self).__init__(*args, **kwargs)
+        self.reads = []
+
+    def read_range(self, offset, size):
+        self.reads.append((offset, size))
+        return super(CountingBackend, self).read_range(offset, size)
+
+
+class RangeRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Serves the files in the server's ``files`` dict, supporting single range
+    requests if the server's ``accept_ranges`` is True.
+    """
+
+    def do_GET(self):
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+
+        range_header = self.headers.get('Range')
+        if range_header and self.server.accept_ranges:
+            start, stop = range_header.split('=')[1].split('-')
+            start = int(start)
+            stop = min(int(stop), len(data) - 1)
+            body = data[start:stop + 1]
+            self.send_response(206)
+            self.send_header('Content-Range',
+                             'bytes %d-%d/%d' % (start, stop, len(data)))
+        else:
+            body = data
+            self.send_response(200)
+
+        self.server.requests.append(range_header)
+        self.server.bytes_sent += len(body)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestStorageBackends(PyfitsTestCase):
+    def _read_data(self, filename):
+        f = open(self.data(filename), 'rb')
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def test_open_memory_backend(self):
+        backend = CountingBackend(self._read_data('test0.fits'),
+                                  name='test0.fits', block_size=2880 * 4,
+                                  readahead=2)
+        with fits.open(backend) as hdul:
+            assert len(hdul) == 5
+            assert hdul.filename() == 'test0.fits'
+            # Walking all the headers in the 40 kB file only takes a couple of
+            # (block-aligned) reads
+            assert len(backend.reads) <= 2
+            assert all(offset % backend.block_size == 0
+                       for offset, _ in backend.reads)
+
+            expected = fits.getdata(self.data('test0.fits'), 2)
+            nreads = len(backend.reads)
+            assert (hdul[2].section[3:6, 1:5] == expected[3:6, 1:5]).all()
+            assert (hdul[2].data == expected).all()
+            assert len(backend.reads) <= nreads + 1
+
+    def test_open_local_file_backend(self):
+        backend = LocalFileBackend(self.data('test0.fits'))
+        with fits.open(backend) as hdul:
+            assert (hdul[1].data == fits.getdata(self.data('test0.fits'),
+                                                 1)).all()
+        assert backend._file.closed
+
+    def test_block_cache(self):
+        backend = CountingBackend(b('0123456789') * 10, block_size=10,
+                                  cache_blocks=4, readahead=1)
+        cache = _BlockCache(backend)
+
+        assert cache.read(15, 10) == b('5678901234')
+        # Blocks 1 and 2 are read together, along with one block of readahead
+        assert backend.reads == [(10, 30)]
+
+        assert cache.read(30, 10) == b('0123456789')
+        assert backend.reads == [(10, 30)]
+        assert cache.hits == 1
+
+        # Only the missing blocks are read, coalesced into one request
+        assert cache.read(0, 60) == b('0123456789') * 6
+        assert backend.reads == [(10, 30), (0, 10), (40, 30)]
+
+        # The least recently used blocks have been discarded
+        assert sorted(cache._blocks) == [0, 4, 5, 6]
+        assert cache.read(95, 10) == b('56789')
+        assert cache.read(100, 10) == b('')
+
+    def test_block_cache_write(self):
+        backend = CountingBackend(b('0123456789') * 3, block_size=10)
+        cache = _BlockCache(backend)
+        assert cache.read(0, 30) == b('0123456789') * 3
+        cache.write(25, b('abcdefghij'))
+        assert cache.size() == 35
+        assert cache.read(20, 15) == b('01234abcdefghij')
+        assert cache.read(0, 5) == b('01234')
+
+    def test_write_memory_backend(self):
+        backend = MemoryBackend(name='new.fits')
+        hdul = fits.HDUList([fits.PrimaryHDU(np.arange(100)),
+                             fits.ImageHDU(np.ones((10, 10)))])
+        hdul.writeto(backend)
+        assert backend.size() == 2880 * 4
+
+        with fits.open(backend, mode='update') as hdul:
+            hdul[0].data[0] = 99
+            hdul[1].header['TEST'] = 'value'
+            hdul.append(fits.ImageHDU(np.zeros(10)))
+
+        with fits.open(backend) as hdul:
+            assert len(hdul) == 3
+            assert hdul[0].data[0] == 99
+            assert hdul[1].header['TEST'] == 'value'
+            assert (hdul[1].data == 1).all()
+
+        # The backend already contains a file
+        hdul = fits.HDUList([fits.PrimaryHDU(np.arange(10))])
+        assert_raises(IOError, hdul.writeto, backend)
+        with catch_warnings(record=True):
+            hdul.writeto(backend, clobber=True)
+        assert backend.size() == 2880 * 2
+
+    def test_write_readonly_backend(self):
+        backend = LocalFileBackend(self.data('test0.fits'))
+        try:
+            assert_raises(IOError, fits.open, backend, mode='update')
+        finally:
+            backend.close()
+
+        # The default for new backends is to be readonly
+        class ReadonlyBackend(MemoryBackend):
+            writable = False
+
+        backend = ReadonlyBackend()
+        assert_raises(IOError, fits.HDUList([fits.PrimaryHDU()]).writeto,
+                      backend)
+
+
+class TestHTTPBackend(PyfitsTestCase):
+    def setup(self):
+        super(TestHTTPBackend, self).setup()
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                RangeRequestHandler)
+        self.server.files = {}
+        self.server.accept_ranges = True
+        self.server.requests = []
+        self.server.bytes_sent = 0
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+        self.thread.start()
+
+    def teardown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        super(TestHTTPBackend, self).teardown()
+
+    def _serve(self, filename):
+        f = open(filename, 'rb')
+        try:
+            self.server.files['/' + os.path.basename(filename)] = f.read()
+        finally:
+            f.close()
+        return 'http://127.0.0.1:%d/%s' % (self.server.server_address[1],
+                                           os.path.basename(filename))
+
+    def test_open_url(self):
+        url = self._serve(self.data('test0.fits'))
+        expected = fits.getdata(self.data('test0.fits'), 3)
+        with fits.open(url) as hdul:
+            assert isinstance(hdul._HDUList__file._File__file, _BackendFile)
+            assert hdul.filename() == url
+            assert len(hdul) == 5
+            assert (hdul[3].section[2:4, 1:10] == expected[2:4, 1:10]).all()
+            assert (hdul[3].data == expected).all()
+
+        assert all(r is not None for r in self.server.requests)
+
+    def test_open_large_url(self):
+        """
+        Only the parts of the file that are needed are transferred.
+        """
+
+        data = np.arange(2000 * 2000, dtype=np.int32).reshape((2000, 2000))
+        hdul = fits.HDUList([fits.PrimaryHDU(data),
+                             fits.ImageHDU(data[:10], name='SMALL')])
+        hdul.writeto(self.temp('large.fits'))
+        url = self._serve(self.temp('large.fits'))
+        size = len(self.server.files['/large.fits'])
+
+        with fits.open(url) as hdul:
+            assert hdul['SMALL'].header['NAXIS2'] == 10
+            assert (hdul[0].section[1500, 200:300] ==
+                    data[1500, 200:300]).all()
+
+        assert self.server.bytes_sent < size // 4
+        assert len(self.server.requests) <= 6
+
+    def test_open_url_without_ranges(self):
+        """
+        If the server does not support range requests the file is downloaded.
+        """
+
+        self.server.accept_ranges = False
+        url = self._serve(self.data('test0.fits'))
+        assert not HTTPBackend(url).accepts_ranges
+
+        with fits.open(url) as hdul:
+            assert not isinstance(hdul._HDUList__file._File__file,
+                                  _BackendFile)
+            assert hdul.filename() != url
+            assert (hdul[1].data ==
+                    fits.getdata(self.data('test0.fits'), 1)).all()
+
+    def test_open_missing_url(self):
+        url = self._serve(self.data('test0.fits')) + '.missing'
+        assert_raises(IOError, fits.open, url)
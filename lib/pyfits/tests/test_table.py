@@ -304,6 +304,72 @@ class TestTableFunctions(PyfitsTestCase):
         assert (channelsIn == channelsOut).all()
         hduL.close()
 
+    def test_read_into(self):
+        table = fits.BinTableHDU.from_columns([
+            fits.Column(name='a', format='J', array=np.arange(5)),
+            fits.Column(name='b', format='3E',
+                        array=np.arange(15).reshape((5, 3))),
+            fits.Column(name='c', format='L',
+                        array=[True, False, True, True, False]),
+            fits.Column(name='d', format='I', bzero=32768,
+                        array=np.array([0, 1, 2, 65535, 5], dtype='u2')),
+            fits.Column(name='e', format='E', bscale=2.0, bzero=1.0,
+                        array=np.arange(5.0))])
+        table.writeto(self.temp('test.fits'))
+        data = fits.getdata(self.temp('test.fits'))
+
+        hdul = fits.open(self.temp('test.fits'))
+        out = np.zeros(5, dtype=[('a', 'i8'), ('b', 'f4', (3,)),
+                                 ('c', '?'), ('d', 'u2'), ('e', 'f8')])
+        assert hdul[1].read_into(out) is out
+        for name in out.dtype.names:
+            assert (out[name] == data[name]).all()
+
+        out = np.zeros(5, dtype=[('x', 'f8'), ('y', 'i4')])
+        hdul[1].read_into(out, columns=['E', 'a'])
+        assert (out['x'] == data['e']).all()
+        assert (out['y'] == data['a']).all()
+        assert not hdul[1]._data_loaded
+
+    def test_native_byteorder(self):
+        vla = np.array([np.arange(idx) for idx in range(5)], dtype=object)
+        table = fits.BinTableHDU.from_columns([
+            fits.Column(name='a', format='J', array=np.arange(5)),
+            fits.Column(name='b', format='2D',
+                        array=np.arange(10.0).reshape((5, 2))),
+            fits.Column(name='c', format='PJ()', array=vla)])
+        table.writeto(self.temp('test.fits'))
+
+        for memmap in (True, False):
+            with fits.open(self.temp('test.fits'), memmap=memmap,
+                           native_byteorder=True) as hdul:
+                data = hdul[1].data
+                assert data.dtype.isnative
+                assert data['a'].dtype.isnative
+                assert (data['a'] == np.arange(5)).all()
+                assert (data['b'] == np.arange(10.0).reshape((5, 2))).all()
+                for idx in range(5):
+                    assert (data['c'][idx] == vla[idx]).all()
+                data['a'] += 1
+                hdul.writeto(self.temp('test2.fits'), clobber=True)
+                # The data is still in native order after it is written
+                assert data.dtype.isnative
+
+            with fits.open(self.temp('test2.fits')) as hdul:
+                assert (hdul[1].data['a'] == np.arange(1, 6)).all()
+                assert (hdul[1].data['b'] ==
+                        np.arange(10.0).reshape((5, 2))).all()
+                assert (hdul[1].data['c'][4] == vla[4]).all()
+
+        # The file itself is left unchanged, even when it is opened in update
+        # mode and the table converted in a copy of the data
+        with fits.open(self.temp('test.fits'), mode='update', memmap=True,
+                       native_byteorder=True) as hdul:
+            assert hdul[1].data.dtype.isnative
+            assert (hdul[1].data['c'][3] == vla[3]).all()
+        assert (fits.getdata(self.temp('test.fits'))['a'] ==
+                np.arange(5)).all()
+
     def test_column_endianness(self):
         """
         Regression test for https://aeon.stsci.edu/ssb/trac/pyfits/ticket/77
@@ -1,5 +1,6 @@
 from __future__ import division
 
+import collections
 import functools
 import gzip
 import itertools
@@ -441,7 +442,7 @@ def isfile(f):
     return isinstance(f, file)
 
 
-def fileobj_open(filename, mode):
+def fileobj_open(filename, mode, buffering=None):
     """
     A wrapper around the `open()` builtin.
 
@@ -449,10 +450,12 @@ def fileobj_open(filename, mode):
     default.  This is bad, because `io.BufferedReader` doesn't support random
     access, which we need in some cases.  In the Python 3 case (implemented in
     the py3compat module) we must call open with buffering=0 to get a raw
-    random-access file reader.
+    random-access file reader, unless a buffer size is given explicitly.
     """
 
-    return open(filename, mode)
+    if buffering is None:
+        return open(filename, mode)
+    return open(filename, mode, buffering)
 
 
 def fileobj_name(f):
@@ -480,7 +483,9 @@ def fileobj_closed(f):
     file-like object.
     """
 
-    if hasattr(f, 'closed'):
+    if isinstance(f, string_types):
+        return True
+    elif hasattr(f, 'closed'):
         return f.closed
     elif hasattr(f, 'fileobj') and hasattr(f.fileobj, 'closed'):
         return f.fileobj.closed
@@ -919,6 +924,31 @@ def _normalize_slice(input, naxis):
     return slice(_start, _stop, _step)
 
 
+def _contiguous_runs(shape, region):
+    """
+    Splits ``region``, a tuple of slices with a step of 1 for each axis of a
+    C-ordered array of the given ``shape``, into runs of elements that are
+    contiguous in the array.
+
+    Returns the shape of each run, and the offsets (in elements from the
+    start of the array) of the runs, in the C order of the region.  Each run
+    covers the whole of the trailing axes that ``region`` covers entirely,
+    and part of the axis before them.
+    """
+
+    size = [s.stop - s.start for s in region]
+    split = len(shape) - 1
+    while split > 0 and size[split] == shape[split]:
+        split -= 1
+
+    strides = [int(np.prod(shape[idx + 1:])) for idx in range(len(shape))]
+    start = sum(s.start * stride for s, stride in zip(region, strides))
+    offsets = [start + sum(index * stride
+                           for index, stride in zip(indices, strides))
+               for indices in np.ndindex(*size[:split])]
+    return tuple(size[split:]), offsets
+
+
 def _words_group(input, strlen):
     """
     Split a long string into parts where each part is no longer
@@ -971,6 +1001,61 @@ def _tmp_name(input):
     return fn
 
 
+def _map_parallel(func, iterable, workers=None, pool='thread', chunksize=1,
+                  max_pending=None):
+    """
+    Like ``itertools.imap(func, iterable)``, but distributes the calls over a
+    pool of ``workers`` threads (``pool='thread'``) or processes
+    (``pool='process'``).  Results are yielded in the same order as the
+    inputs, as soon as they become available.
+
+    If ``workers`` is `None` or less than 2, or the platform does not support
+    the `multiprocessing` module, the calls are made serially in the current
+    thread.  When using a process pool ``func`` must be picklable (i.e. a
+    module-level function).
+
+    If ``max_pending`` is given, at most that many calls are made ahead of the
+    results consumed so far, which bounds the memory held by results that
+    have not been consumed yet.
+    """
+
+    if pool not in ('thread', 'process'):
+        raise ValueError("pool must be either 'thread' or 'process'; got %r" %
+                         pool)
+
+    try:
+        import multiprocessing
+        import multiprocessing.pool
+    except ImportError:
+        multiprocessing = None
+
+    if workers is None or workers < 2 or multiprocessing is None:
+        for item in iterable:
+            yield func(item)
+        return
+
+    if pool == 'thread':
+        pool = multiprocessing.pool.ThreadPool(workers)
+    else:
+        pool = multiprocessing.Pool(workers)
+
+    try:
+        if max_pending:
+            pending = collections.deque()
+            for item in iterable:
+                pending.append(pool.apply_async(func, (item,)))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+        else:
+            for result in pool.imap(func, iterable, chunksize):
+                yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
 if sys.version_info[:2] < (2, 6):
     # In Python 2.5 mmap.mmap is a function that returns an object of type
     # 'mmap.mmap', but the mmap.mmap type is otherwise not accessible through
@@ -983,6 +1068,42 @@ else:
         return isinstance(obj, mmap.mmap)
 
 
+# The number of bytes of an array converted to the native byte order at a
+# time by _native_byteorder
+_BYTESWAP_CHUNK_SIZE = 2 ** 22
+
+
+def _native_byteorder(array, inplace=True):
+    """
+    Converts the contiguous array ``array`` (which may be a structured array)
+    to the native byte order and returns it.
+
+    The array is converted in place if ``inplace`` is `True` and its memory is
+    writeable; otherwise a converted copy is returned.  Either way the array
+    is converted a chunk of rows at a time, so no temporary arrays larger than
+    a chunk are needed.
+    """
+
+    if array.dtype.isnative:
+        return array
+
+    dtype = array.dtype.newbyteorder('=')
+    flat = array.view(np.ndarray).reshape(-1)
+    step = max(1, _BYTESWAP_CHUNK_SIZE // max(1, dtype.itemsize))
+
+    if inplace and array.flags.writeable:
+        for start in range(0, flat.size, step):
+            flat[start:start + step].byteswap(True)
+        array.dtype = dtype
+        return array
+
+    converted = np.empty(array.shape, dtype=dtype)
+    converted_flat = converted.reshape(-1)
+    for start in range(0, flat.size, step):
+        converted_flat[start:start + step] = flat[start:start + step]
+    return converted
+
+
 def _get_array_mmap(array):
     """
     If the array has an mmap.mmap at base of its base chain, return the mmap